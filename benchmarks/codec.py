@@ -0,0 +1,56 @@
+'''
+Codec Benchmark
+---------------
+
+Compares the size and the serialization cost of the contents of the messages
+encoded with pickle and with the codec of tralhoto.codec.
+
+Run with:
+
+    python benchmarks/codec.py
+
+@author: @italocampos
+'''
+
+import os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tralhoto import codec
+import data
+
+import pickle, timeit
+
+
+MESSAGES = [
+    ('HOW_MANY_TIME', {'side': 'A'}),
+    ('WAIT_FOR_X_SECONDS', {
+        'time': 12.0,
+        'location': 146,
+        'name': data.stations[20]['name'],
+    }),
+    ('OPEN', {'location': 138, 'eta': 14.5}),
+    ('CONFIRMATION', {'location': 140}),
+]
+
+
+def main(number = 100000):
+    print('{:<20} {:>8} {:>8} {:>12} {:>12} {:>12} {:>12}'.format(
+        'ontology', 'pickle B', 'codec B', 'pickle enc', 'codec enc', 'pickle dec', 'codec dec'))
+    for ontology, content in MESSAGES:
+        pickled = pickle.dumps(content)
+        encoded = codec.encode(ontology, content)
+        assert codec.decode(ontology, encoded) == content
+
+        times = [
+            timeit.timeit(lambda: pickle.dumps(content), number = number),
+            timeit.timeit(lambda: codec.encode(ontology, content), number = number),
+            timeit.timeit(lambda: pickle.loads(pickled), number = number),
+            timeit.timeit(lambda: codec.decode(ontology, encoded), number = number),
+        ]
+        print('{:<20} {:>8} {:>8} {:>12} {:>12} {:>12} {:>12}'.format(
+            ontology, len(pickled), len(encoded),
+            *['%.3f us' % (t / number * 1e6) for t in times]))
+
+
+if __name__ == '__main__':
+    main()
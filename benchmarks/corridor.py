@@ -0,0 +1,243 @@
+'''
+Corridor Benchmark
+------------------
+
+Measures the performance of the simulation of the BRT corridor in the
+simulation engine (tralhoto.engine), which executes the same rules of the
+agents of tralhoto.agent and tralhoto.behaviour. For each case, it measures:
+
+- the simulated seconds per second of the wall clock;
+- the messages exchanged by the agents per second of the wall clock;
+- the peak memory of the process (resident set size).
+
+The cases scale the number of buses, the number of copies of the corridor of
+data.py (placed one after another in the same road) and the resolution of the
+road (cells per 100 m), for both managers of the semaphores. Each case runs in
+a new process, so the peak memory of a case does not depend on the others, and
+is repeated REPEAT times in it: the speeds are measured on the fastest run,
+which is the least disturbed by the other processes of the machine.
+
+Run with:
+
+    python benchmarks/corridor.py --output benchmark.json
+
+And compare with a stored baseline (exits with 1 if some case is slower than
+the baseline beyond the tolerance):
+
+    python benchmarks/corridor.py --quick --baseline benchmarks/baseline.json --tolerance 0.2
+
+The file benchmarks/baseline.json has the measures of --quick on the machine
+of the last change of the engine. Measure a new baseline before comparing in
+another machine.
+
+@author: @italocampos
+'''
+
+import os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tralhoto.engine import Simulation
+from tralhoto import config
+import data
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse, json, multiprocessing, platform, resource, time
+
+
+# The scaled dimensions and their values (the other dimensions keep the first
+# value of their lists)
+SCALES = {
+    'n_buses': [10, 100, 1000],
+    'copies': [1, 2, 4, 8],
+    'resolution': [1, 2, 4],
+}
+
+MANAGERS = ['board', 'traditional']
+
+# The number of runs of each case
+REPEAT = 5
+
+# The minimum number of trips of a run: the buses of the small cases trip
+# again, so their runs are long enough to be timed
+MIN_TRIPS = 100
+
+# The baseline stored with the benchmark
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def cases(scales = SCALES, managers = MANAGERS):
+    ''' Returns the cases of the benchmark: each dimension is scaled while the
+    others keep their first value. '''
+
+    defaults = {name: values[0] for name, values in scales.items()}
+    found = list()
+    for manager in managers:
+        for name, values in scales.items():
+            for value in values:
+                case = dict(defaults, manager = manager)
+                case[name] = value
+                if case not in found:
+                    found.append(case)
+    return found
+
+
+def key(case):
+    ''' Returns the identifier of a case (or of the measure of a case). '''
+
+    return ','.join('%s=%s' % (name, case[name]) for name in ['manager'] + list(SCALES))
+
+
+def corridor(case, seed = 0, n_simulations = 1):
+    ''' Builds the simulation of a case.
+
+    The corridor of data.py is copied case['copies'] times, and every
+    position is multiplied by case['resolution'].
+    '''
+
+    resolution, copies = case['resolution'], case['copies']
+    length = 205 * resolution
+    config.CELL_SIZE = 100 / resolution
+
+    simulation = Simulation(length * copies, case['manager'], seed)
+    for copy in range(copies):
+        offset = length * copy
+        for i, station in enumerate(data.stations):
+            simulation.add_station(
+                aid = 'station-%d-%d' % (copy, i),
+                group = station['group'],
+                location = offset + (int(station['location'] * 10) + 6) * resolution,
+                side = station['side'],
+                name = station['name'],
+                proximity_factor = 5 * resolution,
+            )
+        for i, semaphore in enumerate(data.semaphores):
+            simulation.add_semaphore(
+                aid = 'semaphore-%d-%d' % (copy, i),
+                group = semaphore['group'],
+                location = offset + (int(semaphore['location'] * 10) + 6) * resolution,
+                perimeter = semaphore['perimeter'],
+                proximity_factor = 2 * resolution,
+            )
+
+    for i in range(case['n_buses']):
+        simulation.add_bus(
+            aid = 'bus-%d' % i,
+            name = 'TB%d' % i,
+            velocity = config.BUS_VELOCITY[i % len(config.BUS_VELOCITY)],
+            n_simulations = n_simulations,
+            start_time = 60 * 5 + 60 * 2 * i,
+        )
+    return simulation
+
+
+def measure(case, repeat = REPEAT):
+    ''' Runs a case repeat times and returns the measures of its fastest run.
+    Must run in a new process. '''
+
+    walls = list()
+    n_simulations = max(1, -(-MIN_TRIPS // case['n_buses']))
+    for _ in range(repeat):
+        simulation = corridor(case, n_simulations = n_simulations)
+        start = time.perf_counter()
+        results = simulation.run()
+        walls.append(time.perf_counter() - start)
+    wall = min(walls)
+    # The peak resident set size, in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if platform.system() == 'Darwin':
+        peak //= 1024
+
+    return dict(case,
+        wall_time = wall,
+        wall_times = walls,
+        simulated_time = simulation.engine.now,
+        trips = len(results),
+        messages = simulation.messages,
+        simulated_per_second = simulation.engine.now / wall,
+        messages_per_second = simulation.messages / wall,
+        peak_memory_mb = peak / 1024,
+    )
+
+
+def run(cases, repeat = REPEAT):
+    ''' Measures each case in a new process. '''
+
+    context = multiprocessing.get_context('spawn')
+    measures = list()
+    for case in cases:
+        with ProcessPoolExecutor(max_workers = 1, mp_context = context) as pool:
+            measures.append(pool.submit(measure, case, repeat).result())
+        print_measure(measures[-1])
+    return measures
+
+
+def print_measure(measure):
+    walls = measure['wall_times']
+    print('{:<55} {:>10.1f} sim-s/s {:>12.0f} msg/s {:>8.1f} MB {:>6.1f}% spread'.format(
+        key(measure),
+        measure['simulated_per_second'],
+        measure['messages_per_second'],
+        measure['peak_memory_mb'],
+        100 * (max(walls) - min(walls)) / min(walls),
+    ))
+
+
+def compare(measures, baseline, tolerance = 0.2):
+    ''' Compares the measures with a baseline.
+
+    Returns
+    -------
+    list
+        The keys of the cases that are slower than the baseline by more than
+        the tolerance.
+    '''
+
+    stored = {key(measure): measure for measure in baseline['measures']}
+    regressions = list()
+    for measure in measures:
+        name = key(measure)
+        if name not in stored:
+            continue
+        ratio = measure['simulated_per_second'] / stored[name]['simulated_per_second']
+        flag = ''
+        if ratio < 1 - tolerance:
+            flag = ' REGRESSION'
+            regressions.append(name)
+        print('{:<55} {:>6.2f}x{}'.format(name, ratio, flag))
+    return regressions
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmarks the simulation of the BRT corridor.')
+    parser.add_argument('-o', '--output', default = None, help = 'the JSON file where the measures are saved')
+    parser.add_argument('-b', '--baseline', nargs = '?', const = BASELINE, default = None, help = 'a JSON file of measures to compare with (default = benchmarks/baseline.json)')
+    parser.add_argument('-t', '--tolerance', type = float, default = 0.2, help = 'the tolerated slowdown (0.2 = 20%%)')
+    parser.add_argument('-m', '--manager', nargs = '+', default = MANAGERS, help = 'the managers of the semaphores')
+    parser.add_argument('-r', '--repeat', type = int, default = REPEAT, help = 'the number of runs of each case')
+    parser.add_argument('--quick', action = 'store_true', help = 'runs only the first two values of each scale')
+    args = parser.parse_args(argv)
+
+    scales = SCALES
+    if args.quick:
+        scales = {name: values[:2] for name, values in SCALES.items()}
+    measures = run(cases(scales, args.manager), args.repeat)
+
+    if args.output != None:
+        with open(args.output, 'w') as output:
+            json.dump({
+                'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'repeat': args.repeat,
+                'measures': measures,
+            }, output, indent = 4)
+
+    if args.baseline != None:
+        with open(args.baseline) as source:
+            regressions = compare(measures, json.load(source), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
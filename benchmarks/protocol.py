@@ -0,0 +1,143 @@
+'''
+Protocol Benchmark
+------------------
+
+Measures the latency of the round trips of the behaviour
+tralhoto.protocol.Request between two agents of PADE in the same process, with
+the messages delivered in the mailboxes of the agents (tralhoto.transport) and
+through the network of PADE (config.MAILBOX = False).
+
+A Pinger agent sends HOW_MANY_TIME requests, one at a time, to an Echo agent,
+which answers each of them as the stations do. Each transport runs in a new
+process, since the reactor of PADE can not be restarted.
+
+Run with:
+
+    python benchmarks/protocol.py --number 1000
+
+@author: @italocampos
+'''
+
+import os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pade.behaviours.types import OneShotBehaviour
+from pade.acl.messages import ACLMessage
+
+from tralhoto.transport import LocalAgent
+from tralhoto.protocol import Request, Router
+from tralhoto import config, codec
+
+import argparse, multiprocessing, time
+import numpy
+
+
+TRANSPORTS = {
+    'mailbox': True,
+    'network': False,
+}
+
+
+def answer(agent, message):
+    ''' Answers a request of the Pinger, as the stations do. '''
+
+    reply = message.create_reply()
+    reply.set_performative(ACLMessage.INFORM)
+    reply.set_ontology('WAIT_FOR_X_SECONDS')
+    reply.set_content(codec.encode('WAIT_FOR_X_SECONDS', {
+        'time': 12.0,
+        'location': 146,
+        'name': 'echo',
+    }))
+    agent.send(reply)
+
+
+
+class Ping(OneShotBehaviour):
+    ''' Measures the round trips of the requests to the Echo agent. '''
+
+    def action(self):
+        agent = self.agent
+        # Waits the Echo agent to start
+        self.wait(1)
+
+        latencies = list()
+        for _ in range(agent.number):
+            message = ACLMessage(ACLMessage.REQUEST)
+            message.set_ontology('HOW_MANY_TIME')
+            message.set_content(codec.encode('HOW_MANY_TIME', {'side': 'A'}))
+            message.add_receiver(agent.echo)
+
+            start = time.perf_counter()
+            request = Request(agent, message)
+            agent.add_behaviour(request)
+            self.wait_return(request)
+            latencies.append(time.perf_counter() - start)
+
+        agent.results.put(latencies)
+        from twisted.internet import reactor
+        reactor.callFromThread(reactor.stop)
+
+
+
+class Echo(LocalAgent):
+
+    def setup(self):
+        self.add_behaviour(Router(self, {(ACLMessage.REQUEST, 'HOW_MANY_TIME'): answer}))
+
+
+
+class Pinger(LocalAgent):
+
+    def __init__(self, aid, echo, number, results):
+        super().__init__(aid)
+        self.echo = echo
+        self.number = number
+        self.results = results
+
+
+    def setup(self):
+        self.add_behaviour(Ping(self))
+
+
+
+def measure(transport, number, results):
+    ''' Runs the agents of a transport in this process. '''
+
+    from pade.misc.utility import start_loop
+
+    config.MAILBOX = TRANSPORTS[transport]
+    echo = Echo('echo')
+    start_loop([echo, Pinger('pinger', echo.aid, number, results)])
+
+
+def run(transport, number):
+    ''' Runs a transport in a new process and returns the latencies of its
+    round trips (seconds). '''
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target = measure, args = (transport, number, results))
+    process.start()
+    latencies = results.get()
+    process.join()
+    return numpy.array(latencies)
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Measures the round trips of the requests between the agents.')
+    parser.add_argument('-n', '--number', type = int, default = 1000, help = 'the number of round trips')
+    parser.add_argument('-t', '--transport', nargs = '+', default = list(TRANSPORTS), choices = list(TRANSPORTS), help = 'the transports to measure')
+    args = parser.parse_args(argv)
+
+    print('{:<10} {:>12} {:>12} {:>12} {:>12}'.format('transport', 'mean', 'p50', 'p99', 'round/s'))
+    for transport in args.transport:
+        latencies = run(transport, args.number)
+        print('{:<10} {:>12} {:>12} {:>12} {:>12.0f}'.format(
+            transport,
+            *['%.1f us' % (value * 1e6) for value in [latencies.mean(), numpy.percentile(latencies, 50), numpy.percentile(latencies, 99)]],
+            1 / latencies.mean()))
+
+
+if __name__ == '__main__':
+    main()
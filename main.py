@@ -3,118 +3,105 @@ Main Module
 -----------
 
 This module initiates the system. Here the agents are instantiated and the
-simulation data are passed to the agents.
+simulation data are passed to the agents. The agents are created by the
+function scenario(), so this module can be imported without side effects (and
+without PADE, which is only imported to create the agents).
 
 @author: @italocampos
 '''
 
-from tralhoto.agent import Bus, Station, Semaphore
+from tralhoto.sink import open_sink
+from tralhoto.flow import Flow
+from tralhoto.headway import Dispatcher
 from tralhoto import config
-from pade.misc.utility import start_loop
 import data
 
 
-# Creating the road vector
-road = [[[], None] for _ in range(205)]
-
-agents = list()
-
-# Creating the Station agents
-for i, station in enumerate(data.stations):
-    agents.append(Station(
-        aid = 'station-%d' % i,
-        group = station['group'],
-        location = int(station['location'] * 10) + 6,
-        road = road,
-        side = station['side'],
-        name = station['name'],
-        proximity_factor = 5
-    ))
-
-# Creating the Semaphore agents
-for i, semaphore in enumerate(data.semaphores):
-    agents.append(Semaphore(
-        aid = 'semaphore-%d' % i,
-        group = semaphore['group'],
-        location = int(semaphore['location'] * 10) + 6,
-        road = road,
-        perimeter = semaphore['perimeter'],
-        proximity_factor = 2,
-    ))
-
-# Creating the Bus agents
-agents.extend([
-    Bus(aid = 'bus-0',
-        road = road,
-        name = 'TB0 Maracacuera São Brás',
-        velocity = config.BUS_VELOCITY[0],
-        n_simulations = 5,
-        start_time = config.SECOND * 60 * 5, # Starts at simulation minute 5
-    ),
-    Bus(aid = 'bus-1',
-        road = road,
-        name = 'TB1 Maracacuera São Brás',
-        velocity = config.BUS_VELOCITY[1],
-        n_simulations = 5,
-        start_time = config.SECOND * 60 * 15, # Starts at simulation minute 15
-    ),
-    Bus(aid = 'bus-2',
-        road = road,
-        name = 'TB2 Maracacuera São Brás',
-        velocity = config.BUS_VELOCITY[2],
-        n_simulations = 5,
-        start_time = config.SECOND * 60 * 25,
-    ),
-    Bus(aid = 'bus-3',
-        road = road,
-        name = 'TB3 Maracacuera São Brás',
-        velocity = config.BUS_VELOCITY[3],
-        n_simulations = 5,
-        start_time = config.SECOND * 60 * 35,
-    ),
-    Bus(aid = 'bus-4',
-        road = road,
-        name = 'TB4 Maracacuera São Brás',
-        velocity = config.BUS_VELOCITY[4],
-        n_simulations = 5,
-        start_time = config.SECOND * 60 * 45,
-    ),
-    Bus(aid = 'bus-5',
-        road = road,
-        name = 'TB5 Maracacuera São Brás',
-        velocity = config.BUS_VELOCITY[0],
-        n_simulations = 5,
-        start_time = config.SECOND * 60 * 55,
-    ),
-    Bus(aid = 'bus-6',
-        road = road,
-        name = 'TB6 Maracacuera São Brás',
-        velocity = config.BUS_VELOCITY[1],
-        n_simulations = 5,
-        start_time = config.SECOND * 60 * 65,
-    ),
-    Bus(aid = 'bus-7',
-        road = road,
-        name = 'TB7 Maracacuera São Brás',
-        velocity = config.BUS_VELOCITY[2],
-        n_simulations = 5,
-        start_time = config.SECOND * 60 * 75,
-    ),
-    Bus(aid = 'bus-8',
-        road = road,
-        name = 'TB8 Maracacuera São Brás',
-        velocity = config.BUS_VELOCITY[3],
-        n_simulations = 5,
-        start_time = config.SECOND * 60 * 85,
-    ),
-    Bus(aid = 'bus-9',
-        road = road,
-        name = 'TB9 Maracacuera São Brás',
-        velocity = config.BUS_VELOCITY[4],
-        n_simulations = 5,
-        start_time = config.SECOND * 60 * 95,
-    ),
-])
+def scenario(road_size = 205, n_simulations = 5, n_buses = 10, sink = None):
+    ''' Creates the agents of the BRT corridor.
+
+    Parameters
+    ----------
+    road_size : int, optional
+        The number of cells of the road vector. Default = 205.
+    n_simulations : int, optional
+        The number of trips of each bus. Default = 5.
+    n_buses : int, optional
+        The number of buses in the corridor. Default = 10.
+    sink : tralhoto.sink.Sink, optional
+        The sink shared by the buses to store the results of the trips.
+        Default = a sink of the file config.RESULTS.
+
+    Returns
+    -------
+    list
+        The agents of the corridor.
+    '''
+
+    # The agents are built over PADE, which is only imported here
+    from tralhoto.agent import Bus, Station, Semaphore
+
+    # Seeding the random generators
+    config.seed(config.SEED)
+
+    # Creating the road vector
+    road = [[[], None] for _ in range(road_size)]
+
+    agents = list()
+
+    # Generating the passenger flow tables of the stations
+    flow = Flow(len(data.stations), seed = config.SEED)
+
+    # Creating the dispatcher that keeps the headways of the buses
+    dispatcher = Dispatcher()
+
+    # Creating the sink shared by the buses to store the results of the trips
+    if sink == None:
+        sink = open_sink(config.RESULTS)
+
+    # Creating the Station agents
+    for i, station in enumerate(data.stations):
+        agents.append(Station(
+            aid = 'station-%d' % i,
+            group = station['group'],
+            location = int(station['location'] * 10) + 6,
+            road = road,
+            side = station['side'],
+            name = station['name'],
+            proximity_factor = 5,
+            flow = flow,
+        ))
+
+    # Creating the Semaphore agents
+    for i, semaphore in enumerate(data.semaphores):
+        agents.append(Semaphore(
+            aid = 'semaphore-%d' % i,
+            group = semaphore['group'],
+            location = int(semaphore['location'] * 10) + 6,
+            road = road,
+            perimeter = semaphore['perimeter'],
+            proximity_factor = 2,
+        ))
+
+    # Creating the Bus agents. The first bus starts at the simulation minute 5
+    # and the next ones each 10 minutes
+    for i in range(n_buses):
+        agents.append(Bus(
+            aid = 'bus-%d' % i,
+            road = road,
+            name = 'TB%d Maracacuera São Brás' % i,
+            velocity = config.BUS_VELOCITY[i % len(config.BUS_VELOCITY)],
+            n_simulations = n_simulations,
+            sink = sink,
+            dispatcher = dispatcher,
+            start_time = config.SECOND * 60 * (5 + 10 * i),
+        ))
+
+    return agents
+
 
 if __name__ == '__main__':
-    start_loop(agents)
\ No newline at end of file
+    # The runtime of PADE is only imported to start the agents
+    from pade.misc.utility import start_loop
+
+    start_loop(scenario())
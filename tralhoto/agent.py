@@ -3,26 +3,27 @@ Agent Module
 ------------
 
 This module models the agents of the system. Here are defined the entire 
-tructure of the agents and their first actions after instantiated.
+tructure of the agents and their first actions after instantiated. The state
+and the rules of the agents are defined in the module tralhoto.model.
 
 @author: @italocampos
 '''
 
-from pade.core.agent import Agent
+from tralhoto.transport import LocalAgent
 
-from tralhoto.board import Board
+from tralhoto.model import BusModel, StationModel, SemaphoreModel
+from tralhoto.sink import CSVSink
 from tralhoto import config
+from tralhoto.protocol import Router
 from tralhoto.behaviour.bus import WaitBefore
-from tralhoto.behaviour.station import BusListener
-from tralhoto.behaviour.semaphore import BoardManager
-from tralhoto.behaviour.semaphore import OpeningRequestsListener
-from tralhoto.behaviour.semaphore import ConfirmationsListener
-from tralhoto.behaviour.semaphore import TraditionalManager
+from tralhoto.behaviour.station import ROUTES as STATION_ROUTES
+from tralhoto.behaviour.semaphore import PolicyManager
+from tralhoto.behaviour.semaphore import ROUTES as SEMAPHORE_ROUTES
 
-import random, threading
+import threading, time
 
 
-class Semaphore(Agent):
+class Semaphore(SemaphoreModel, LocalAgent):
     ''' The class that models the agent Semaphore.
 
     The semaphores can be of three types, according with the degree of traffic
@@ -48,19 +49,24 @@ class Semaphore(Agent):
         define the area to start the communication with the buses. Default = 2.
     perimeter : str
         Describes the perimeter correspondent to this semaphore.
-    requests : int
-        The number of non-attended opening requests for this semaphores.
+    ledger : tralhoto.ledger.Ledger
+        The non-attended opening requests of the buses.
     new_request : threading.Event
         An event object that sinalizes when a new request arrives for this
         Semaphore.
+    attended : threading.Event
+        An event object that sinalizes when all the requests for this
+        Semaphore were attended.
     MAX_OPENING_TIME : float
         The max time that this semaphore can remain open for the BRT bus
         before closes.
     MIN_CLOSING_TIME : float
         The minimum time that this semaphore must wait before open again.
+    policy : tralhoto.policy.Policy
+        The policy that controls the Board of this semaphore.
     '''
 
-    def __init__(self, aid, group, location, road, proximity_factor = 3, perimeter = None):
+    def __init__(self, aid, group, location, road, proximity_factor = 3, perimeter = None, policy = None):
         '''
         Parameters
         ----------
@@ -79,72 +85,32 @@ class Semaphore(Agent):
             define the area to start the communication with the buses. Default = 2.
         perimeter : str, optional
             Describes the perimeter correspondent to this semaphore.
+        policy : str, optional
+            The name of the policy of this semaphore ('board', 'traditional',
+            'actuated', 'green_wave' or 'eta'). Default = the policy of its
+            group in config.SEMAPHORE_POLICY.
         '''
 
-        super().__init__(aid)
-        self.group = group
-        self.location = location
-        self.road = road
-        self.proximity_factor = proximity_factor
-        self.perimeter = perimeter
-        self.requests = 0
+        LocalAgent.__init__(self, aid)
+        SemaphoreModel.__init__(self, group, location, road, proximity_factor, perimeter, policy)
         self.new_request = threading.Event()
-
-        # Setting the opening and closing times according with the config file
-        self.MAX_OPENING_TIME = config.SEMAPHORE_MAX_OPENING_TIME[group]
-        self.MIN_CLOSING_TIME = config.SEMAPHORE_MIN_CLOSING_TIME[group]
+        self.attended = threading.Event()
+        self.attended.set()
     
 
     def setup(self):
         ''' Executes the prior actions for the agent. '''
 
-        # Sets the locations of the proximity sensor
-        self.road[self.location - self.proximity_factor][0].append({
-          'aid': self.aid,
-          'type': 'semaphore',
-          'side': 'A',
-        })
-        self.road[self.location + self.proximity_factor][0].append({
-          'aid': self.aid,
-          'type': 'semaphore',
-          'side': 'B',
-        })
-
-        # Sets the location of the Board of this semaphore
-        self.road[self.location][1] = Board()
-
-        # Initiates listener behaviours
-        self.add_behaviour(BoardManager(self))
-        self.add_behaviour(ConfirmationsListener(self))
-        self.add_behaviour(OpeningRequestsListener(self))
-
-        # Adds traditional behaviour
-        #self.add_behaviour(TraditionalManager(self))
-    
-
-    @property
-    def board(self):
-        ''' A shortcut to access the Board of this Semaphore.
-
-        Returns
-        -------
-        Board
-            The loacation of the read with the local Board.
-        '''
-
-        return self.road[self.location][1]
-    
+        # Sets the proximity sensors and the Board in the road
+        self.place()
 
-    def __str__(self):
-        return '{per}\nLocation: {loc}, #{gp}'.format(
-            per = self.perimeter,
-            loc = self.location,
-            gp = self.group,
-        )
+        # Initiates the policy and the reader of the requests of the buses
+        self.add_behaviour(PolicyManager(self))
+        self.add_behaviour(Router(self, SEMAPHORE_ROUTES))
 
 
 
-class Station(Agent):
+class Station(StationModel, LocalAgent):
     ''' The class that models the agent Station.
 
     The station can be of three types, according with their lotation degree.
@@ -175,7 +141,7 @@ class Station(Agent):
         The data of passengers flow between stations and buses.
     '''
 
-    def __init__(self, aid, group, location, road, side = None, proximity_factor = 5, name = None):
+    def __init__(self, aid, group, location, road, side = None, proximity_factor = 5, name = None, flow = None):
         '''
         aid : pade.core.aid.AID
             The AID of this agent
@@ -195,61 +161,29 @@ class Station(Agent):
             = 2.
         name : str, optional
             The name of this Station.
+        flow : tralhoto.flow.Flow, optional
+            The flow tables of the run.
         '''
 
-        super().__init__(aid)
-        self.name = name
-        self.location = location
-        self.group = group
-        self.proximity_factor = proximity_factor
-        self.road = road
-        self.side = side
-
-        # Generating discrete values to simulate the passenger movimentation
-        self.data = [round(x) for x in config.scenario()]
+        LocalAgent.__init__(self, aid)
+        StationModel.__init__(self, group, location, road, side, proximity_factor, name, flow)
 
 
     def setup(self):
         ''' Executes the prior actions for the agent. '''
 
-        # Sets the locations of the proximity sensor
-        self.road[self.location - self.proximity_factor][0].append({
-          'aid': self.aid,
-          'type': 'station',
-          'side': 'A',
-        })
-        self.road[self.location + self.proximity_factor][0].append({
-          'aid': self.aid,
-          'type': 'station',
-          'side': 'B',
-        })
-
-        # Adding behaviour to listen the resquests from buses
-        self.add_behaviour(BusListener(self))
-
-
-    def wait_time(self):
-        ''' Returns the time that the bus must stay in this station.
-
-        Returns
-        -------
-        float
-            The amout of time that the bus must wait in this Station.
-        '''
-
-        return round(random.choice(self.data) * (1 / (1 + self.group))) * config.TIME_PER_PASSENGER
+        # Sets the proximity sensors in the road
+        self.place()
 
+        # The service day starts with the agent (in the clock of the answers)
+        self.epoch = time.monotonic() / config.SECOND
 
-    def __str__(self):
-        return '{name}\nLocation: {loc}, #{gp}'.format(
-            name = self.name,
-            loc = self.location,
-            gp = self.group,
-        )
+        # Adding behaviour to answer the resquests from buses
+        self.add_behaviour(Router(self, STATION_ROUTES))
 
 
 
-class Bus(Agent):
+class Bus(BusModel, LocalAgent):
     ''' The class that models the agent Bus.
 
     Properties
@@ -267,8 +201,8 @@ class Bus(Agent):
     side : str ('A' or 'B')
         The current side of the road that this Bus is traveling.
     semaphore_fifo : list
-        A list that implements a FIFO behaviour to store the addresses of the
-        semaphores that were messaged.
+        The addresses of the semaphores that were messaged and whose Boards
+        were not passed yet, in the order they were messaged.
     next_station : dict
         Stores data about the next station to stop.
     n_semaphores : int
@@ -283,11 +217,15 @@ class Bus(Agent):
         The time when this bus will start to run. Default = 10.
     n_simulations : int, optional
         The number of times that this bus will trip. Default = 10
+    sink : tralhoto.sink.Sink
+        The sink that stores the results of the trips.
+    dispatcher : tralhoto.headway.Dispatcher
+        Measures the headways of the buses and holds them in the stations.
     _residual : float
         The residual value after computed the next location of this Bus.
     '''
 
-    def __init__(self, aid, road, name = None, velocity = 45, start_time = 10, n_simulations = 10):
+    def __init__(self, aid, road, name = None, velocity = 45, start_time = 10, n_simulations = 10, sink = None, dispatcher = None):
         '''
         aid : pade.core.aid.AID
             The AID of this agent
@@ -303,91 +241,23 @@ class Bus(Agent):
             The time when this bus will start to run. Default = 10.
         n_simulations : int, optional
             The number of times that this bus will trip. Default = 10
+        sink : tralhoto.sink.Sink, optional
+            The sink that stores the results of the trips, usually shared by
+            all the buses. Default = a CSV file named after the bus.
+        dispatcher : tralhoto.headway.Dispatcher, optional
+            The dispatcher shared by the buses.
         '''
     
-        super().__init__(aid)
-        self.name = name
-        self.velocity = velocity
-        self.road = road
-        self.start_time = start_time
-        self.n_simulations = n_simulations
-        self.location = 0
-        self.side = 'A'
-        self.next_station = {
-            'location': None,
-            'wait_time': 0,
-            'name': None
-        }
-        self.semaphore_fifo = list()
-        self.semaphore_time = 0.0
-        self.trip_time = 0.0
-        self.n_semaphores = 0
-        self.burned_stations = 0
-        self._residual = 0.0
+        LocalAgent.__init__(self, aid)
+        BusModel.__init__(self, road, name, velocity, start_time, n_simulations, dispatcher)
+        self.sink = sink
 
 
     def setup(self):
         ''' Executes the prior actions for the agent. '''
 
+        if self.sink == None:
+            self.sink = CSVSink('%s.csv' % self.aid.getLocalName())
+
         # Adding behaviour to move the bus
         self.add_behaviour(WaitBefore(self, self.start_time, self.n_simulations))
-
-
-    def trip(self):
-        ''' Calculates the number of cells in the road that this Bus will reach
-        after 1 second of simulation. This value variates according with the
-        velocity of this Bus.
-
-        This method also automatically increments the trip time.
-
-        Returns
-        -------
-        list
-            A list with the positions to forward.
-        '''
-
-        # Converting the velocity from km/h to m/s
-        ms = self.velocity / 3.6
-
-        # Gets the number of cells to step
-        n = int((self._residual + ms) / 100)
-        # Updates the residual value
-        self._residual = (self._residual + ms) % 100
-        # Increments the total trip time
-        self.trip_time += 1
-        return [self.step() for _ in range(n)]
-    
-
-    def step(self):
-        ''' Return the next location for the Bus.
-
-        Returns
-        -------
-        int
-            The position of the next location of the Bus
-        '''
-
-        if self.side == 'A':
-            if self.location + 1 < len(self.road):
-                self.location += 1
-            else:
-                self.side = 'B'
-                self.location -= 1
-        
-        elif self.side == 'B':
-            if self.location - 1 >= 0:
-                self.location -= 1
-            else:
-                self.side = 'A'
-                self.location += 1
-        
-        return self.location
-    
-
-    def __str__(self):
-        return '{name}\n{vel} km/h #{pos} {side}'.format(
-            name = self.name,
-            vel = self.velocity,
-            pos = self.location,
-            side = '>>' if self.side == 'A' else '<<'
-        )
\ No newline at end of file
@@ -0,0 +1,554 @@
+'''
+Asyncio Module
+--------------
+
+This module contains an execution mode of the system where all the agents run
+as coroutines on a single asyncio event loop, instead of one PADE thread per
+behaviour. The time runs as in the PADE runtime (each simulated second lasts
+config.SECOND seconds), but waiting agents cost no thread, so thousands of
+agents fit in one process.
+
+The agents are built over the classes of tralhoto.model and their coroutines
+follow the behaviours of tralhoto.behaviour: the bus runs (Run), asks the
+stations how long to stop (MessageStation, with the request-response protocol
+of tralhoto.protocol.Request), requests and confirms the semaphores
+(MessageSemaphore, ConfirmSemaphore); the stations answer (answer_bus); and
+the semaphores listen the buses and manage their Boards (PolicyManager).
+
+@author: @italocampos
+'''
+
+from tralhoto.model import BusModel, StationModel, SemaphoreModel
+from tralhoto.road import RoadIndex, STATION, SEMAPHORE
+from tralhoto.engine import populate
+from tralhoto.flow import Flow
+from tralhoto.headway import Dispatcher
+from tralhoto.policy import POLICIES, OPEN, CLOSE, WAIT, REQUEST, ATTENDED, NOW
+from tralhoto import config
+
+import asyncio, itertools
+
+
+class Message(object):
+    ''' A message exchanged by the agents of the asyncio runtime.
+
+    Properties
+    ----------
+    performative : str
+        The performative of the message (REQUEST, INFORM or REFUSE).
+    ontology : str
+        The ontology of the message.
+    content : object
+        The content of the message.
+    sender : str
+        The identifier of the sender.
+    receiver : str
+        The identifier of the receiver.
+    conversation_id : int
+        The identifier of the conversation of the message.
+    '''
+
+    REQUEST = 'request'
+    INFORM = 'inform'
+    REFUSE = 'refuse'
+
+    def __init__(self, performative, ontology = None, content = None, receiver = None):
+        self.performative = performative
+        self.ontology = ontology
+        self.content = content
+        self.sender = None
+        self.receiver = receiver
+        self.conversation_id = None
+
+
+    def create_reply(self):
+        ''' Returns a message addressed to the sender of this message, in the
+        same conversation. '''
+
+        reply = Message(self.performative, receiver = self.sender)
+        reply.conversation_id = self.conversation_id
+        return reply
+
+
+
+class AsyncAgent(object):
+    ''' The communication of the agents of the asyncio runtime.
+
+    Properties
+    ----------
+    aid : str
+        The identifier of this agent.
+    runtime : Runtime
+        The runtime that executes this agent.
+    inbox : asyncio.Queue
+        The messages received by this agent.
+    _pending : dict
+        The futures of the requests of this agent waiting for a response,
+        indexed by the identifier of the conversation.
+    '''
+
+    def attach(self, aid, runtime):
+        ''' Attaches this agent to a runtime.
+
+        Parameters
+        ----------
+        aid : str
+            The identifier of this agent.
+        runtime : Runtime
+            The runtime that executes this agent.
+        '''
+
+        self.aid = aid
+        self.runtime = runtime
+        self.inbox = None
+        self._pending = dict()
+
+
+    def send(self, message):
+        ''' Sends a message. '''
+
+        message.sender = self.aid
+        self.runtime.deliver(message)
+
+
+    def receive(self, message):
+        ''' Receives a message. The responses of the requests are passed to
+        the request that waits for them. '''
+
+        future = self._pending.pop(message.conversation_id, None)
+        if future != None:
+            future.set_result(message)
+        else:
+            self.inbox.put_nowait(message)
+
+
+    async def request(self, message):
+        ''' Sends a request and waits for its response, as the behaviour
+        tralhoto.protocol.Request.
+
+        Parameters
+        ----------
+        message : Message
+            The request to send.
+
+        Returns
+        -------
+        Message
+            The response.
+        '''
+
+        message.conversation_id = next(self.runtime.conversations)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message.conversation_id] = future
+        self.send(message)
+        return await future
+
+
+    def behaviours(self):
+        ''' Returns the coroutines of the behaviours of this agent. '''
+
+        return []
+
+
+
+class AsyncStation(StationModel, AsyncAgent):
+    ''' A Station of the asyncio runtime. '''
+
+    def behaviours(self):
+        return [self.bus_listener()]
+
+
+    async def bus_listener(self):
+        ''' Answers the buses inside the proximity area (answer_bus). '''
+
+        while True:
+            message = await self.inbox.get()
+            if message.ontology != 'HOW_MANY_TIME' or message.performative != Message.REQUEST:
+                continue
+
+            reply = message.create_reply()
+            if self.serves(message.content['side']):
+                reply.ontology = 'WAIT_FOR_X_SECONDS'
+                reply.performative = Message.INFORM
+                reply.content = {
+                    'time' : self.wait_time(self.runtime.now()),
+                    'location' : self.location,
+                    'name': self.name,
+                }
+            else:
+                reply.ontology = 'INCOMPATIBLE_SIDE'
+                reply.performative = Message.REFUSE
+            self.send(reply)
+
+
+
+class AsyncSemaphore(SemaphoreModel, AsyncAgent):
+    ''' A Semaphore of the asyncio runtime.
+
+    Properties
+    ----------
+    new_request : asyncio.Event
+        Sinalizes when a new request arrives for this Semaphore.
+    attended : asyncio.Event
+        Sinalizes when all the requests for this Semaphore were attended.
+    '''
+
+    def behaviours(self):
+        self.new_request = asyncio.Event()
+        self.attended = asyncio.Event()
+        self.attended.set()
+        return [self.requests_listener(), self.policy_manager()]
+
+
+    async def requests_listener(self):
+        ''' Counts the opening requests and the confirmations of the buses
+        (opening_request and confirmation). '''
+
+        while True:
+            message = await self.inbox.get()
+            if message.ontology == 'OPEN' and message.performative == Message.REQUEST:
+                self.request(message.sender, self.runtime.now(), message.content['eta'])
+            elif message.ontology == 'CONFIRMATION' and message.performative == Message.INFORM:
+                self.confirm(message.sender)
+
+
+    async def policy_manager(self):
+        ''' Executes the commands of the policy of this Semaphore
+        (PolicyManager). '''
+
+        commands = self.policy.commands()
+        value = None
+        while True:
+            command, argument = commands.send(value)
+            value = None
+            if command == OPEN:
+                self.board.open()
+            elif command == CLOSE:
+                self.board.color = 'AMBER'
+                await self.runtime.sleep(self.board.security_time)
+                self.board.color = 'RED'
+            elif command == WAIT:
+                await self.runtime.sleep(argument)
+            elif command == REQUEST:
+                self.ledger.expire(self.runtime.now())
+                await self.new_request.wait()
+            elif command == ATTENDED:
+                try:
+                    await asyncio.wait_for(self.attended.wait(), argument * self.runtime.second if argument != None else None)
+                    value = True
+                except asyncio.TimeoutError:
+                    value = False
+                    self.ledger.expire(self.runtime.now())
+            elif command == NOW:
+                value = self.runtime.now()
+
+
+
+class AsyncBus(BusModel, AsyncAgent):
+    ''' A Bus of the asyncio runtime. '''
+
+    def behaviours(self):
+        return [self.run()]
+
+
+    async def run(self):
+        ''' Runs the bus on the road (WaitBefore and Run). '''
+
+        runtime = self.runtime
+        await runtime.sleep(self.start_time)
+        self.road_index = runtime.road_index
+
+        # The simulated time up to which the bus moved. When the loop lags
+        # behind the clock, the bus steps all the seconds elapsed since then
+        # at once, so it runs in the same time of the semaphores and stations
+        moved = runtime.now()
+
+        simulation = 0
+        while True:
+            ticks = max(1, int(runtime.now() - moved))
+            moved += ticks
+            cells = [cell for _ in range(ticks) for cell in self.trip()]
+            for index in self.road_index.events(cells, self.side):
+
+                # Checks if this is a point of stop (a station)
+                if index == self.next_station['location']:
+                    start = runtime.now()
+                    await runtime.sleep(self.next_station['wait_time'])
+                    self.trip_time += runtime.now() - start
+                    moved += runtime.now() - start
+
+                # Send messages for any compatible agents in this point
+                for kind, aid in self.road_index.sensors[self.side].get(index, ()):
+                    if kind == STATION:
+                        batch = self.road_index.batch(self.side, index, aid)
+                        if batch:
+                            runtime.spawn(self.message_stations(batch))
+                        self.reach(aid, runtime.now())
+                    elif kind == SEMAPHORE:
+                        eta = self.eta(self.road_index.next_board(self.location, self.side))
+                        self.send(Message(Message.REQUEST, 'OPEN', {'location': self.location, 'eta': eta}, aid))
+                        self.semaphore_fifo.append(aid)
+
+                # Look at the Board of the semaphore
+                board = self.road_index.boards.get(index)
+                if board != None:
+                    if not board.is_opened():
+                        self.n_semaphores += 1
+                        # Sleeps until the Board becomes green
+                        start = runtime.now()
+                        await runtime.opened[board].wait()
+                        self.trip_time += runtime.now() - start
+                        self.semaphore_time += runtime.now() - start
+                        moved += runtime.now() - start
+                    for aid in self.leave(self.road_index.owners[index]):
+                        self.send(Message(Message.INFORM, 'CONFIRMATION', receiver = aid))
+
+                # Checks if the bus finished its trip
+                if self.side == 'B' and self.location == 0:
+                    runtime.finish(self, simulation)
+                    self.reset()
+                    simulation += 1
+                    if simulation >= self.n_simulations:
+                        return
+                    await runtime.sleep(10)
+                    moved = runtime.now()
+            await runtime.sleep(moved + 1 - runtime.now())
+
+
+    async def message_stations(self, aids):
+        ''' Asks the stations of a batch how long to stop (MessageStation). '''
+
+        messages = [Message(Message.REQUEST, 'HOW_MANY_TIME', {'side': self.side}, aid) for aid in aids]
+        responses = await asyncio.gather(*[self.request(message) for message in messages])
+
+        for aid, response in zip(aids, responses):
+            if response.ontology == 'WAIT_FOR_X_SECONDS':
+                content = response.content
+                self.cache(aid, (content['location'], content['time'], content['name']), self.runtime.now())
+            elif response.ontology == 'INCOMPATIBLE_SIDE':
+                self.cache(aid, (None, 0, None), self.runtime.now())
+
+
+
+class Runtime(object):
+    ''' Executes the agents as coroutines on a single asyncio event loop.
+
+    Properties
+    ----------
+    road : list
+        A list representing the road of BRT buses.
+    manager : str
+        The policy of all the semaphores (see tralhoto.policy), or None to
+        use the policy of each group in config.SEMAPHORE_POLICY.
+    second : float
+        The duration (in seconds of the wall clock) of a simulated second.
+    agents : dict
+        The agents of this runtime, indexed by their identifiers.
+    road_index : tralhoto.road.RoadIndex
+        The compiled events of the road.
+    opened : dict
+        Maps each Board of the road to an asyncio.Event set while the Board is
+        green.
+    conversations : itertools.count
+        Generates the identifiers of the conversations.
+    results : list
+        The results of the finished trips.
+    sink : tralhoto.sink.Sink
+        The sink that also stores the results, or None.
+    flow : tralhoto.flow.Flow
+        The flow tables of the stations, or None.
+    dispatcher : tralhoto.headway.Dispatcher
+        The dispatcher of the stations, or None.
+    '''
+
+    def __init__(self, road_size = 205, manager = 'board', seed = None, second = None, sink = None, flow = None, dispatcher = None):
+        '''
+        Parameters
+        ----------
+        road_size : int, optional
+            The number of cells of the road. Default = 205.
+        manager : str, optional
+            The policy of all the semaphores (see tralhoto.policy), or None to
+            use the policy of each group in config.SEMAPHORE_POLICY. Default =
+            'board'.
+        seed : int, optional
+            The seed of the random generators. Default = None.
+        second : float, optional
+            The duration of a simulated second. Default = config.SECOND.
+        sink : tralhoto.sink.Sink, optional
+            The sink that also stores the results. Default = None.
+        flow : tralhoto.flow.Flow, optional
+            The flow tables of the stations. Default = None (each station
+            draws its own table).
+        dispatcher : tralhoto.headway.Dispatcher, optional
+            The dispatcher that measures the headways of the buses and holds
+            them in the stations. Default = None.
+        '''
+
+        if manager != None and manager not in POLICIES:
+            raise(ValueError('The manager %s is not allowed to Runtime objects.' % manager))
+
+        config.seed(seed)
+        self.road = [[[], None] for _ in range(road_size)]
+        self.manager = manager
+        self.second = config.SECOND if second == None else second
+        self.agents = dict()
+        self.road_index = None
+        self.opened = dict()
+        self.conversations = itertools.count()
+        self.results = list()
+        self.sink = sink
+        self.flow = flow
+        self.dispatcher = dispatcher
+        self._start = None
+        self._tasks = set()
+
+
+    def add(self, agent, aid):
+        ''' Adds an agent to this runtime. '''
+
+        agent.attach(aid, self)
+        self.agents[aid] = agent
+        return agent
+
+
+    def add_station(self, aid, group, location, side = None, proximity_factor = 5, name = None):
+        ''' Creates a Station. The parameters are the same of
+        tralhoto.agent.Station. '''
+
+        return self.add(AsyncStation(group, location, self.road, side, proximity_factor, name, self.flow), aid)
+
+
+    def add_semaphore(self, aid, group, location, proximity_factor = 3, perimeter = None):
+        ''' Creates a Semaphore. The parameters are the same of
+        tralhoto.agent.Semaphore. '''
+
+        return self.add(AsyncSemaphore(group, location, self.road, proximity_factor, perimeter, self.manager), aid)
+
+
+    def add_bus(self, aid, name = None, velocity = 45, start_time = 10, n_simulations = 10):
+        ''' Creates a Bus. The parameters are the same of tralhoto.agent.Bus. '''
+
+        return self.add(AsyncBus(self.road, name, velocity, start_time, n_simulations, self.dispatcher), aid)
+
+
+    def deliver(self, message):
+        ''' Delivers a message to its receiver. '''
+
+        self.agents[message.receiver].receive(message)
+
+
+    def now(self):
+        ''' Returns the current time, in simulated seconds since the start of
+        the runtime, as the clock of tralhoto.engine. '''
+
+        return (asyncio.get_running_loop().time() - self._start) / self.second
+
+
+    async def sleep(self, seconds):
+        ''' Waits some simulated seconds. '''
+
+        await asyncio.sleep(seconds * self.second)
+
+
+    def spawn(self, coroutine):
+        ''' Runs a coroutine as a new task of the event loop. '''
+
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+
+    def finish(self, bus, simulation):
+        ''' Stores the results of a finished trip of a bus. '''
+
+        record = bus.record()
+        record.update(aid = bus.aid, simulation = simulation, time = self.now())
+        self.results.append(record)
+        if self.sink != None:
+            self.sink.write(record)
+
+
+    async def main(self):
+        ''' Sets up the agents and runs them until all the buses finish their
+        trips. '''
+
+        self._start = asyncio.get_running_loop().time()
+        for agent in self.agents.values():
+            if not isinstance(agent, BusModel):
+                agent.place()
+
+        self.road_index = RoadIndex(self.road)
+        for board in self.road_index.boards.values():
+            self.opened[board] = asyncio.Event()
+            board.add_listener(self.opened_listener(self.opened[board]))
+
+        buses = list()
+        for agent in self.agents.values():
+            agent.inbox = asyncio.Queue()
+            for behaviour in agent.behaviours():
+                task = self.spawn(behaviour)
+                if isinstance(agent, BusModel):
+                    buses.append(task)
+
+        await asyncio.gather(*buses)
+        for task in list(self._tasks):
+            task.cancel()
+        if self.sink != None:
+            self.sink.flush()
+        return self.results
+
+
+    def opened_listener(self, event):
+        ''' Returns a Board listener that keeps an asyncio.Event set while the
+        Board is green. '''
+
+        def listener(color):
+            if color == 'GREEN':
+                event.set()
+            else:
+                event.clear()
+        return listener
+
+
+    def run(self):
+        ''' Runs the agents in a new event loop.
+
+        Returns
+        -------
+        list
+            The results of the finished trips.
+        '''
+
+        return asyncio.run(self.main())
+
+
+
+def corridor(seed = None, manager = 'board', second = None, sink = None, **kwargs):
+    ''' Builds the BRT corridor modeled in main.py in the asyncio runtime.
+
+    Parameters
+    ----------
+    seed : int, optional
+        The seed of the random generators. Default = None.
+    manager : str, optional
+        The policy of all the semaphores, or None to use the policy of each
+        group in config.SEMAPHORE_POLICY. Default = 'board'.
+    second : float, optional
+        The duration of a simulated second. Default = config.SECOND.
+    sink : tralhoto.sink.Sink, optional
+        The sink that also stores the results. Default = None.
+    **kwargs
+        The parameters of tralhoto.engine.populate().
+
+    Returns
+    -------
+    Runtime
+        The runtime ready to run.
+    '''
+
+    import data
+
+    flow = Flow(len(data.stations), seed = seed)
+    return populate(Runtime(205, manager, seed, second, sink, flow, Dispatcher()), **kwargs)
@@ -9,12 +9,12 @@ This module contains the behaviours of the Bus agents.
 
 from pade.behaviours.types import TickerBehaviour, OneShotBehaviour, WakeUpBehaviour
 from pade.acl.messages import ACLMessage
-from pade.misc.utility import display
 
 from tralhoto.protocol import Request
-from tralhoto import config
+from tralhoto.road import RoadIndex, STATION, SEMAPHORE
+from tralhoto import config, codec, trace
 
-import pickle, color
+import time
 
 
 class WaitBefore(WakeUpBehaviour):
@@ -41,6 +41,8 @@ class WaitBefore(WakeUpBehaviour):
 
 
     def on_wake(self):
+        # All the agents were set up: compiles the events of the road
+        self.agent.road_index = RoadIndex(self.agent.road)
         self.agent.add_behaviour(Run(self.agent, config.SECOND, self.n_simulations))
 
 
@@ -80,63 +82,65 @@ class Run(TickerBehaviour):
 
 
     def on_tick(self):
-        for index in self.agent.trip():
-            display(self.agent, 'Triping the km %.1f.' % (index/10))
+        road_index = self.agent.road_index
+        for index in road_index.events(self.agent.trip(), self.agent.side):
+            if trace.enabled(trace.STEP):
+                trace.log(self.agent, trace.STEP, index)
 
             # Checks if this is a point of stop (a station)
             if index == self.agent.next_station['location']:
-                display(self.agent, color.yellow('STOP > ', 'bold') + self.agent.next_station['name'] + ' | %.1f s' % self.agent.next_station['wait_time'])
+                trace.log(self.agent, trace.STOP, self.agent.next_station['name'], self.agent.next_station['wait_time'])
                 self.agent.trip_time += self.agent.next_station['wait_time']
                 self.wait(self.agent.next_station['wait_time'] * config.SECOND)
 
             # Send messages for any compatible agents in this point
-            for address in self.agent.road[index][0]:
+            for kind, aid in road_index.sensors[self.agent.side].get(index, ()):
 
                 # If there is a station nearby 
-                if address['type'] == 'station' and address['side'] == self.agent.side:
-                    # > Send a message for the nearby station
-                    self.agent.add_behaviour(MessageStation(self.agent, address['aid']))
+                if kind == STATION:
+                    # > Send a message for the nearby station, or for all the
+                    # stations of its segment
+                    batch = road_index.batch(self.agent.side, index, aid)
+                    if batch:
+                        self.agent.add_behaviour(MessageStation(self.agent, batch))
+                    # > Stops in the station if its answer already arrived
+                    if self.agent.reach(aid.getLocalName(), time.monotonic() / config.SECOND):
+                        trace.log(self.agent, trace.BURNED, self.agent.next_station['name'])
 
                 # If there is a semaphore nearby
-                elif address['type'] == 'semaphore' and address['side'] == self.agent.side:
+                elif kind == SEMAPHORE:
                     # > Send a message for the nearby semaphore
-                    self.agent.add_behaviour(MessageSemaphore(self.agent, address['aid']))
-                    self.agent.semaphore_fifo.append(address['aid'])
+                    self.agent.add_behaviour(MessageSemaphore(self.agent, aid))
+                    self.agent.semaphore_fifo.append(aid)
 
             # Look at the Board of the semaphore
-            board = self.agent.road[index][1]
+            board = road_index.boards.get(index)
             if board != None:
                 if not board.is_opened():
-                    display(self.agent, color.red('STOP > ', 'bold') + 'Semaphore in #%d' % self.agent.location)
+                    trace.log(self.agent, trace.SEMAPHORE_STOP, self.agent.location)
                     self.agent.n_semaphores += 1
-                    while not board.is_opened():
-                        self.agent.trip_time += 1
-                        self.agent.semaphore_time += 1
-                        self.wait(config.SECOND)
-                self.agent.add_behaviour(ConfirmSemaphore(self.agent, self.agent.semaphore_fifo.pop(0)))
+                    # Sleeps until the Board becomes green
+                    start = time.monotonic()
+                    board.wait_opened()
+                    waited = (time.monotonic() - start) / config.SECOND
+                    self.agent.trip_time += waited
+                    self.agent.semaphore_time += waited
+                for aid in self.agent.leave(road_index.owners[index]):
+                    self.agent.add_behaviour(ConfirmSemaphore(self.agent, aid))
             
             # Checks if the bus finished its trip
             if self.agent.side == 'B' and self.agent.location == 0:
-                display(self.agent, color.green('FINISHED > ', 'bold') + 'Trip time: %.1f s' % self.agent.trip_time)
-                with open('%s.csv' % self.agent.aid.getLocalName(), 'a') as log:
-                #with open('logs/buses.csv', 'a') as log:
-                    log.write('{bus_name}, {velocity}, {tt}, {bs}, {sem_n}, {sem_t}\n'.format(
-                        bus_name = self.agent.name,
-                        velocity = self.agent.velocity,
-                        tt = self.agent.trip_time,
-                        bs = self.agent.burned_stations,
-                        sem_n = self.agent.n_semaphores,
-                        sem_t = self.agent.semaphore_time,
-                        ))
+                trace.log(self.agent, trace.FINISHED, self.agent.trip_time)
+                record = self.agent.record()
+                record.update(aid = self.agent.aid.getLocalName(), simulation = self.simulation)
+                self.agent.sink.write(record)
                 # Restart the counters
-                self.agent.burned_stations = 0
-                self.agent.trip_time = 0
-                self.agent.n_semaphores = 0
-                self.agent.semaphore_time = 0
+                self.agent.reset()
                 # Increments the simulation number
                 self.simulation += 1
                 if self.simulation >= self.n_simulations:
-                    display(self.agent, color.magenta('SIMULATION FINISHED > ', 'bold') + 'Check the file logs/%s.csv' % self.agent.aid.getLocalName())
+                    self.agent.sink.flush()
+                    trace.log(self.agent, trace.SIMULATION_FINISHED, self.agent.sink.path)
                     self._done = True
                 else:
                     # Aguarda 10 min antes de começar a viagem novamente.
@@ -151,62 +155,57 @@ class Run(TickerBehaviour):
 
 
 class MessageStation(OneShotBehaviour):
-    ''' Message the Station when inside de contact area.
+    ''' Message the Stations when inside de contact area. The Stations of a
+    segment are asked at once and their answers are cached by the Bus.
 
     Properties
     ----------
-    station : pade.core.aid.AID
-        The AID of the station to be messaged.
+    stations : tuple
+        The AIDs of the stations to be messaged.
     '''
 
-    def __init__(self, agent, station):
+    def __init__(self, agent, stations):
         '''
         Parameters
         ----------
         agent : tralhoto.agent.Bus
             The Bus agent that holds this behaviour.
-        station : pade.core.aid.AID
-            The AID of the Station to be messaged.
+        stations : tuple
+            The AIDs of the Stations to be messaged.
         '''
 
         super().__init__(agent)
-        self.station = station
+        self.stations = stations
 
 
     def action(self):
         # > Creates the message to send
         message = ACLMessage(ACLMessage.REQUEST)
         message.set_ontology('HOW_MANY_TIME')
-        message.set_content(pickle.dumps({'side': self.agent.side}))
-        message.add_receiver(self.station)
+        message.set_content(codec.encode('HOW_MANY_TIME', {'side': self.agent.side}))
+        for station in self.stations:
+            message.add_receiver(station)
         
         # > Calls a Request behaviour to deal with the responses
         request = Request(self.agent, message)
         self.agent.add_behaviour(request)
         # >> Waits for the Request returning
-        response = self.wait_return(request)[0]
-        
-        # > Checks the response 
-        if response.get_ontology() == 'WAIT_FOR_X_SECONDS':
-            content = pickle.loads(response.get_content())
-            #print(content)
-            self.agent.next_station['wait_time'] = content['time']
-            self.agent.next_station['location'] = content['location']
-            self.agent.next_station['name'] = content['name']
-
-            # Checks if this bus burned the location of the station
-            if self.agent.side == 'A' and content['location'] <= self.agent.location:
-                display(self.agent, color.red('BURNED > ', 'b') + content['name'])
-                self.agent.burned_stations += 1
-            elif self.agent.side == 'B' and content['location'] >= self.agent.location:
-                display(self.agent, color.red('BURNED > ', 'b') + content['name'])
-                self.agent.burned_stations += 1
-
-        elif response.get_ontology() == 'INCOMPATIBLE_SIDE':
-            self.agent.next_station['wait_time'] = 0 # Watis no time
-            self.agent.next_station['location'] = None
-            self.agent.next_station['name'] = None
+        responses = self.wait_return(request)
         
+        # > Checks the responses
+        for response in responses:
+            station = response.sender.getLocalName()
+            if response.get_ontology() == 'WAIT_FOR_X_SECONDS':
+                content = codec.decode('WAIT_FOR_X_SECONDS', response.get_content())
+                burned = self.agent.cache(station, (content['location'], content['time'], content['name']), time.monotonic() / config.SECOND)
+
+                # Checks if this bus burned the location of the station
+                if burned:
+                    trace.log(self.agent, trace.BURNED, content['name'])
+
+            elif response.get_ontology() == 'INCOMPATIBLE_SIDE':
+                self.agent.cache(station, (None, 0, None), time.monotonic() / config.SECOND) # Watis no time
+
 
 
 class MessageSemaphore(OneShotBehaviour):
@@ -236,6 +235,10 @@ class MessageSemaphore(OneShotBehaviour):
         # > Creates and sends the message to send
         message = ACLMessage(ACLMessage.REQUEST)
         message.set_ontology('OPEN')
+        message.set_content(codec.encode('OPEN', {
+            'location': self.agent.location,
+            'eta': self.agent.eta(self.agent.road_index.next_board(self.agent.location, self.agent.side)),
+        }))
         message.add_receiver(self.semaphore)
         self.send(message)
 
@@ -268,5 +271,6 @@ class ConfirmSemaphore(OneShotBehaviour):
         # > Creates and sends the message to send
         message = ACLMessage(ACLMessage.INFORM)
         message.set_ontology('CONFIRMATION')
+        message.set_content(codec.encode('CONFIRMATION', {'location': self.agent.location}))
         message.add_receiver(self.semaphore)
         self.send(message)
\ No newline at end of file
@@ -9,120 +9,98 @@ This module contains the behaviours of the Semaphore agents.
 
 from pade.behaviours.types import CyclicBehaviour
 from pade.acl.messages import ACLMessage
-from pade.acl.filters import Filter
-from pade.misc.utility import display
 
-from tralhoto import config
+from tralhoto.policy import OPEN, CLOSE, WAIT, REQUEST, ATTENDED, NOW
+from tralhoto import codec, config, trace
 
+import time
 
-class BoardManager(CyclicBehaviour):
-    ''' This behaviour manages the opening and closing of the board of this
-    Semaphore.
 
-    This behaviour is activated every time that the self.requests counter is
-    greater than zero.
-    '''
+class PolicyManager(CyclicBehaviour):
+    ''' This behaviour executes the commands of the policy of this Semaphore
+    (see tralhoto.policy), which opens and closes its board.
 
-    def action(self):
-        self.agent.new_request.wait()
-        self.open_board()
-    
+    Properties
+    ----------
+    commands : generator
+        The commands of the policy.
+    _value : object
+        The result of the last command, sent back to the policy.
+    '''
 
-    def close_board(self):
-        ''' Closes the board and locks the behaviour during a minimum time, as
-        is described in the config file.
+    def __init__(self, agent):
         '''
-
-        # Closes the board
-        self.agent.board.close()
-        # Waits for the minimum closing time
-        self.wait(self.agent.MIN_CLOSING_TIME * config.SECOND)
-    
-
-    def open_board(self):
-        ''' Opens the board and waits for the max opening time defined in the
-        config file.
-        
-        If all the requests were attended before the timeout, the board is
-        closed again. The same happens if the requests were not attended.
+        Parameters
+        ----------
+        agent : tralhoto.agent.Semaphore
+            The Semaphore agent that holds this behaviour.
         '''
 
-        # Opens the board
-        self.agent.board.open()
-        # Waits for the max opening time set in config file
-        for _ in range(self.agent.MAX_OPENING_TIME):
-            # Check every second if all the requests were attended
-            if self.agent.requests == 0:
-                break
-            self.wait(config.SECOND)
-        
-        self.close_board()
-
+        super().__init__(agent)
+        self.commands = agent.policy.commands()
+        self._value = None
 
 
-class OpeningRequestsListener(CyclicBehaviour):
-    ''' This behaviour listens for the opening requests made by the buses and
-    calls the board manager ever it is necessary.
-    '''
-
     def action(self):
-        message = self.read()
-        filter = Filter()
-        filter.set_ontology('OPEN')
-        filter.set_performative(ACLMessage.REQUEST)
-        if filter.filter(message):
-            if self.agent.requests == 0:
-                self.agent.new_request.set()
-            self.agent.requests += 1
-
-
-
-class ConfirmationsListener(CyclicBehaviour):
-    ''' This behaviour listens for the confirmations of the buses when they
-    passed by the location of this semaphore.
-
-    This behaviour also decrease the self.agent.requests variable.
+        command, argument = self.commands.send(self._value)
+        self._value = None
+
+        if command == OPEN:
+            self.agent.board.open()
+            trace.log(self.agent, trace.BOARD_OPENED, self.agent.requests)
+        elif command == CLOSE:
+            # Waits the security time of the board before it becomes red
+            self.agent.board.close()
+            trace.log(self.agent, trace.BOARD_CLOSED, self.agent.requests)
+        elif command == WAIT:
+            self.wait(argument * config.SECOND)
+        elif command == REQUEST:
+            self.agent.ledger.expire(time.monotonic() / config.SECOND)
+            self.agent.new_request.wait()
+        elif command == ATTENDED:
+            self._value = self.agent.attended.wait(argument * config.SECOND if argument != None else None)
+            if not self._value:
+                self.agent.ledger.expire(time.monotonic() / config.SECOND)
+        elif command == NOW:
+            # The simulated time of the runtime of PADE
+            self._value = time.monotonic() / config.SECOND
+
+
+
+def opening_request(agent, message):
+    ''' Records an opening request of a bus in the ledger. The first request
+    wakes up the policy of the Semaphore.
+
+    Parameters
+    ----------
+    agent : tralhoto.agent.Semaphore
+        The Semaphore that received the request.
+    message : pade.acl.messages.ACLMessage
+        The request OPEN of the bus.
     '''
 
-    def action(self):
-        message = self.read()
-        filter = Filter()
-        filter.set_ontology('CONFIRMATION')
-        filter.set_performative(ACLMessage.INFORM)
-        if filter.filter(message):
-            self.agent.requests -= 1
-            if self.agent.requests == 0:
-                self.agent.new_request.clear()
+    content = codec.decode('OPEN', message.get_content())
+    agent.request(message.sender.getLocalName(), time.monotonic() / config.SECOND, content['eta'])
 
 
+def confirmation(agent, message):
+    ''' Removes the request of a bus that passed by the location of the
+    Semaphore from the ledger. The last confirmation sinalizes that all the
+    requests were attended.
 
-class TraditionalManager(CyclicBehaviour):
-    ''' This behaviour implements the traditional board management for the
-    Semaphores (for comparison).
+    Parameters
+    ----------
+    agent : tralhoto.agent.Semaphore
+        The Semaphore that received the confirmation.
+    message : pade.acl.messages.ACLMessage
+        The CONFIRMATION of the bus.
     '''
 
-    def action(self):
-        self.open_board()
-        self.close_board()
-    
-
-    def close_board(self):
-        ''' Closes the board and locks the behaviour during a minimum time, as
-        is described in the config file.
-        '''
-
-        # Closes the board
-        self.agent.board.close()
-        # Waits for the minimum closing time
-        self.wait(self.agent.MIN_CLOSING_TIME * config.SECOND)
-    
+    agent.confirm(message.sender.getLocalName())
 
-    def open_board(self):
-        ''' Opens the board and locks the behaviour during a minimum time, as
-        is described in the config file.
-        '''
 
-        # Opens the board
-        self.agent.board.open()
-        # Waits the max time
-        self.wait(self.agent.MAX_OPENING_TIME * config.SECOND)
\ No newline at end of file
+# The handlers of the messages of the Semaphores (see tralhoto.protocol.Router)
+ROUTES = {
+    (ACLMessage.REQUEST, 'OPEN'): opening_request,
+    (ACLMessage.INFORM, 'CONFIRMATION'): confirmation,
+}
@@ -7,40 +7,46 @@ This module contains the behaviours of the Station agents.
 @author: @italocampos
 '''
 
-from pade.behaviours.types import CyclicBehaviour
 from pade.acl.messages import ACLMessage
-from pade.acl.filters import Filter
-from pade.misc.utility import display
 
-import pickle
+from tralhoto import codec, config, trace
 
+import time
 
-class BusListener(CyclicBehaviour):
-    ''' This behaviour listens for bus requests when the buses are inside the
-    proximity area.
+
+def answer_bus(agent, message):
+    ''' Answers the request of a bus inside the proximity area.
+
+    Parameters
+    ----------
+    agent : tralhoto.agent.Station
+        The Station that received the request.
+    message : pade.acl.messages.ACLMessage
+        The request HOW_MANY_TIME of the bus.
     '''
 
-    def action(self):
-        message = self.read()
-        filter = Filter()
-        filter.set_ontology('HOW_MANY_TIME')
-        filter.set_performative(ACLMessage.REQUEST)
-
-        if filter.filter(message):
-            content = pickle.loads(message.get_content())
-            reply = message.create_reply()
-
-            if self.agent.side == None or self.agent.side == content['side']:
-                reply.set_ontology('WAIT_FOR_X_SECONDS')
-                reply.set_performative(ACLMessage.INFORM)
-                reply.set_content(pickle.dumps({
-                    'time' : self.agent.wait_time(),
-                    'location' : self.agent.location,
-                    'name': self.agent.name,
-                }))
-            else:
-                reply.set_ontology('INCOMPATIBLE_SIDE')
-                reply.set_performative(ACLMessage.REFUSE)
-            
-            self.send(reply)
-            
+    content = codec.decode('HOW_MANY_TIME', message.get_content())
+    reply = message.create_reply()
+
+    if agent.serves(content['side']):
+        reply.set_ontology('WAIT_FOR_X_SECONDS')
+        reply.set_performative(ACLMessage.INFORM)
+        # The simulated time of the runtime of PADE
+        wait_time = agent.wait_time(time.monotonic() / config.SECOND)
+        trace.log(agent, trace.WAIT_TIME, content['side'], wait_time)
+        reply.set_content(codec.encode('WAIT_FOR_X_SECONDS', {
+            'time' : wait_time,
+            'location' : agent.location,
+            'name': agent.name,
+        }))
+    else:
+        reply.set_ontology('INCOMPATIBLE_SIDE')
+        reply.set_performative(ACLMessage.REFUSE)
+
+    agent.send(reply)
+
+
+# The handlers of the messages of the Stations (see tralhoto.protocol.Router)
+ROUTES = {
+    (ACLMessage.REQUEST, 'HOW_MANY_TIME'): answer_bus,
+}
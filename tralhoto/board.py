@@ -5,12 +5,15 @@ Board Module
 This module contains a class modeling the board of the semaphores. This board
 can be in three states, represented by colors: RED, AMBER and GREEN.
 
+The changes of color are notified: threads can block until the Board becomes
+green (or leaves a color) and listeners are called on every transition, so no
+agent needs to poll the Board.
+
 @author: @italocampos
 '''
 
-from pade.misc.thread import SharedResource
 from tralhoto import config
-import time, color
+import threading, time
 
 
 class Board(object):
@@ -20,9 +23,13 @@ class Board(object):
 
     Properties
     ----------
-    _color : SharedResource
-        The current color of the semaphore. Use the methods read() and write()
-        to handle this object.
+    _color : str
+        The current color of the semaphore. Use the property color to handle
+        this attribute.
+    _changed : threading.Condition
+        The condition notified when the color of the Board changes.
+    _listeners : list
+        The functions called with the new color when the color changes.
     _security_time : float
         The waiting time (in seconds) before the color of the Board becomes
         RED.
@@ -38,7 +45,9 @@ class Board(object):
             The waiting time (in seconds) before the color of the Board becomes
             RED. Default = 6.0
         '''
-        self._color = SharedResource('RED')
+        self._color = 'RED'
+        self._changed = threading.Condition()
+        self._listeners = list()
         self._security_time = security_time
         self.color = color
     
@@ -53,7 +62,7 @@ class Board(object):
             The current color of the Board.
         '''
 
-        return self._color.read()
+        return self._color
     
 
     @color.setter
@@ -73,7 +82,90 @@ class Board(object):
 
         if color not in ['RED', 'AMBER', 'GREEN']:
             raise(ValueError('The color %s is not allowed to Board objects.' % color))
-        self._color.write(color)
+        with self._changed:
+            self._color = color
+            self._changed.notify_all()
+        for listener in self._listeners:
+            listener(color)
+
+
+    def add_listener(self, listener):
+        ''' Registers a function to be called on every change of color.
+
+        Parameters
+        ----------
+        listener : callable
+            A function that receives the new color of the Board.
+        '''
+
+        self._listeners.append(listener)
+
+
+    def __getstate__(self):
+        # The condition and the listeners belong to the runtime, which
+        # registers its listeners again
+        state = self.__dict__.copy()
+        del state['_changed']
+        state['_listeners'] = list()
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._changed = threading.Condition()
+
+
+    def wait_opened(self, timeout = None):
+        ''' Blocks until the Board becomes green.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The max time (in seconds of the wall clock) to wait.
+
+        Returns
+        -------
+        bool
+            Indicates if the Board is green.
+        '''
+
+        with self._changed:
+            return self._changed.wait_for(lambda: self._color == 'GREEN', timeout)
+
+
+    def wait_change(self, color, timeout = None):
+        ''' Blocks while the Board has the given color.
+
+        Parameters
+        ----------
+        color : str
+            The color to leave.
+        timeout : float, optional
+            The max time (in seconds of the wall clock) to wait.
+
+        Returns
+        -------
+        str
+            The current color of the Board.
+        '''
+
+        with self._changed:
+            self._changed.wait_for(lambda: self._color != color, timeout)
+            return self._color
+
+
+    @property
+    def security_time(self):
+        ''' Returns the waiting time (in seconds) before the color of the Board
+        becomes RED.
+
+        Returns
+        -------
+        float
+            The security time of the Board.
+        '''
+
+        return self._security_time
 
 
     def is_opened(self):
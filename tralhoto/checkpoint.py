@@ -0,0 +1,98 @@
+'''
+Checkpoint Module
+-----------------
+
+This module saves the full state of a simulation of the engine (the road and
+the Boards, the counters and the pending events of the buses, the ledgers and
+the policies of the semaphores, the flow generators of the stations, the
+dispatcher, the results and the clock) in a compressed file, and loads it to
+resume the simulation from the same point.
+
+A corridor can be warmed up once and many experiments forked from the warmed
+state, instead of paying the warm-up in every run of a sweep:
+
+    simulation = corridor(seed = 42)
+    simulation.run(until = 3600)
+    checkpoint.save(simulation, 'warm.ckpt')
+
+    for control in [False, True]:
+        simulation = checkpoint.load('warm.ckpt')
+        simulation.dispatcher.control = control
+        results = simulation.run()
+
+A resumed simulation gives the same results of the simulation that was not
+stopped. The sink of the simulation is not saved: pass a new one to load().
+The global random generators (seeded by config.seed()) are saved too. The
+PADE and the asyncio runtimes can not be saved, since their agents run in
+threads and tasks.
+
+@author: @italocampos
+'''
+
+import gzip, pickle, random
+import numpy
+
+
+# The version of the format of the files
+FORMAT = 1
+
+
+def save(simulation, path):
+    ''' Saves a simulation in a file.
+
+    Parameters
+    ----------
+    simulation : tralhoto.engine.Simulation
+        The simulation, stopped by Simulation.run(until).
+    path : str
+        The path of the file.
+
+    Raises
+    ------
+    ValueError
+        When the simulation is not stopped between its events.
+    '''
+
+    state = {
+        'format': FORMAT,
+        'simulation': simulation,
+        'random': random.getstate(),
+        'numpy': numpy.random.get_state(),
+    }
+    data = pickle.dumps(state, protocol = pickle.HIGHEST_PROTOCOL)
+    with gzip.open(path, 'wb', compresslevel = 6) as file:
+        file.write(data)
+
+
+def load(path, sink = None):
+    ''' Loads a simulation saved by save().
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+    sink : tralhoto.sink.Sink, optional
+        The sink that stores the results of the resumed simulation. Default =
+        None.
+
+    Returns
+    -------
+    tralhoto.engine.Simulation
+        The simulation, ready to run from the point where it was saved.
+
+    Raises
+    ------
+    ValueError
+        When the file has an unknown format.
+    '''
+
+    with gzip.open(path, 'rb') as file:
+        state = pickle.load(file)
+    if not isinstance(state, dict) or state.get('format') != FORMAT:
+        raise(ValueError('The file %s is not a checkpoint of the format %d.' % (path, FORMAT)))
+
+    random.setstate(state['random'])
+    numpy.random.set_state(state['numpy'])
+    simulation = state['simulation']
+    simulation.sink = sink
+    return simulation
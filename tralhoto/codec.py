@@ -0,0 +1,139 @@
+'''
+Codec Module
+------------
+
+This module contains a compact binary codec for the contents of the messages
+exchanged by the buses, the stations and the semaphores. Each ontology has a
+fixed struct layout, followed by the name of the station in the replies
+WAIT_FOR_X_SECONDS.
+
+Ontology             Layout    Content
+HOW_MANY_TIME        <B        side
+WAIT_FOR_X_SECONDS   <HfB      location, time, length of the name (+ name)
+OPEN                 <Hf       location, eta
+CONFIRMATION         <H        location
+
+The sides are coded as 0 (A), 1 (B) and 2 (None), and a missing eta as NaN.
+The names of the stations are sent as UTF-8 bytes (at most 255), prefixed by
+their length, so the messages do not depend on any table of the processes of
+the agents. A missing name is sent with the length 0.
+
+@author: @italocampos
+'''
+
+import math, struct
+
+
+SIDES = ['A', 'B', None]
+_SIDE_CODES = {side: code for code, side in enumerate(SIDES)}
+
+_SIDE = struct.Struct('<B')
+_WAIT = struct.Struct('<HfB')
+_LOCATION = struct.Struct('<H')
+_OPEN = struct.Struct('<Hf')
+
+
+def _to_nan(value):
+    ''' Codes a missing float as NaN. '''
+
+    return value if value != None else math.nan
+
+
+def _from_nan(value):
+    ''' Decodes a NaN as a missing float. '''
+
+    return None if math.isnan(value) else value
+
+
+def _encode_wait(content):
+    name = content['name'].encode('utf-8') if content['name'] != None else b''
+    if len(name) > 255:
+        raise(ValueError('The name of the station %s is longer than 255 bytes.' % content['name']))
+    return _WAIT.pack(content['location'], content['time'], len(name)) + name
+
+
+def _decode_wait(data):
+    location, time, length = _WAIT.unpack_from(data)
+    name = data[_WAIT.size:_WAIT.size + length]
+    return {
+        'time': time,
+        'location': location,
+        'name': name.decode('utf-8') if length > 0 else None,
+    }
+
+
+def _decode_open(data):
+    location, eta = _OPEN.unpack(data)
+    return {'location': location, 'eta': _from_nan(eta)}
+
+
+# The encoders and decoders of each ontology
+ENCODERS = {
+    'HOW_MANY_TIME': lambda content: _SIDE.pack(_SIDE_CODES[content['side']]),
+    'WAIT_FOR_X_SECONDS': _encode_wait,
+    'OPEN': lambda content: _OPEN.pack(content['location'], _to_nan(content.get('eta'))),
+    'CONFIRMATION': lambda content: _LOCATION.pack(content['location']),
+}
+
+DECODERS = {
+    'HOW_MANY_TIME': lambda data: {'side': SIDES[data[0]]},
+    'WAIT_FOR_X_SECONDS': _decode_wait,
+    'OPEN': _decode_open,
+    'CONFIRMATION': lambda data: {'location': _LOCATION.unpack(data)[0]},
+}
+
+
+def encode(ontology, content):
+    ''' Encodes the content of a message.
+
+    Parameters
+    ----------
+    ontology : str
+        The ontology of the message.
+    content : dict
+        The content of the message.
+
+    Returns
+    -------
+    bytes
+        The encoded content.
+
+    Raises
+    ------
+    ValueError
+        When the ontology has no layout.
+    '''
+
+    try:
+        encoder = ENCODERS[ontology]
+    except KeyError:
+        raise(ValueError('The ontology %s has no layout in the codec.' % ontology))
+    return encoder(content)
+
+
+def decode(ontology, data):
+    ''' Decodes the content of a message.
+
+    Parameters
+    ----------
+    ontology : str
+        The ontology of the message.
+    data : bytes
+        The encoded content.
+
+    Returns
+    -------
+    dict
+        The content of the message.
+
+    Raises
+    ------
+    ValueError
+        When the ontology has no layout.
+    '''
+
+    try:
+        decoder = DECODERS[ontology]
+    except KeyError:
+        raise(ValueError('The ontology %s has no layout in the codec.' % ontology))
+    return decoder(data)
@@ -7,7 +7,7 @@ This module carries the config for the simulations of the system.
 @author: @italocampos
 '''
 
-import scipy.stats as stats
+import random
 
 
 ''' The semaphores can be of three types, according with the degree of traffic
@@ -47,11 +47,33 @@ import scipy.stats as stats
 according with the problem modeling.
 '''
 
-def normal():
-    return stats.uniform.rvs(size = 50, loc = 9, scale = 3)
+def normal(generator = None, size = 50):
+    return _generator(generator).uniform(9, 12, size)
 
-def peak():
-    return stats.norm.rvs(size = 50, loc = 27, scale = 3)
+def peak(generator = None, size = 50):
+    return _generator(generator).normal(27, 3, size)
+
+# The demand of a service day from 5h to 23h, in bins of one hour, with the
+# peaks of the morning (6h to 8h) and of the evening (17h to 19h). See PROFILE
+SERVICE_DAY = [normal] + [peak] * 2 + [normal] * 9 + [peak] * 2 + [normal] * 4
+
+def _generator(generator):
+    # NumPy is only imported when the values are generated
+    if generator == None:
+        import numpy
+        generator = numpy.random
+    return generator
+
+
+def seed(value = None):
+    ''' Seeds the random generators used to generate the flow values and the
+    waiting times in the stations. Simulations started with the same seed
+    produce the same results. '''
+
+    import numpy
+
+    random.seed(value)
+    numpy.random.seed(value)
 
 
 # Defines the max opening time for each semaphore group (in seconds). The
@@ -62,14 +84,105 @@ SEMAPHORE_MAX_OPENING_TIME = [30, 50, 90]
 # indexes of this list maps the group of the semaphores.
 SEMAPHORE_MIN_CLOSING_TIME = [90, 50, 30]
 
+# Defines the policy that controls the Boards of each semaphore group ('board',
+# 'traditional', 'actuated', 'green_wave' or 'eta'). The indexes of this list
+# maps the groups of the semaphores.
+SEMAPHORE_POLICY = ['board', 'board', 'board']
+
+# Defines the max time (in seconds) that the actuated policy extends the green
+# while buses are approaching, for each semaphore group
+SEMAPHORE_MAX_EXTENSION = [10, 20, 30]
+
+# Defines how long (in seconds) the eta policy opens the Boards before the
+# predicted arrival of the buses, and the max time between two arrivals served
+# by the same green
+ETA_LEAD = 2
+ETA_MERGE = 15
+
+# Defines the time (in seconds) after which the opening request of a bus that
+# did not confirm its passage expires
+REQUEST_TIMEOUT = 300
+
+# Defines the cell where the green wave starts (Almirante Barroso com Tavares
+# Bastos, km 14.0) and the speed of the buses (km/h) that it is designed for
+GREEN_WAVE_ORIGIN = 146
+GREEN_WAVE_VELOCITY = 50
+
+# Defines the table of the offsets (in seconds) of the green_wave policy,
+# mapping the locations of the semaphores to their offsets (None to compute
+# them from GREEN_WAVE_ORIGIN). See tralhoto.offsets
+SEMAPHORE_OFFSETS = None
+
+# Holds the buses in the stations to keep their headways even (see
+# tralhoto.headway). The headways are recorded even when it is False
+HEADWAY_CONTROL = False
+
+# Defines the target headway of the buses (in seconds; None to use the mean
+# headway observed in each station)
+TARGET_HEADWAY = None
+
+# Defines the max time (in seconds) that a bus is held in a station
+MAX_HOLDING_TIME = 60
+
 # Defines the type of scenario in the simulation
 scenario = normal
 
+# Defines the demand of the stations along the day: a list of scenarios, one
+# for each bin of PROFILE_BIN seconds of the simulated clock (the last one holds
+# until the end of the simulation), as SERVICE_DAY. None to use scenario all
+# the time
+PROFILE = None
+PROFILE_BIN = 3600
+
+# Defines the seed of the random generators (None to use a random seed)
+SEED = None
+
+# Defines the number of trips of each batch of the MSER rule, which detects
+# the end of the warm-up of the simulations (see tralhoto.warmup)
+MSER_BATCH = 5
+
+# Defines the number of trips after the warm-up after which the simulation
+# engine stops (None to run all the trips of the buses)
+STEADY_TRIPS = None
+
+# Defines the number of flow values generated for each station
+FLOW_SIZE = 50
+
+# Defines the directory where the flow tables are cached by scenario and seed
+# (None to not cache them)
+FLOW_CACHE = None
+
 # Defines the default loading and unloading time for each passenger (in seconds)
 TIME_PER_PASSENGER = 3.0
 
+# Defines the file where the results of the trips are stored (.csv, .npz or
+# .parquet)
+RESULTS = 'results.csv'
+
 # The value of the seconds in the simulation
 SECOND = 0.2
 
+# Defines the length (in meters) of the cells of the road vector
+CELL_SIZE = 100
+
+# Defines the length (in cells) of the segments of the road whose stations are
+# asked at once by the buses, when they reach the first station of the segment
+# (0 to ask each station when the bus reaches it)
+STATION_SEGMENT = 0
+
 # Defining the speeds of the buses (std 35, 40)
-BUS_VELOCITY = [40, 45, 50, 55, 60]
\ No newline at end of file
+BUS_VELOCITY = [40, 45, 50, 55, 60]
+
+# Delivers the messages between the agents of the same process straight in
+# their mailboxes, without the network of PADE (see tralhoto.transport)
+MAILBOX = True
+
+# Defines the minimum level of the messages of the agents ('DEBUG', 'INFO',
+# 'WARNING' or 'OFF'). The steps of the buses are logged in the DEBUG level
+TRACE_LEVEL = 'INFO'
+
+# Logs only one of every TRACE_SAMPLE messages of each kind
+TRACE_SAMPLE = 1
+
+# Defines the file of the binary trace of the messages (None to display them)
+TRACE_FILE = None
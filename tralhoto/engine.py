@@ -0,0 +1,1136 @@
+'''
+Engine Module
+-------------
+
+This module contains a discrete-event simulation engine for the system. The
+engine keeps a virtual clock and a heap-ordered queue of events, so the
+simulated time advances directly from an event to the next one, without any
+wall-clock sleep. A simulation of hours runs as fast as the CPU allows.
+
+The entities of the engine are built over the classes of tralhoto.model and
+their processes replay the behaviours of the PADE agents (Run, MessageStation,
+BoardManager, TraditionalManager...) step by step, but measuring the time in
+simulated seconds.
+
+The processes are Python generators. A process yields a number to wait this
+amount of simulated seconds, or an object with the method add_waiter() (an
+Event, a Wait or a Ticker) that resumes the process later.
+
+The generators can not be saved, so the processes of a Simulation keep the
+point where they wait in the entities (the pending events of the buses and
+the journal of the policies) and a pickled Simulation (see
+tralhoto.checkpoint) rebuilds them when it is loaded.
+
+@author: @italocampos
+'''
+
+from tralhoto.model import BusModel, StationModel, SemaphoreModel
+from tralhoto.fleet import Fleet, FleetBus
+from tralhoto.flow import Flow
+from tralhoto.headway import Dispatcher
+from tralhoto.warmup import Detector
+from tralhoto.policy import POLICIES, OPEN, CLOSE, WAIT, REQUEST, ATTENDED, NOW
+from tralhoto.road import RoadIndex, STATION, SEMAPHORE
+from tralhoto import config
+
+import heapq, itertools
+import numpy
+
+
+# The stages of a bus in an event cell
+ARRIVE, SENSE, CROSS = range(3)
+
+# The default of the arguments that fall back to the config module when they
+# are not passed (None is a valid value for them)
+_CONFIG = object()
+
+
+class Event(object):
+    ''' An event of the simulated time, similar to threading.Event.
+
+    Properties
+    ----------
+    engine : Engine
+        The engine that resumes the processes waiting for this event.
+    _flag : bool
+        The state of this event.
+    _waiters : list
+        The functions called when this event is set.
+    '''
+
+    def __init__(self, engine):
+        '''
+        Parameters
+        ----------
+        engine : Engine
+            The engine that resumes the processes waiting for this event.
+        '''
+
+        self.engine = engine
+        self._flag = False
+        self._waiters = list()
+
+
+    def is_set(self):
+        ''' Returns a bool that indicates if this event is set. '''
+
+        return self._flag
+
+
+    def set(self):
+        ''' Sets this event and resumes all the processes waiting for it. '''
+
+        self._flag = True
+        waiters, self._waiters = self._waiters, list()
+        for waiter in waiters:
+            self.engine.schedule(0, waiter, True)
+
+
+    def clear(self):
+        ''' Resets this event. '''
+
+        self._flag = False
+
+
+    def __getstate__(self):
+        # The waiting processes are restored by the Simulation
+        state = self.__dict__.copy()
+        state['_waiters'] = list()
+        return state
+
+
+    def add_waiter(self, process):
+        ''' Makes a process wait for this event.
+
+        Parameters
+        ----------
+        process : generator
+            The process to resume when this event is set.
+        '''
+
+        self.wait().add_waiter(process)
+
+
+    def wait(self, timeout = None, deadline = None):
+        ''' Returns a waitable that resumes a process when this event is set
+        or when the timeout expires.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The max time (in simulated seconds) to wait.
+        deadline : float, optional
+            The simulated time when the timeout expires, used instead of the
+            timeout.
+
+        Returns
+        -------
+        Wait
+            The object to be yielded by the process.
+        '''
+
+        return Wait(self, timeout, deadline)
+
+
+
+class Wait(object):
+    ''' The waiting of a process for an Event, with an optional timeout.
+
+    The process is resumed with True if the event was set or with False if
+    the timeout expired.
+
+    Properties
+    ----------
+    event : Event
+        The event to wait.
+    timeout : float
+        The max time (in simulated seconds) to wait, or None.
+    deadline : float
+        The simulated time when the timeout expires, or None to count the
+        timeout from the time the process starts waiting.
+    _process : generator
+        The waiting process.
+    _done : bool
+        Sinalizes that the process was already resumed.
+    '''
+
+    def __init__(self, event, timeout = None, deadline = None):
+        '''
+        Parameters
+        ----------
+        event : Event
+            The event to wait.
+        timeout : float, optional
+            The max time (in simulated seconds) to wait.
+        deadline : float, optional
+            The simulated time when the timeout expires.
+        '''
+
+        self.event = event
+        self.timeout = timeout
+        self.deadline = deadline
+        self._process = None
+        self._done = False
+
+
+    def add_waiter(self, process):
+        ''' Makes a process wait for the event.
+
+        Parameters
+        ----------
+        process : generator
+            The process to resume.
+        '''
+
+        engine = self.event.engine
+        self._process = process
+        if self.event.is_set():
+            engine.schedule(0, self._wake, True)
+            return
+        self.event._waiters.append(self._wake)
+        if self.deadline != None:
+            engine.at(self.deadline, self._wake, False)
+        elif self.timeout != None:
+            engine.schedule(self.timeout, self._wake, False)
+
+
+    def _wake(self, value):
+        ''' Resumes the process, only once. '''
+
+        if not self._done:
+            self._done = True
+            self.event.engine.resume(self._process, value)
+
+
+
+class Engine(object):
+    ''' A discrete-event scheduler with a virtual clock.
+
+    The events are ordered by time and, inside the same time, by the order they
+    were scheduled.
+
+    Properties
+    ----------
+    now : float
+        The current simulated time (in seconds).
+    _queue : list
+        The heap of the scheduled events.
+    _counter : itertools.count
+        Generates the sequence numbers used to break ties in the heap.
+    _stopped : bool
+        Sinalizes that the engine must stop.
+    '''
+
+    def __init__(self):
+        self.now = 0.0
+        self._queue = list()
+        self._counter = itertools.count()
+        self._stopped = False
+
+
+    def schedule(self, delay, callback, *args):
+        ''' Schedules a function to be called after some simulated time.
+
+        Parameters
+        ----------
+        delay : float
+            The time (in simulated seconds) to wait before calling the function.
+        callback : callable
+            The function to call.
+        *args
+            The arguments of the function.
+        '''
+
+        heapq.heappush(self._queue, (self.now + delay, next(self._counter), callback, args))
+
+
+    def at(self, time, callback, *args):
+        ''' Schedules a function to be called at a simulated time.
+
+        Parameters
+        ----------
+        time : float
+            The simulated time to call the function.
+        callback : callable
+            The function to call.
+        *args
+            The arguments of the function.
+        '''
+
+        heapq.heappush(self._queue, (time, next(self._counter), callback, args))
+
+
+    def process(self, generator, delay = 0):
+        ''' Starts a process.
+
+        Parameters
+        ----------
+        generator : generator
+            The process to start.
+        delay : float, optional
+            The time to wait before starting the process. Default = 0.
+        '''
+
+        self.schedule(delay, self.resume, generator)
+
+
+    def resume(self, process, value = None):
+        ''' Runs a process until its next waiting point.
+
+        Parameters
+        ----------
+        process : generator
+            The process to resume.
+        value : object, optional
+            The value sent to the process.
+        '''
+
+        try:
+            target = process.send(value)
+        except StopIteration:
+            return
+        if isinstance(target, (int, float)):
+            self.schedule(target, self.resume, process)
+        else:
+            target.add_waiter(process)
+
+
+    def stop(self):
+        ''' Stops the engine after the current event. '''
+
+        self._stopped = True
+
+
+    def __getstate__(self):
+        # The events of the queue are restored by the Simulation
+        return {'now': self.now}
+
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.now = state['now']
+
+
+    def run(self, until = None):
+        ''' Executes the events in the order of the simulated time.
+
+        Parameters
+        ----------
+        until : float, optional
+            The simulated time to stop. If None, the engine runs until there
+            are no more events or it is stopped.
+        '''
+
+        self._stopped = False
+        while self._queue and not self._stopped:
+            if until != None and self._queue[0][0] > until:
+                self.now = until
+                break
+            self.now, _, callback, args = heapq.heappop(self._queue)
+            callback(*args)
+
+
+
+class Ticker(object):
+    ''' Advances together all the buses of a Fleet that trip at the same
+    simulated time.
+
+    A bus process requests its trip with request() and yields the Ticker. When
+    the time ends, the buses are advanced by one call of Fleet.trip() and each
+    process is resumed with the list of cells crossed by its bus.
+
+    Properties
+    ----------
+    engine : Engine
+        The engine that runs the bus processes.
+    fleet : Fleet
+        The fleet that stores the state of the buses.
+    _buses : list
+        The buses that requested a trip in the current time.
+    _processes : list
+        The processes waiting for the trip of their buses.
+    '''
+
+    def __init__(self, engine, fleet):
+        '''
+        Parameters
+        ----------
+        engine : Engine
+            The engine that runs the bus processes.
+        fleet : Fleet
+            The fleet that stores the state of the buses.
+        '''
+
+        self.engine = engine
+        self.fleet = fleet
+        self._buses = list()
+        self._processes = list()
+
+
+    def request(self, bus):
+        ''' Requests the trip of a bus in the current time.
+
+        Parameters
+        ----------
+        bus : FleetBus
+            The bus to advance.
+
+        Returns
+        -------
+        Ticker
+            This ticker, to be yielded by the process of the bus.
+        '''
+
+        if not self._buses:
+            self.engine.schedule(0, self.tick)
+        self._buses.append(bus.index)
+        return self
+
+
+    def add_waiter(self, process):
+        ''' Makes a process wait for the trip of its bus.
+
+        Parameters
+        ----------
+        process : generator
+            The process of the bus that requested the trip.
+        '''
+
+        self._processes.append(process)
+
+
+    def tick(self):
+        ''' Advances all the requested buses and resumes their processes. '''
+
+        buses, self._buses = self._buses, list()
+        processes, self._processes = self._processes, list()
+
+        steps, _, cells, _ = self.fleet.trip(numpy.array(buses, dtype = numpy.int64))
+        cells = cells.tolist()
+        start = 0
+        for process, end in zip(processes, numpy.cumsum(steps).tolist()):
+            self.engine.resume(process, cells[start:end])
+            start = end
+
+
+
+class SimSemaphore(SemaphoreModel):
+    ''' A Semaphore of the simulation engine.
+
+    Properties
+    ----------
+    aid : str
+        The identifier of this Semaphore.
+    new_request : Event
+        An event that sinalizes when a new request arrives for this Semaphore.
+    attended : Event
+        An event that sinalizes when all the requests for this Semaphore were
+        attended.
+    '''
+
+    def __init__(self, engine, aid, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.aid = aid
+        self.new_request = Event(engine)
+        self.attended = Event(engine)
+        self.attended.set()
+
+
+
+class SimStation(StationModel):
+    ''' A Station of the simulation engine.
+
+    Properties
+    ----------
+    aid : str
+        The identifier of this Station.
+    '''
+
+    def __init__(self, aid, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.aid = aid
+
+
+
+class SimBus(BusModel):
+    ''' A Bus of the simulation engine.
+
+    Properties
+    ----------
+    aid : str
+        The identifier of this Bus.
+    route : str
+        The route of this Bus in the network, or None.
+    simulation : int
+        The number of trips finished by this Bus.
+    pending : tuple
+        The events of the current second that this Bus did not pass yet,
+        while it waits in a station or a Board, as (events, position, stage,
+        start), or None.
+    '''
+
+    def __init__(self, aid, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.aid = aid
+        self.route = None
+        self.simulation = 0
+        self.pending = None
+
+
+
+class SimFleetBus(FleetBus):
+    ''' A Bus of the simulation engine whose state is stored in a Fleet.
+
+    Properties
+    ----------
+    aid : str
+        The identifier of this Bus.
+    route : str
+        The route of this Bus in the network, or None.
+    simulation : int
+        The number of trips finished by this Bus.
+    pending : tuple
+        The events of the current second that this Bus did not pass yet,
+        while it waits in a station or a Board, as (events, position, stage,
+        start), or None.
+    '''
+
+    def __init__(self, aid, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.aid = aid
+        self.route = None
+        self.simulation = 0
+        self.pending = None
+
+
+
+class Simulation(object):
+    ''' Runs the BRT corridor in simulated time.
+
+    Properties
+    ----------
+    engine : Engine
+        The scheduler of this simulation.
+    road : list
+        A list representing the road of BRT buses, or None if the simulation
+        runs over a network. The elements of the list must be:
+            ([{'address': AID, 'type': str}], board.Board])
+    network : tralhoto.network.Network
+        The network of the routes of the buses, or None.
+    roads : dict
+        Maps the routes to their roads (the route None is the road of the
+        simulation without a network).
+    manager : str
+        The policy of all the semaphores (see tralhoto.policy), or None to
+        use the policy of each group in config.SEMAPHORE_POLICY.
+    fleets : dict
+        Maps the routes to the vectorized state of their buses, or None if
+        each bus advances by itself.
+    tickers : dict
+        Maps the routes to the Tickers that advance the buses of their fleets.
+    agents : dict
+        The entities of this simulation, indexed by their identifiers.
+    opened : dict
+        Maps each Board of the road to an Event that is set while the Board
+        is green.
+    results : list
+        The results of the finished trips, as returned by BusModel.record()
+        and extended with the identifier of the bus, the number of the
+        simulation and the time when the trip finished.
+    sink : tralhoto.sink.Sink
+        The sink that also stores the results, or None.
+    flow : tralhoto.flow.Flow
+        The flow tables of the stations, or None.
+    dispatcher : tralhoto.headway.Dispatcher
+        The dispatcher of the stations, or None.
+    messages : int
+        The number of messages replayed between the agents.
+    processes : dict
+        Maps the identifiers of the buses and the semaphores to their
+        processes.
+    warmup : tralhoto.warmup.Detector
+        The detector of the warm-up of the simulation, or None.
+    '''
+
+    def __init__(self, road_size = 205, manager = 'board', seed = None, fleet = False, sink = None, flow = None, dispatcher = None, network = None, warmup = None):
+        '''
+        Parameters
+        ----------
+        road_size : int, optional
+            The number of cells of the road. Default = 205.
+        manager : str, optional
+            The policy of all the semaphores (see tralhoto.policy), or None to
+            use the policy of each group in config.SEMAPHORE_POLICY. Default =
+            'board'.
+        seed : int, optional
+            The seed of the random generators. Default = None.
+        fleet : bool, optional
+            If True, the state of the buses is stored in a Fleet and the buses
+            that trip at the same time are advanced together. The trips are
+            executed after the other events of the same time, so the order of
+            the events can differ from the one of the default mode. Default =
+            False.
+        sink : tralhoto.sink.Sink, optional
+            The sink that also stores the results. Default = None.
+        flow : tralhoto.flow.Flow, optional
+            The flow tables of the stations. Default = None (each station
+            draws its own table).
+        dispatcher : tralhoto.headway.Dispatcher, optional
+            The dispatcher that measures the headways of the buses and holds
+            them in the stations. Default = None.
+        network : tralhoto.network.Network, optional
+            The network of the routes of the buses, with all the routes
+            created. The locations of the stations and the semaphores are
+            nodes of the network and road_size is ignored. Default = None.
+        warmup : tralhoto.warmup.Detector, optional
+            The detector of the warm-up. The simulation stops as soon as the
+            detector has enough trips of the steady state. Default = None.
+        '''
+
+        if manager != None and manager not in POLICIES:
+            raise(ValueError('The manager %s is not allowed to Simulation objects.' % manager))
+
+        config.seed(seed)
+        self.engine = Engine()
+        self.network = network
+        if network != None:
+            self.road = None
+            self.roads = network.routes
+        else:
+            self.road = [[[], None] for _ in range(road_size)]
+            self.roads = {None: self.road}
+        self.manager = manager
+        self.fleets = {route: Fleet(len(road)) for route, road in self.roads.items()} if fleet else None
+        self.tickers = {route: Ticker(self.engine, self.fleets[route]) for route in self.roads} if fleet else None
+        self.agents = dict()
+        self.opened = dict()
+        self.results = list()
+        self.sink = sink
+        self.flow = flow
+        self.dispatcher = dispatcher
+        self.messages = 0
+        self.processes = dict()
+        self.warmup = warmup
+        self._running = 0
+        self._started = False
+
+
+    def locate(self, location, proximity_factor = 0):
+        ''' Returns the road and the location where a Station or a Semaphore
+        is placed.
+
+        Parameters
+        ----------
+        location : int or tuple
+            The location of the agent, or its node (segment, cell) if the
+            simulation runs over a network.
+        proximity_factor : int, optional
+            The distance of the sensors of the agent. Default = 0.
+
+        Returns
+        -------
+        tuple
+            The road and the location of the agent in the road.
+        '''
+
+        if self.network == None:
+            return self.road, location
+        return self.network.anchor(location, proximity_factor)
+
+
+    def add_station(self, aid, group, location, side = None, proximity_factor = 5, name = None):
+        ''' Creates a Station in the simulation. The parameters are the same of
+        tralhoto.agent.Station, except that the location is a node (segment,
+        cell) if the simulation runs over a network. '''
+
+        road, location = self.locate(location, proximity_factor)
+        station = SimStation(aid, group, location, road, side, proximity_factor, name, self.flow)
+        self.agents[aid] = station
+        return station
+
+
+    def add_semaphore(self, aid, group, location, proximity_factor = 3, perimeter = None):
+        ''' Creates a Semaphore in the simulation. The parameters are the same
+        of tralhoto.agent.Semaphore, except that the location is a node
+        (segment, cell) if the simulation runs over a network. '''
+
+        road, location = self.locate(location, proximity_factor)
+        semaphore = SimSemaphore(self.engine, aid, group, location, road, proximity_factor, perimeter, self.manager)
+        self.agents[aid] = semaphore
+        return semaphore
+
+
+    def add_bus(self, aid, name = None, velocity = 45, start_time = 10, n_simulations = 10, route = None):
+        ''' Creates a Bus in the simulation. The parameters are the same of
+        tralhoto.agent.Bus, plus the name of the route of the bus in the
+        network (None if the simulation runs without a network).
+
+        Raises
+        ------
+        ValueError
+            When the route is unknown.
+        '''
+
+        if route not in self.roads:
+            raise(ValueError('The route %s does not exist in the simulation.' % route))
+
+        road = self.roads[route]
+        if self.fleets != None:
+            bus = SimFleetBus(aid, self.fleets[route], road, name, velocity, start_time, n_simulations, self.dispatcher)
+        else:
+            bus = SimBus(aid, road, name, velocity, start_time, n_simulations, self.dispatcher)
+        bus.route = route
+        self.agents[aid] = bus
+        return bus
+
+
+    def run(self, until = None):
+        ''' Runs the simulation until all the buses finish their trips. A
+        stopped simulation continues from where it stopped when it runs again.
+
+        Parameters
+        ----------
+        until : float, optional
+            The simulated time to stop the simulation, even if there are buses
+            running.
+
+        Returns
+        -------
+        list
+            The results of the finished trips.
+        '''
+
+        if not self._started:
+            self.start()
+        self.engine.run(until)
+        if self.sink != None:
+            self.sink.flush()
+        return self.results
+
+
+    def start(self):
+        ''' Places the agents in the roads and starts their processes. '''
+
+        self._started = True
+        for agent in self.agents.values():
+            if isinstance(agent, SimStation):
+                agent.place()
+            elif isinstance(agent, SimSemaphore):
+                agent.place()
+                self.processes[agent.aid] = self.policy_manager(agent)
+                self.engine.process(self.processes[agent.aid])
+
+        # Compiles the road of each route once, after all the sensors were
+        # placed. The Boards of the shared segments appear in several roads
+        indexes = {route: RoadIndex(road) for route, road in self.roads.items()}
+        for road_index in indexes.values():
+            for board in road_index.boards.values():
+                if board not in self.opened:
+                    self.opened[board] = Event(self.engine)
+                    board.add_listener(self.opened_listener(self.opened[board]))
+        for agent in self.agents.values():
+            if isinstance(agent, BusModel):
+                agent.road_index = indexes[agent.route]
+                self._running += 1
+                self.processes[agent.aid] = self.run_bus(agent)
+                self.engine.process(self.processes[agent.aid], agent.start_time)
+
+
+    def __getstate__(self):
+        ''' Returns the state of this simulation, with the processes replaced
+        by the times and the events that they wait. The simulation must be
+        stopped between two events (by run(until)). '''
+
+        owners = {id(process): aid for aid, process in self.processes.items()}
+
+        def owner(process):
+            if id(process) not in owners:
+                raise(ValueError('The simulation can only be saved between its events.'))
+            return owners[id(process)]
+
+        # The processes that sleep, in the order they were scheduled
+        timers = list()
+        for time, _, callback, args in sorted(self.engine._queue, key = lambda entry: entry[:2]):
+            wait = getattr(callback, '__self__', None)
+            if callback == self.engine.resume:
+                timers.append((time, owner(args[0]), False))
+            elif isinstance(wait, Wait) and args == (False,):
+                if not wait._done:
+                    timers.append((time, owner(wait._process), True))
+            else:
+                raise(ValueError('The simulation can only be saved between its events.'))
+
+        # The processes that wait for events, in the order they started waiting
+        events = list(self.opened.values())
+        for agent in self.agents.values():
+            if isinstance(agent, SimSemaphore):
+                events += [agent.new_request, agent.attended]
+        waiting = list()
+        for event in events:
+            for wake in event._waiters:
+                if not wake.__self__._done:
+                    waiting.append(owner(wake.__self__._process))
+
+        if self.tickers != None and any(ticker._processes for ticker in self.tickers.values()):
+            raise(ValueError('The simulation can only be saved between its events.'))
+
+        state = self.__dict__.copy()
+        state.update(processes = dict(), sink = None, _timers = timers, _waiting = waiting)
+        return state
+
+
+    def __setstate__(self, state):
+        ''' Restores the state of a simulation and rebuilds its processes. '''
+
+        timers = state.pop('_timers')
+        waiting = state.pop('_waiting')
+        self.__dict__.update(state)
+        for board, event in self.opened.items():
+            board.add_listener(self.opened_listener(event))
+
+        # The policies that were not started yet have no journal
+        for time, aid, timeout in timers:
+            agent = self.agents[aid]
+            if timeout:
+                # The semaphore waits for its requests until the deadline
+                self.processes[aid] = self.policy_manager(agent, True, time)
+                self.engine.resume(self.processes[aid])
+                continue
+            if isinstance(agent, SimSemaphore):
+                self.processes[aid] = self.policy_manager(agent, agent.policy.journal != None)
+            else:
+                self.processes[aid] = self.run_bus(agent)
+            self.engine.at(time, self.engine.resume, self.processes[aid])
+
+        for aid in waiting:
+            if aid not in self.processes:
+                agent = self.agents[aid]
+                if isinstance(agent, SimSemaphore):
+                    self.processes[aid] = self.policy_manager(agent, True)
+                else:
+                    self.processes[aid] = self.run_bus(agent)
+                self.engine.resume(self.processes[aid])
+
+
+    def run_bus(self, bus):
+        ''' The process that replays the behaviour Run of the buses. The bus
+        keeps the events that it did not pass while it waits (bus.pending), so
+        the process can be rebuilt from the bus.
+
+        Parameters
+        ----------
+        bus : SimBus
+            The bus that runs.
+        '''
+
+        while True:
+            if bus.pending == None:
+                cells = yield from self.trip(bus)
+                events, first, stage, start = bus.road_index.events(cells, bus.side), 0, ARRIVE, None
+            else:
+                events, first, stage, start = bus.pending
+                bus.pending = None
+
+            for position in range(first, len(events)):
+                index = events[position]
+
+                # Checks if this is a point of stop (a station)
+                if stage == ARRIVE and index == bus.next_station['location']:
+                    bus.trip_time += bus.next_station['wait_time']
+                    bus.pending = (events, position, SENSE, None)
+                    yield bus.next_station['wait_time']
+                    bus.pending = None
+
+                # Send messages for any compatible agents in this point
+                if stage != CROSS:
+                    for kind, aid in bus.road_index.sensors[bus.side].get(index, ()):
+                        if kind == STATION:
+                            batch = bus.road_index.batch(bus.side, index, aid)
+                            if batch:
+                                self.message_stations(bus, batch)
+                            bus.reach(aid, self.engine.now)
+                        elif kind == SEMAPHORE:
+                            self.message_semaphore(bus, aid)
+                            bus.semaphore_fifo.append(aid)
+
+                # Look at the Board of the semaphore
+                board = bus.road_index.boards.get(index)
+                if board != None:
+                    if stage == CROSS or not board.is_opened():
+                        if stage != CROSS:
+                            bus.n_semaphores += 1
+                            start = self.engine.now
+                        # Sleeps until the Board becomes green
+                        bus.pending = (events, position, CROSS, start)
+                        yield self.opened[board]
+                        bus.pending = None
+                        bus.trip_time += self.engine.now - start
+                        bus.semaphore_time += self.engine.now - start
+                    for aid in bus.leave(bus.road_index.owners[index]):
+                        self.confirm_semaphore(bus, aid)
+                stage = ARRIVE
+
+                # Checks if the bus finished its trip
+                if bus.side == 'B' and bus.location == 0:
+                    record = bus.record()
+                    record.update(aid = bus.aid, simulation = bus.simulation, time = self.engine.now)
+                    self.results.append(record)
+                    if self.sink != None:
+                        self.sink.write(record)
+                    if self.warmup is not None and self.warmup.update(record):
+                        self.engine.stop()
+                    bus.reset()
+                    bus.simulation += 1
+                    if bus.simulation >= bus.n_simulations:
+                        self._running -= 1
+                        if self._running == 0:
+                            self.engine.stop()
+                        return
+                    bus.pending = (events, position + 1, ARRIVE, None)
+                    yield 10
+                    bus.pending = None
+            yield 1
+
+
+    def trip(self, bus):
+        ''' Advances a bus by one second of simulation.
+
+        Parameters
+        ----------
+        bus : BusModel
+            The bus to advance.
+
+        Returns
+        -------
+        list
+            The cells crossed by the bus.
+        '''
+
+        if self.fleets == None:
+            return bus.trip()
+        return (yield self.tickers[bus.route].request(bus))
+
+
+    def message_stations(self, bus, aids):
+        ''' Replays the exchange HOW_MANY_TIME between a bus and the stations
+        of a batch.
+
+        Parameters
+        ----------
+        bus : SimBus
+            The bus that sends the request.
+        aids : tuple
+            The identifiers of the stations.
+        '''
+
+        # The request and the replies of the stations
+        self.messages += 1 + len(aids)
+        for aid in aids:
+            station = self.agents[aid]
+            if station.serves(bus.side):
+                bus.cache(aid, (bus.road_index.locations[aid], station.wait_time(self.engine.now), station.name), self.engine.now)
+            else:
+                bus.cache(aid, (None, 0, None), self.engine.now)
+
+
+    def message_semaphore(self, bus, aid):
+        ''' Replays the OPEN request of a bus to a semaphore.
+
+        Parameters
+        ----------
+        bus : SimBus
+            The bus that sends the request.
+        aid : str
+            The identifier of the semaphore.
+        '''
+
+        semaphore = self.agents[aid]
+        self.messages += 1
+        eta = bus.eta(bus.road_index.next_board(bus.location, bus.side))
+        semaphore.request(bus.aid, self.engine.now, eta)
+
+
+    def confirm_semaphore(self, bus, aid):
+        ''' Replays the CONFIRMATION of a bus that passed by a semaphore.
+
+        Parameters
+        ----------
+        bus : SimBus
+            The bus that sends the confirmation.
+        aid : str
+            The identifier of the semaphore.
+        '''
+
+        semaphore = self.agents[aid]
+        self.messages += 1
+        semaphore.confirm(bus.aid)
+
+
+    def opened_listener(self, event):
+        ''' Returns a Board listener that keeps an Event set while the Board
+        is green.
+
+        Parameters
+        ----------
+        event : Event
+            The event to set and clear.
+
+        Returns
+        -------
+        callable
+            The listener to register in the Board.
+        '''
+
+        def listener(color):
+            if color == 'GREEN':
+                event.set()
+            else:
+                event.clear()
+        return listener
+
+
+    def policy_manager(self, semaphore, restored = False, deadline = None):
+        ''' The process that executes the commands of the policy of a
+        semaphore (behaviour PolicyManager).
+
+        Parameters
+        ----------
+        semaphore : SimSemaphore
+            The semaphore that holds the Board.
+        restored : bool, optional
+            If True, the commands are rebuilt from the journal of the policy
+            and the process finishes the command that was being executed: it
+            is started when the WAIT or the CLOSE ends, and waits again for
+            the events of REQUEST and ATTENDED. Default = False.
+        deadline : float, optional
+            The simulated time when the restored ATTENDED command expires.
+        '''
+
+        commands = semaphore.policy.play(restored)
+        value = None
+        while True:
+            command, argument = commands.send(value)
+            value = None
+            if command == OPEN:
+                semaphore.board.open()
+            elif command == CLOSE:
+                if not restored:
+                    semaphore.board.color = 'AMBER'
+                    yield semaphore.board.security_time
+                semaphore.board.color = 'RED'
+            elif command == WAIT:
+                if not restored:
+                    yield argument
+            elif command == REQUEST:
+                if not restored:
+                    semaphore.ledger.expire(self.engine.now)
+                yield semaphore.new_request
+            elif command == ATTENDED:
+                value = yield semaphore.attended.wait(argument, deadline if restored else None)
+                if not value:
+                    semaphore.ledger.expire(self.engine.now)
+            elif command == NOW:
+                value = self.engine.now
+            restored = False
+
+
+
+def populate(simulation, n_simulations = 5, n_buses = 10, headway = None):
+    ''' Adds the agents of the BRT corridor modeled in main.py to a
+    simulation.
+
+    The default departures of the buses are the same of main.py: the first bus
+    starts at config.SECOND * 60 * 5 and the next ones each
+    config.SECOND * 60 * 10 seconds of simulation.
+
+    Parameters
+    ----------
+    simulation : Simulation
+        The simulation to populate. Any object with the methods add_station(),
+        add_semaphore() and add_bus() can be used.
+    n_simulations : int, optional
+        The number of trips of each bus. Default = 5.
+    n_buses : int, optional
+        The number of buses in the corridor. Default = 10.
+    headway : float, optional
+        The time (in simulated seconds) between the departures of two buses.
+        Default = config.SECOND * 60 * 10.
+
+    Returns
+    -------
+    object
+        The populated simulation.
+    '''
+
+    import data
+
+    for i, station in enumerate(data.stations):
+        simulation.add_station(
+            aid = 'station-%d' % i,
+            group = station['group'],
+            location = int(station['location'] * 10) + 6,
+            side = station['side'],
+            name = station['name'],
+            proximity_factor = 5,
+        )
+
+    for i, semaphore in enumerate(data.semaphores):
+        simulation.add_semaphore(
+            aid = 'semaphore-%d' % i,
+            group = semaphore['group'],
+            location = int(semaphore['location'] * 10) + 6,
+            perimeter = semaphore['perimeter'],
+            proximity_factor = 2,
+        )
+
+    if headway == None:
+        headway = config.SECOND * 60 * 10
+
+    for i in range(n_buses):
+        simulation.add_bus(
+            aid = 'bus-%d' % i,
+            name = 'TB%d Maracacuera São Brás' % i,
+            velocity = config.BUS_VELOCITY[i % len(config.BUS_VELOCITY)],
+            n_simulations = n_simulations,
+            start_time = config.SECOND * 60 * 5 + headway * i,
+        )
+
+    return simulation
+
+
+def corridor(seed = None, manager = 'board', n_simulations = 5, n_buses = 10, headway = None, fleet = False, sink = None, run = 0, steady_trips = _CONFIG):
+    ''' Builds the simulation of the BRT corridor modeled in main.py.
+
+    Parameters
+    ----------
+    seed : int, optional
+        The seed of the random generators. Default = None.
+    manager : str, optional
+        The policy of all the semaphores, or None to use the policy of each
+        group in config.SEMAPHORE_POLICY. Default = 'board'.
+    n_simulations, n_buses, headway
+        The parameters of populate().
+    fleet : bool, optional
+        If True, the buses are advanced together by a Fleet. Default = False.
+    sink : tralhoto.sink.Sink, optional
+        The sink that also stores the results. Default = None.
+    run : int, optional
+        The number of the run, which selects the streams of the flow tables.
+        Default = 0.
+    steady_trips : int, optional
+        The number of trips of the steady state after which the simulation
+        stops, or None to run all the trips. Default = config.STEADY_TRIPS.
+
+    Returns
+    -------
+    Simulation
+        The simulation ready to run.
+    '''
+
+    import data
+
+    flow = Flow(len(data.stations), seed = seed, run = run)
+    steady_trips = steady_trips if steady_trips is not _CONFIG else config.STEADY_TRIPS
+    warmup = Detector(steady_trips) if steady_trips is not None else None
+    simulation = Simulation(205, manager, seed, fleet, sink, flow, Dispatcher(), warmup = warmup)
+    return populate(simulation, n_simulations, n_buses, headway)
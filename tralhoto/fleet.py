@@ -0,0 +1,275 @@
+'''
+Fleet Module
+------------
+
+This module contains a vectorized model of the kinematics of the buses. The
+state of all the buses of a fleet (location, side, residual and counters) is
+stored in NumPy arrays and one call of Fleet.trip() advances any number of
+buses by one second of simulation, with the same rules of BusModel.trip() and
+BusModel.step().
+
+The bouncing movement of the buses along the road is computed over an
+unfolded coordinate. For a road with n cells, the unfolded coordinate u goes
+from 0 to 2 * (n - 1), where the values 0..n-1 are the cells of the side A
+and the values n..2*(n-1) are the cells n-2..0 of the side B.
+
+@author: @italocampos
+'''
+
+from tralhoto.model import BusModel
+from tralhoto import config
+
+import numpy
+
+
+# The codes of the sides of the road in the arrays of the Fleet
+A, B = 0, 1
+SIDES = ('A', 'B')
+
+
+class Fleet(object):
+    ''' The state of a fleet of buses.
+
+    Properties
+    ----------
+    road_size : int
+        The number of cells of the road.
+    size : int
+        The number of buses in this fleet.
+    ms : numpy.ndarray
+        The velocities of the buses (m/s).
+    location : numpy.ndarray
+        The locations of the buses in the road.
+    side : numpy.ndarray
+        The sides of the road that the buses are traveling (A or B).
+    residual : numpy.ndarray
+        The residual values after computed the next locations of the buses.
+    trip_time : numpy.ndarray
+        The total time (in seconds) of the current trip of each bus.
+    semaphore_time : numpy.ndarray
+        The time spent by each bus in closed semaphores.
+    n_semaphores : numpy.ndarray
+        The number of semaphores that each bus stoped in the current trip.
+    burned_stations : numpy.ndarray
+        The number of stations that each bus burned out.
+    '''
+
+    FIELDS = {
+        'ms': numpy.float64,
+        'location': numpy.int64,
+        'side': numpy.int8,
+        'residual': numpy.float64,
+        'trip_time': numpy.float64,
+        'semaphore_time': numpy.float64,
+        'n_semaphores': numpy.int64,
+        'burned_stations': numpy.int64,
+    }
+
+    def __init__(self, road_size, velocities = ()):
+        '''
+        Parameters
+        ----------
+        road_size : int
+            The number of cells of the road.
+        velocities : iterable, optional
+            The velocities (km/h) of the initial buses of the fleet.
+        '''
+
+        self.road_size = road_size
+        self.size = 0
+        for name, dtype in self.FIELDS.items():
+            setattr(self, name, numpy.zeros(0, dtype = dtype))
+        for velocity in velocities:
+            self.add(velocity)
+
+
+    def add(self, velocity = 45):
+        ''' Adds a bus in the begin of the road, side A.
+
+        Parameters
+        ----------
+        velocity : float, optional
+            The velocity of the bus (km/h). Default = 45.
+
+        Returns
+        -------
+        int
+            The index of the bus in the arrays of this Fleet.
+        '''
+
+        if self.size == len(self.location):
+            capacity = max(8, 2 * self.size)
+            for name in self.FIELDS:
+                array = getattr(self, name)
+                grown = numpy.zeros(capacity, dtype = array.dtype)
+                grown[:self.size] = array[:self.size]
+                setattr(self, name, grown)
+
+        index = self.size
+        self.size += 1
+        self.ms[index] = velocity / 3.6
+        return index
+
+
+    def trip(self, indexes = None):
+        ''' Advances the buses by one second of simulation.
+
+        This method also increments the trip time of the buses.
+
+        Parameters
+        ----------
+        indexes : numpy.ndarray, optional
+            The indexes of the buses to advance. Default = all the buses.
+
+        Returns
+        -------
+        steps : numpy.ndarray
+            The number of cells crossed by each bus of indexes.
+        buses : numpy.ndarray
+            The index of the bus of each crossed cell.
+        cells : numpy.ndarray
+            The crossed cells, grouped by bus in the order of indexes and, for
+            each bus, in the order they were crossed.
+        sides : numpy.ndarray
+            The side of the road of the bus when it reached each cell.
+        '''
+
+        if indexes is None:
+            indexes = numpy.arange(self.size)
+        else:
+            indexes = numpy.asarray(indexes, dtype = numpy.int64)
+
+        # Gets the number of cells to step and updates the residual values
+        total = self.residual[indexes] + self.ms[indexes]
+        steps = (total / config.CELL_SIZE).astype(numpy.int64)
+        self.residual[indexes] = total % config.CELL_SIZE
+        self.trip_time[indexes] += 1
+
+        # Computes the unfolded coordinates of the crossed cells
+        period = 2 * (self.road_size - 1)
+        location = self.location[indexes]
+        start = numpy.where(self.side[indexes] == A, location, period - location)
+        starts = numpy.cumsum(steps) - steps
+        buses = numpy.repeat(indexes, steps)
+        offsets = numpy.arange(len(buses)) - numpy.repeat(starts, steps) + 1
+        cells, sides = self.fold(numpy.repeat(start, steps) + offsets)
+
+        # Stores the last crossed cell of each bus that moved
+        moved = steps > 0
+        last, last_side = self.fold(start[moved] + steps[moved])
+        self.location[indexes[moved]] = last
+        self.side[indexes[moved]] = last_side
+
+        return steps, buses, cells, sides
+
+
+    def fold(self, unfolded):
+        ''' Converts unfolded coordinates (greater than 0) into cells and
+        sides of the road.
+
+        Parameters
+        ----------
+        unfolded : numpy.ndarray
+            The unfolded coordinates.
+
+        Returns
+        -------
+        cells : numpy.ndarray
+            The cells of the road.
+        sides : numpy.ndarray
+            The sides of the road.
+        '''
+
+        period = 2 * (self.road_size - 1)
+        wrapped = (unfolded - 1) % period + 1
+        back = wrapped > self.road_size - 1
+        cells = numpy.where(back, period - wrapped, wrapped)
+        return cells, back.astype(numpy.int8)
+
+
+    def reset(self, indexes):
+        ''' Restarts the counters of the trip of some buses.
+
+        Parameters
+        ----------
+        indexes : numpy.ndarray
+            The indexes of the buses.
+        '''
+
+        self.trip_time[indexes] = 0
+        self.semaphore_time[indexes] = 0
+        self.n_semaphores[indexes] = 0
+        self.burned_stations[indexes] = 0
+
+
+
+def _field(name, cast):
+    ''' Creates a property that maps an attribute of a FleetBus to its value in
+    an array of the Fleet. '''
+
+    def getter(self):
+        return cast(getattr(self.fleet, name)[self.index])
+
+    def setter(self, value):
+        getattr(self.fleet, name)[self.index] = value
+
+    return property(getter, setter)
+
+
+
+class FleetBus(BusModel):
+    ''' A Bus whose state is stored in a Fleet.
+
+    The attributes location, side, _residual and the counters of the trip are
+    views of the arrays of the Fleet, so the bus can be advanced either by
+    BusModel.trip() or, together with the other buses, by Fleet.trip().
+
+    Properties
+    ----------
+    fleet : Fleet
+        The fleet that stores the state of this Bus.
+    index : int
+        The index of this Bus in the arrays of the fleet.
+    '''
+
+    location = _field('location', int)
+    _residual = _field('residual', float)
+    trip_time = _field('trip_time', float)
+    semaphore_time = _field('semaphore_time', float)
+    n_semaphores = _field('n_semaphores', int)
+    burned_stations = _field('burned_stations', int)
+
+    def __init__(self, fleet, *args, **kwargs):
+        '''
+        Parameters
+        ----------
+        fleet : Fleet
+            The fleet that stores the state of this Bus.
+        *args, **kwargs
+            The parameters of BusModel.
+        '''
+
+        self.fleet = fleet
+        self.index = fleet.add()
+        super().__init__(*args, **kwargs)
+
+
+    @property
+    def side(self):
+        return SIDES[self.fleet.side[self.index]]
+
+
+    @side.setter
+    def side(self, side):
+        self.fleet.side[self.index] = SIDES.index(side)
+
+
+    @property
+    def velocity(self):
+        return self._velocity
+
+
+    @velocity.setter
+    def velocity(self, velocity):
+        self._velocity = velocity
+        self.fleet.ms[self.index] = velocity / 3.6
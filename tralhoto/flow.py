@@ -0,0 +1,130 @@
+'''
+Flow Module
+-----------
+
+This module contains the passenger flow of the stations. The flow tables of
+all the stations of a run are generated in one vectorized draw from a seeded
+numpy.random.Generator, and each station receives its own generator to choose
+the flow of each bus. The streams are spawned from a numpy.random.SeedSequence
+keyed by the seed and the number of the run, so the runs with the same seed
+are reproducible and the runs with different numbers are independent.
+
+The demand can vary along the day: a profile is a list of scenarios, one for
+each bin of config.PROFILE_BIN seconds of the simulated clock (for example,
+config.SERVICE_DAY). The tables have one row of values for each bin, drawn at
+once for all the stations, so a station finds the flow of a bus by the bin of
+the current time. The last bin holds after the end of the profile.
+
+The tables can be cached on disk by (profile, seed, run), so the sweeps and
+the replications of a scenario do not draw them again.
+
+@author: @italocampos
+'''
+
+from tralhoto import config
+
+import numpy, os
+
+
+class Flow(object):
+    ''' The passenger flow tables of the stations of a run.
+
+    Properties
+    ----------
+    profile : list
+        The functions of the config module that generate the flow values of
+        each bin of the day.
+    bin_size : float
+        The length (in simulated seconds) of the bins of the profile.
+    seed : int
+        The seed of the run, or None.
+    run : int
+        The number of the run.
+    tables : numpy.ndarray
+        The flow tables (number of passengers) of the stations, with the shape
+        (stations, bins, size).
+    _generators : list
+        The generators of the stations, used to choose the flow of each bus.
+    _next : int
+        The index of the next station to receive its table.
+    '''
+
+    def __init__(self, n_stations, scenario = None, seed = None, run = 0, size = None, cache = None, profile = None, bin_size = None):
+        '''
+        Parameters
+        ----------
+        n_stations : int
+            The number of stations of the run.
+        scenario : callable, optional
+            The function that generates the flow values. Default =
+            config.scenario.
+        seed : int, optional
+            The seed of the run. Default = None (a random seed, not cached).
+        run : int, optional
+            The number of the run. Default = 0.
+        size : int, optional
+            The number of values of each table. Default = config.FLOW_SIZE.
+        cache : str, optional
+            The directory where the tables are cached. Default =
+            config.FLOW_CACHE.
+        profile : list, optional
+            The functions that generate the flow values of each bin of the
+            day. Default = config.PROFILE, or [scenario] when it is None.
+        bin_size : float, optional
+            The length of the bins of the profile. Default =
+            config.PROFILE_BIN.
+        '''
+
+        profile = profile if profile != None else config.PROFILE
+        if profile == None:
+            profile = [scenario if scenario != None else config.scenario]
+        self.profile = list(profile)
+        self.bin_size = bin_size if bin_size != None else config.PROFILE_BIN
+        self.seed = seed
+        self.run = run
+        size = size if size != None else config.FLOW_SIZE
+        cache = cache if cache != None else config.FLOW_CACHE
+
+        sequence = numpy.random.SeedSequence(seed, spawn_key = (run,))
+        streams = sequence.spawn(n_stations + 1)
+        self._generators = [numpy.random.default_rng(stream) for stream in streams[1:]]
+        self._next = 0
+
+        path = None
+        if cache != None and seed != None:
+            names = '+'.join(scenario.__name__ for scenario in self.profile)
+            path = os.path.join(cache, '%s-%d-%d-%dx%dx%d.npy' % (names, seed, run, n_stations, len(self.profile), size))
+        if path != None and os.path.exists(path):
+            self.tables = numpy.load(path)
+        else:
+            generator = numpy.random.default_rng(streams[0])
+            self.tables = numpy.empty((n_stations, len(self.profile), size), dtype = int)
+            for index, scenario in enumerate(self.profile):
+                self.tables[:, index] = numpy.rint(scenario(generator, (n_stations, size)))
+            if path != None:
+                os.makedirs(cache, exist_ok = True)
+                temporary = path + '.tmp.npy'
+                numpy.save(temporary, self.tables)
+                os.replace(temporary, path)
+
+
+    def station(self):
+        ''' Returns the flow table and the generator of the next station.
+
+        Returns
+        -------
+        tuple
+            The flow table (numpy.ndarray, one row for each bin) and the
+            generator of the station.
+
+        Raises
+        ------
+        ValueError
+            When all the tables were already given.
+        '''
+
+        if self._next >= len(self._generators):
+            raise(ValueError('All the %d flow tables were already given.' % len(self._generators)))
+        index = self._next
+        self._next += 1
+        return self.tables[index], self._generators[index]
@@ -0,0 +1,124 @@
+'''
+Headway Module
+--------------
+
+This module contains the dispatcher that keeps the headways of the buses even.
+The buses report to the dispatcher when they reach the sensor of a station
+where they stop, and the dispatcher answers with the headway of the bus (the
+time since the previous bus passed by the same station, in the same side) and
+the time that the bus must be held in the station. The headways are measured
+at the arrival of the buses, even when the dwell times of the stations of a
+segment are asked in advance (config.STATION_SEGMENT).
+
+A bus is held when its headway is shorter than the target headway, until it
+reaches the target (for at most config.MAX_HOLDING_TIME seconds). The target
+is config.TARGET_HEADWAY or, when it is None, the mean headway observed in the
+station. This avoids the bunching of the buses, where a late bus collects more
+passengers and gets later, while the bus behind it gets closer.
+
+The headways are always measured, so the variance of the headways of a trip is
+recorded by the buses even when the holding is disabled (config.HEADWAY_CONTROL
+= False).
+
+@author: @italocampos
+'''
+
+from tralhoto import config
+
+import threading
+
+
+class Dispatcher(object):
+    ''' Measures the headways of the buses in the stations and computes their
+    holding times.
+
+    Properties
+    ----------
+    control : bool
+        Indicates if the buses are held in the stations.
+    target : float
+        The target headway (seconds), or None to use the mean headway of each
+        station.
+    max_holding : float
+        The max time (seconds) that a bus is held in a station.
+    _passages : dict
+        Maps each (location, side) of the stations to the time when the last
+        bus left it.
+    _means : dict
+        Maps each (location, side) of the stations to the number and the mean
+        of its headways.
+    _lock : threading.Lock
+        Serializes the reports of the stations.
+    '''
+
+    def __init__(self, control = None, target = None, max_holding = None):
+        '''
+        Parameters
+        ----------
+        control : bool, optional
+            Indicates if the buses are held in the stations. Default =
+            config.HEADWAY_CONTROL.
+        target : float, optional
+            The target headway (seconds). Default = config.TARGET_HEADWAY.
+        max_holding : float, optional
+            The max holding time (seconds). Default = config.MAX_HOLDING_TIME.
+        '''
+
+        self.control = control if control != None else config.HEADWAY_CONTROL
+        self.target = target if target != None else config.TARGET_HEADWAY
+        self.max_holding = max_holding if max_holding != None else config.MAX_HOLDING_TIME
+        self._passages = dict()
+        self._means = dict()
+        self._lock = threading.Lock()
+
+
+    def __getstate__(self):
+        with self._lock:
+            state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+    def arrive(self, location, side, now):
+        ''' Reports a bus that reached the sensor of a station where it
+        stops.
+
+        Parameters
+        ----------
+        location : int
+            The location of the station.
+        side : str ('A' or 'B')
+            The side of the road of the bus.
+        now : float
+            The current time (in simulated seconds).
+
+        Returns
+        -------
+        tuple
+            The headway of the bus (None for the first bus of the station) and
+            its holding time.
+        '''
+
+        key = (location, side)
+        with self._lock:
+            last = self._passages.get(key)
+            if last == None:
+                self._passages[key] = now
+                return None, 0.0
+
+            headway = now - last
+            count, mean = self._means.get(key, (0, 0.0))
+            target = self.target if self.target != None else mean
+
+            holding = 0.0
+            if self.control and count > 0:
+                holding = min(self.max_holding, max(0.0, target - headway))
+
+            self._means[key] = (count + 1, mean + (headway - mean) / (count + 1))
+            self._passages[key] = now + holding
+            return headway, holding
@@ -0,0 +1,149 @@
+'''
+Ledger Module
+-------------
+
+This module contains the ledger of the opening requests of a Semaphore. Each
+bus has at most one live request, indexed by its identifier, so a repeated
+OPEN or a lost or repeated CONFIRMATION can not make the number of requests
+drift. A request expires config.REQUEST_TIMEOUT seconds after it was made, so
+a bus that never confirms does not keep the Board requested forever.
+
+The ledger is thread-safe: the listener of the ledger is called, with the lock
+held, every time the ledger becomes live (the first request) or empty (the
+last request was confirmed or expired), so the events of the runtimes are
+always changed in the same order as the ledger.
+
+@author: @italocampos
+'''
+
+from tralhoto import config
+
+import threading
+
+
+class Ledger(object):
+    ''' The opening requests of a Semaphore, indexed by bus.
+
+    Properties
+    ----------
+    timeout : float
+        The time (in simulated seconds) that a request lives.
+    listener : callable
+        Called as listener(live) when the ledger becomes live (True) or empty
+        (False).
+    _entries : dict
+        Maps the buses to their requests, as lists [requested, expiry,
+        arrival] (in simulated seconds).
+    _lock : threading.RLock
+        Serializes the changes of the ledger.
+    '''
+
+    def __init__(self, timeout = None, listener = None):
+        '''
+        Parameters
+        ----------
+        timeout : float, optional
+            The time that a request lives. Default = config.REQUEST_TIMEOUT.
+        listener : callable, optional
+            Called when the ledger becomes live or empty.
+        '''
+
+        self.timeout = timeout if timeout != None else config.REQUEST_TIMEOUT
+        self.listener = listener
+        self._entries = dict()
+        self._lock = threading.RLock()
+
+
+    def request(self, bus, now, arrival = None):
+        ''' Records the request of a bus. A repeated request of the same bus
+        renews its expiry.
+
+        Parameters
+        ----------
+        bus : object
+            The identifier of the bus.
+        now : float
+            The current time.
+        arrival : float, optional
+            The predicted arrival time of the bus. Default = now.
+        '''
+
+        with self._lock:
+            self._expire(now)
+            self._entries[bus] = [now, now + self.timeout, arrival if arrival != None else now]
+            if len(self._entries) == 1:
+                self._notify(True)
+
+
+    def confirm(self, bus):
+        ''' Removes the request of a bus that passed by the Semaphore. The
+        confirmations of unknown buses are ignored.
+
+        Parameters
+        ----------
+        bus : object
+            The identifier of the bus.
+        '''
+
+        with self._lock:
+            if self._entries.pop(bus, None) != None and not self._entries:
+                self._notify(False)
+
+
+    def expire(self, now):
+        ''' Removes the requests that expired.
+
+        Parameters
+        ----------
+        now : float
+            The current time.
+
+        Returns
+        -------
+        int
+            The number of expired requests.
+        '''
+
+        with self._lock:
+            return self._expire(now)
+
+
+    def arrivals(self):
+        ''' Returns a dict that maps the buses to their predicted arrivals. '''
+
+        with self._lock:
+            return {bus: entry[2] for bus, entry in self._entries.items()}
+
+
+    def __getstate__(self):
+        with self._lock:
+            state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def __contains__(self, bus):
+        return bus in self._entries
+
+
+    def _expire(self, now):
+        expired = [bus for bus, entry in self._entries.items() if entry[1] <= now]
+        for bus in expired:
+            del self._entries[bus]
+        if expired and not self._entries:
+            self._notify(False)
+        return len(expired)
+
+
+    def _notify(self, live):
+        if self.listener != None:
+            self.listener(live)
@@ -0,0 +1,662 @@
+'''
+Model Module
+------------
+
+This module contains the state and the logic of the agents that do not depend
+on the agent runtime. The PADE agents of the module tralhoto.agent and the
+entities of the simulation engine (tralhoto.engine) are built over these
+classes, so both execute exactly the same rules.
+
+@author: @italocampos
+'''
+
+from tralhoto.board import Board
+from tralhoto.flow import Flow
+from tralhoto.ledger import Ledger
+from tralhoto.policy import create_policy
+from tralhoto import config
+
+import math
+import numpy
+
+
+class SemaphoreModel(object):
+    ''' The state and the logic of a Semaphore.
+
+    Properties
+    ----------
+    group : int
+        An int that describes the group of this semaphore.
+    location : int
+        The location if this semaphore in the global road.
+    road : list
+        A list representing the road of BRT buses. The elements of the list
+        must be:
+            ([{'address': AID, 'type': str}], board.Board])
+    proximity_factor : int
+        The number of cells of the road vector arround the Semaphore that
+        define the area to start the communication with the buses.
+    perimeter : str
+        Describes the perimeter correspondent to this semaphore.
+    ledger : tralhoto.ledger.Ledger
+        The non-attended opening requests of the buses.
+    MAX_OPENING_TIME : float
+        The max time that this semaphore can remain open for the BRT bus
+        before closes.
+    MIN_CLOSING_TIME : float
+        The minimum time that this semaphore must wait before open again.
+    policy : tralhoto.policy.Policy
+        The policy that controls the Board of this semaphore.
+    new_request, attended
+        The events of the runtime that sinalize when a new request arrives
+        and when all the requests were attended. They are created by the
+        runtimes and changed by the ledger.
+    '''
+
+    def __init__(self, group, location, road, proximity_factor = 3, perimeter = None, policy = None):
+        '''
+        Parameters
+        ----------
+        group : int
+            An int that describes the group of this semaphore.
+        location : int
+            The location if this semaphore in the road.
+        road : list
+            A list representing the road of BRT buses.
+        proximity_factor : int, optional
+            The number of cells of the road vector arround the Semaphore that
+            define the area to start the communication with the buses.
+        perimeter : str, optional
+            Describes the perimeter correspondent to this semaphore.
+        policy : str, optional
+            The name of the policy of this semaphore. Default = the policy of
+            its group in config.SEMAPHORE_POLICY.
+        '''
+
+        self.group = group
+        self.location = location
+        self.road = road
+        self.proximity_factor = proximity_factor
+        self.perimeter = perimeter
+        self.ledger = Ledger(listener = self.signal)
+
+        # Setting the opening and closing times according with the config file
+        self.MAX_OPENING_TIME = config.SEMAPHORE_MAX_OPENING_TIME[group]
+        self.MIN_CLOSING_TIME = config.SEMAPHORE_MIN_CLOSING_TIME[group]
+        self.policy = create_policy(self, policy)
+
+
+    def place(self):
+        ''' Puts the proximity sensors and the Board of this semaphore in the
+        road. '''
+
+        # Sets the locations of the proximity sensor
+        self.road[self.location - self.proximity_factor][0].append({
+          'aid': self.aid,
+          'type': 'semaphore',
+          'side': 'A',
+          'board': self.road[self.location],
+        })
+        self.road[self.location + self.proximity_factor][0].append({
+          'aid': self.aid,
+          'type': 'semaphore',
+          'side': 'B',
+          'board': self.road[self.location],
+        })
+
+        # Sets the location of the Board of this semaphore
+        self.road[self.location][1] = Board()
+
+
+    @property
+    def requests(self):
+        ''' The number of non-attended opening requests. '''
+
+        return len(self.ledger)
+
+
+    @property
+    def arrivals(self):
+        ''' The predicted arrival times (in simulated seconds) of the buses
+        that requested the opening, indexed by the identifiers of the buses. '''
+
+        return self.ledger.arrivals()
+
+
+    def request(self, bus, now, eta = None):
+        ''' Records the opening request of a bus.
+
+        Parameters
+        ----------
+        bus : object
+            The identifier of the bus.
+        now : float
+            The current time (in simulated seconds).
+        eta : float, optional
+            The time that the bus predicts to reach the Board.
+        '''
+
+        self.ledger.request(bus, now, now + eta if eta != None else None)
+
+
+    def confirm(self, bus):
+        ''' Records the confirmation of a bus that passed by this semaphore.
+
+        Parameters
+        ----------
+        bus : object
+            The identifier of the bus.
+        '''
+
+        self.ledger.confirm(bus)
+
+
+    def signal(self, live):
+        ''' Sets the events of the runtime when the ledger becomes live (a new
+        request) or empty (all the requests were attended or expired).
+
+        Parameters
+        ----------
+        live : bool
+            Indicates if there are requests in the ledger.
+        '''
+
+        if live:
+            self.attended.clear()
+            self.new_request.set()
+        else:
+            self.new_request.clear()
+            self.attended.set()
+
+
+    @property
+    def board(self):
+        ''' A shortcut to access the Board of this Semaphore.
+
+        Returns
+        -------
+        Board
+            The loacation of the read with the local Board.
+        '''
+
+        return self.road[self.location][1]
+
+
+    def __str__(self):
+        return '{per}\nLocation: {loc}, #{gp}'.format(
+            per = self.perimeter,
+            loc = self.location,
+            gp = self.group,
+        )
+
+
+
+class StationModel(object):
+    ''' The state and the logic of a Station.
+
+    Properties
+    ----------
+    group : int
+        An int that describes the group of this Station.
+    location : int
+        The location if this Station in the global road.
+    road : list
+        A list representing the road of BRT buses. The elements of the list
+        must be:
+            ([{'address': AID, 'type': str}], board.Board])
+    side : str ('A' or 'B')
+        The service side of this station.
+    proximity_factor : int
+        The number of cells of the road vector arround the Station that define
+        the area to start the communication with the buses.
+    name : str
+        The name of this Station.
+    data : numpy.ndarray
+        The data of passengers flow between stations and buses, one row for
+        each bin of the demand profile (see tralhoto.flow).
+    dwell : numpy.ndarray
+        The times that the buses wait in this Station for each value of data.
+    bin_size : float
+        The length (in simulated seconds) of the bins of the demand profile.
+    epoch : float
+        The time when the service day starts, in the clock of the runtime.
+    generator : numpy.random.Generator
+        Chooses the flow of each bus.
+    '''
+
+    def __init__(self, group, location, road, side = None, proximity_factor = 5, name = None, flow = None):
+        '''
+        Parameters
+        ----------
+        group : int
+            An int that describes the group of this Station.
+        location : int
+            The location if this Station in the global road.
+        road : list
+            A list representing the road of BRT buses.
+        side : str ('A' or 'B'), optional
+            The service side of this station.
+        proximity_factor : int, optional
+            The number of cells of the road vector arround the Station that
+            define the area to start the communication with the buses.
+        name : str, optional
+            The name of this Station.
+        flow : tralhoto.flow.Flow, optional
+            The flow tables of the run. Default = a table for this Station
+            only, seeded by the global numpy generator.
+        '''
+
+        self.name = name
+        self.location = location
+        self.group = group
+        self.proximity_factor = proximity_factor
+        self.road = road
+        self.side = side
+
+        # Generating discrete values to simulate the passenger movimentation
+        if flow == None:
+            flow = Flow(1, seed = int(numpy.random.randint(2 ** 31)))
+        self.data, self.generator = flow.station()
+        self.dwell = numpy.rint(self.data / (1 + group)) * config.TIME_PER_PASSENGER
+        self.bin_size = flow.bin_size
+        self.epoch = 0.0
+
+
+    def place(self):
+        ''' Puts the proximity sensors of this Station in the road. '''
+
+        self.road[self.location - self.proximity_factor][0].append({
+          'aid': self.aid,
+          'type': 'station',
+          'side': 'A',
+          'location': self.location,
+          'cell': self.road[self.location],
+        })
+        self.road[self.location + self.proximity_factor][0].append({
+          'aid': self.aid,
+          'type': 'station',
+          'side': 'B',
+          'location': self.location,
+          'cell': self.road[self.location],
+        })
+
+
+    def serves(self, side):
+        ''' Returns a bool that indicates if this Station attends the buses
+        traveling in the given side of the road.
+
+        Parameters
+        ----------
+        side : str ('A' or 'B')
+            The side of the road of the bus.
+
+        Returns
+        -------
+        bool
+            Indicates if the bus must stop in this Station.
+        '''
+
+        return self.side == None or self.side == side
+
+
+    def wait_time(self, now = None):
+        ''' Returns the time that the bus must stay in this station.
+
+        Parameters
+        ----------
+        now : float, optional
+            The current time (in simulated seconds), which selects the bin of
+            the demand profile. Default = None (the first bin).
+
+        Returns
+        -------
+        float
+            The amout of time that the bus must wait in this Station.
+        '''
+
+        row = 0
+        if now != None:
+            row = min(max(int((now - self.epoch) // self.bin_size), 0), len(self.dwell) - 1)
+        return float(self.dwell[row, self.generator.integers(self.dwell.shape[1])])
+
+
+    def __str__(self):
+        return '{name}\nLocation: {loc}, #{gp}'.format(
+            name = self.name,
+            loc = self.location,
+            gp = self.group,
+        )
+
+
+
+class BusModel(object):
+    ''' The state and the logic of a Bus.
+
+    Properties
+    ----------
+    road : list
+        A list representing the road of BRT buses. The elements of the list
+        must be:
+            ([{'address': AID, 'type': str}], board.Board])
+    name : str
+        The name of this Bus.
+    velocity : float
+        The speed parameter for the Bus (km/h).
+    location : int
+        The location if this Station in the global road.
+    side : str ('A' or 'B')
+        The current side of the road that this Bus is traveling.
+    semaphore_fifo : list
+        The addresses of the semaphores that were messaged and whose Boards
+        were not passed yet, in the order they were messaged.
+    next_station : dict
+        Stores data about the next station to stop.
+    n_semaphores : int
+        The total number of semaphores that this bus stoped in the last trip.
+    burned_stations : int
+        The total number of station that this bus burned out.
+    trip_time : float
+        The total time (in seconds) of the trip.
+    semaphore_time : float
+        The time spent by this Bus in closed semaphores.
+    headways : list
+        The headways (in seconds) of this Bus in the stations of the trip.
+    dispatcher : tralhoto.headway.Dispatcher
+        Measures the headways of the buses and holds them in the stations, or
+        None.
+    answers : dict
+        The answers of the stations that were not reached yet, as tuples
+        (location, wait_time, name), indexed by the identifiers of the stations.
+    reached : set
+        The stations whose sensors were reached before their answers.
+    start_time : float
+        The time (in simulated seconds) when this bus will start to run.
+    n_simulations : int
+        The number of times that this bus will trip.
+    road_index : tralhoto.road.RoadIndex
+        The compiled events of the road, built when the bus starts to run.
+    _residual : float
+        The residual value after computed the next location of this Bus.
+    '''
+
+    def __init__(self, road, name = None, velocity = 45, start_time = 10, n_simulations = 10, dispatcher = None):
+        '''
+        Parameters
+        ----------
+        road : list
+            A list representing the road of BRT buses.
+        name : str, optional
+            The name of this Bus.
+        velocity : float, optional
+            The speed parameter for the Bus (km/h). Default = 45.
+        start_time : float, optional
+            The time when this bus will start to run. Default = 10.
+        n_simulations : int, optional
+            The number of times that this bus will trip. Default = 10
+        dispatcher : tralhoto.headway.Dispatcher, optional
+            The dispatcher shared by the buses. Default = None (the headways
+            are not measured).
+        '''
+
+        self.name = name
+        self.velocity = velocity
+        self.road = road
+        self.start_time = start_time
+        self.n_simulations = n_simulations
+        self.location = 0
+        self.side = 'A'
+        self.next_station = {
+            'location': None,
+            'wait_time': 0,
+            'name': None
+        }
+        self.semaphore_fifo = list()
+        self.semaphore_time = 0.0
+        self.trip_time = 0.0
+        self.n_semaphores = 0
+        self.burned_stations = 0
+        self.headways = list()
+        self.dispatcher = dispatcher
+        self.answers = dict()
+        self.reached = set()
+        self.road_index = None
+        self._residual = 0.0
+
+
+    def trip(self):
+        ''' Calculates the number of cells in the road that this Bus will reach
+        after 1 second of simulation. This value variates according with the
+        velocity of this Bus.
+
+        This method also automatically increments the trip time.
+
+        Returns
+        -------
+        list
+            A list with the positions to forward.
+        '''
+
+        # Converting the velocity from km/h to m/s
+        ms = self.velocity / 3.6
+
+        # Gets the number of cells to step
+        n = int((self._residual + ms) / config.CELL_SIZE)
+        # Updates the residual value
+        self._residual = (self._residual + ms) % config.CELL_SIZE
+        # Increments the total trip time
+        self.trip_time += 1
+        return [self.step() for _ in range(n)]
+
+
+    def step(self):
+        ''' Return the next location for the Bus.
+
+        Returns
+        -------
+        int
+            The position of the next location of the Bus
+        '''
+
+        if self.side == 'A':
+            if self.location + 1 < len(self.road):
+                self.location += 1
+            else:
+                self.side = 'B'
+                self.location -= 1
+
+        elif self.side == 'B':
+            if self.location - 1 >= 0:
+                self.location -= 1
+            else:
+                self.side = 'A'
+                self.location += 1
+
+        return self.location
+
+
+    def stop_at(self, location, wait_time, name, now = None):
+        ''' Sets the next station where this Bus must stop.
+
+        The dispatcher measures the headway of this Bus and adds its holding
+        time to the wait time. If the location of the station was already
+        passed by this Bus, the station is counted as burned.
+
+        Parameters
+        ----------
+        location : int
+            The location of the station in the road. None means that there is
+            no station to stop.
+        wait_time : float
+            The time that the bus must stay in the station.
+        name : str
+            The name of the station.
+        now : float, optional
+            The current time (in simulated seconds), when this Bus reaches the
+            sensor of the station.
+
+        Returns
+        -------
+        bool
+            Indicates if this Bus burned the station.
+        '''
+
+        self.next_station['wait_time'] = wait_time
+        self.next_station['location'] = location
+        self.next_station['name'] = name
+
+        if location == None:
+            return False
+        if self.dispatcher != None:
+            headway, holding = self.dispatcher.arrive(location, self.side, now)
+            if headway != None:
+                self.headways.append(headway)
+            self.next_station['wait_time'] += holding
+        # Checks if this bus burned the location of the station
+        if (self.side == 'A' and location <= self.location) or \
+            (self.side == 'B' and location >= self.location):
+            self.burned_stations += 1
+            return True
+        return False
+
+
+    def eta(self, location):
+        ''' Predicts the time that this Bus takes to reach a location ahead of
+        it, from its velocity, the residual of its last step and the time that
+        it will stop in the next station.
+
+        Parameters
+        ----------
+        location : int
+            The location ahead of this Bus.
+
+        Returns
+        -------
+        float
+            The predicted time (in seconds), or None if the location is None.
+        '''
+
+        if location == None:
+            return None
+
+        distance = abs(location - self.location) * config.CELL_SIZE - self._residual
+        time = max(distance, 0.0) / (self.velocity / 3.6)
+        station = self.next_station['location']
+        if station != None:
+            if (self.side == 'A' and self.location < station <= location) or \
+                (self.side == 'B' and location <= station < self.location):
+                time += self.next_station['wait_time']
+        return time
+
+
+    def cache(self, station, answer, now = None):
+        ''' Stores the answer of a station until this Bus reaches its sensor.
+        If the sensor was already reached, the answer is applied at once.
+
+        Parameters
+        ----------
+        station : object
+            The identifier of the station.
+        answer : tuple
+            The answer of the station: (location, wait_time, name).
+        now : float, optional
+            The current time (in simulated seconds).
+
+        Returns
+        -------
+        bool
+            Indicates if this Bus burned the station.
+        '''
+
+        if station in self.reached:
+            self.reached.discard(station)
+            return self.stop_at(*answer, now)
+        self.answers[station] = answer
+        return False
+
+
+    def reach(self, station, now = None):
+        ''' Applies the answer of a station when this Bus reaches its sensor.
+        If the answer did not arrive yet, it is applied when it is cached.
+
+        Parameters
+        ----------
+        station : object
+            The identifier of the station.
+        now : float, optional
+            The current time (in simulated seconds).
+
+        Returns
+        -------
+        bool
+            Indicates if this Bus burned the station.
+        '''
+
+        answer = self.answers.pop(station, None)
+        if answer == None:
+            self.reached.add(station)
+            return False
+        return self.stop_at(*answer, now)
+
+
+    def leave(self, semaphores):
+        ''' Removes the semaphores of a Board from the messaged ones when this
+        Bus passes by the Board. The sensors of two close semaphores can be
+        reached before their Boards in any order, so the semaphores are found
+        by their Board and not by the order of the messages.
+
+        Parameters
+        ----------
+        semaphores : list
+            The addresses of the semaphores of the Board.
+
+        Returns
+        -------
+        list
+            The addresses of the semaphores messaged by this Bus, to send them
+            the CONFIRMATION.
+        '''
+
+        messaged = [semaphore for semaphore in semaphores if semaphore in self.semaphore_fifo]
+        for semaphore in messaged:
+            self.semaphore_fifo.remove(semaphore)
+        return messaged
+
+
+    def record(self):
+        ''' Returns the results of the current trip of this Bus.
+
+        Returns
+        -------
+        dict
+            The name and the velocity of this Bus together with the counters
+            of the current trip.
+        '''
+
+        return {
+            'bus_name': self.name,
+            'velocity': self.velocity,
+            'trip_time': self.trip_time,
+            'burned_stations': self.burned_stations,
+            'n_semaphores': self.n_semaphores,
+            'semaphore_time': self.semaphore_time,
+            'headway_variance': float(numpy.var(self.headways, ddof = 1)) if len(self.headways) > 1 else math.nan,
+        }
+
+
+    def reset(self):
+        ''' Restarts the counters of the trip. '''
+
+        self.burned_stations = 0
+        self.trip_time = 0
+        self.n_semaphores = 0
+        self.semaphore_time = 0
+        self.headways = list()
+
+
+    def __str__(self):
+        return '{name}\n{vel} km/h #{pos} {side}'.format(
+            name = self.name,
+            vel = self.velocity,
+            pos = self.location,
+            side = '>>' if self.side == 'A' else '<<'
+        )
@@ -0,0 +1,178 @@
+'''
+Network Module
+--------------
+
+This module models a network of BRT lines that share segments of the road.
+Each segment is a list of cells (as the road vector of main.py) stored once in
+the network, and each line (a route) is a sequence of segments. The road of a
+route is a list with the references of the cells of its segments, so the
+sensors and the Boards placed in a shared segment are seen by all the routes
+that pass by it, and the buses of every route keep running over a plain list
+of cells (BusModel.step() bounces between its ends).
+
+The stations and the semaphores are attached to the nodes of the network: a
+cell of a segment, given as a tuple (segment, cell). Their sensors must fall
+inside the same segment (at least proximity_factor cells away from its ends),
+so they are shared by all the routes of the segment. The sides of the road (A
+and B) follow the order of the cells of the segments, so the routes must pass
+by the shared segments in the same direction.
+
+For example, two lines that share a trunk:
+
+    network = Network()
+    network.add_segment('trunk', 120)
+    network.add_segment('north', 85)
+    network.add_segment('south', 60)
+    network.add_route('north', ['trunk', 'north'])
+    network.add_route('south', ['trunk', 'south'])
+
+@author: @italocampos
+'''
+
+
+class Network(object):
+    ''' A road network of segments shared by routes.
+
+    Properties
+    ----------
+    segments : dict
+        Maps the names of the segments to their lists of cells. Each cell is a
+        list [[sensors], Board or None], as in the road vector.
+    routes : dict
+        Maps the names of the routes to their roads: lists with the references
+        of the cells of their segments.
+    _offsets : dict
+        Maps the names of the routes to dicts that map their segments to the
+        index of their first cells in the road of the route.
+    '''
+
+    def __init__(self):
+        self.segments = dict()
+        self.routes = dict()
+        self._offsets = dict()
+
+
+    def add_segment(self, name, size):
+        ''' Creates a segment of the road.
+
+        Parameters
+        ----------
+        name : str
+            The name of the segment.
+        size : int
+            The number of cells of the segment.
+
+        Returns
+        -------
+        list
+            The cells of the segment.
+
+        Raises
+        ------
+        ValueError
+            When a segment with the same name exists.
+        '''
+
+        if name in self.segments:
+            raise(ValueError('The segment %s already exists.' % name))
+        self.segments[name] = [[[], None] for _ in range(size)]
+        return self.segments[name]
+
+
+    def add_route(self, name, segments):
+        ''' Creates a route over a sequence of segments.
+
+        Parameters
+        ----------
+        name : str
+            The name of the route.
+        segments : list
+            The names of the segments of the route, in the order the buses
+            pass by them in the side A.
+
+        Returns
+        -------
+        list
+            The road of the route.
+
+        Raises
+        ------
+        ValueError
+            When the route exists or a segment is unknown or repeated.
+        '''
+
+        if name in self.routes:
+            raise(ValueError('The route %s already exists.' % name))
+        offsets = dict()
+        road = list()
+        for segment in segments:
+            if segment not in self.segments:
+                raise(ValueError('The segment %s does not exist.' % segment))
+            if segment in offsets:
+                raise(ValueError('The segment %s is repeated in the route %s.' % (segment, name)))
+            offsets[segment] = len(road)
+            road.extend(self.segments[segment])
+        self.routes[name] = road
+        self._offsets[name] = offsets
+        return road
+
+
+    def locate(self, route, node):
+        ''' Returns the location of a node in the road of a route.
+
+        Parameters
+        ----------
+        route : str
+            The name of the route.
+        node : tuple
+            The node, as (segment, cell).
+
+        Returns
+        -------
+        int
+            The index of the cell in the road of the route.
+
+        Raises
+        ------
+        ValueError
+            When the route does not pass by the segment of the node.
+        '''
+
+        segment, cell = node
+        offsets = self._offsets[route]
+        if segment not in offsets:
+            raise(ValueError('The route %s does not pass by the segment %s.' % (route, segment)))
+        return offsets[segment] + cell
+
+
+    def anchor(self, node, proximity_factor = 0):
+        ''' Returns a road and a location where an agent attached to a node
+        can place its sensors and its Board.
+
+        Parameters
+        ----------
+        node : tuple
+            The node, as (segment, cell).
+        proximity_factor : int, optional
+            The distance of the sensors of the agent to the node. Default = 0.
+
+        Returns
+        -------
+        tuple
+            The road of a route that passes by the node and the location of
+            the node in this road.
+
+        Raises
+        ------
+        ValueError
+            When the sensors fall outside the segment or no route passes by
+            the segment.
+        '''
+
+        segment, cell = node
+        if cell - proximity_factor < 0 or cell + proximity_factor >= len(self.segments[segment]):
+            raise(ValueError('The sensors of the node %s fall outside the segment %s.' % (cell, segment)))
+        for route, offsets in self._offsets.items():
+            if segment in offsets:
+                return self.routes[route], offsets[segment] + cell
+        raise(ValueError('No route passes by the segment %s.' % segment))
@@ -0,0 +1,290 @@
+'''
+Offsets Module
+--------------
+
+This module optimizes the offsets of the cycles of the semaphores, so the
+buses meet green Boards along the corridor instead of being platooned into red
+lights. The offsets are the delays (in seconds) of the first opening of the
+Boards, used by the green_wave policy (see tralhoto.policy) when they are set
+in config.SEMAPHORE_OFFSETS.
+
+The optimizer uses an analytic model of the round trips of the buses: each bus
+runs at its velocity, stops in the stations of its side for a dwell time drawn
+from the flow of the scenario, and waits in the Boards that are not green when
+it arrives. The buses make consecutive round trips, since the phase in which a
+bus starts a trip depends on the Boards of its previous trip. The trips are
+evaluated at once for all the velocities of config.BUS_VELOCITY and for a grid
+of departure times over the cycle (with the same dwell times for every table of
+offsets), and the offset of each Board is chosen by coordinate descent, trying
+all the candidate offsets of a Board in a single vectorized evaluation. The
+splits of the cycles (green, amber and red) are kept as defined by the groups
+of the semaphores, since the model has no cross traffic to trade against the
+green of the buses.
+
+Run with:
+
+    python -m tralhoto.offsets --output offsets.json
+
+And use the table in the simulations with:
+
+    config.SEMAPHORE_OFFSETS = offsets.load('offsets.json')
+    config.SEMAPHORE_POLICY = ['green_wave', 'green_wave', 'green_wave']
+
+@author: @italocampos
+'''
+
+from tralhoto.board import Board
+from tralhoto import config
+
+import argparse, json
+import numpy
+
+
+class Corridor(object):
+    ''' The analytic model of the round trips of the buses.
+
+    Properties
+    ----------
+    locations : numpy.ndarray
+        The locations of the Boards (one for each location of the semaphores).
+    green : numpy.ndarray
+        The green time of each Board (seconds).
+    cycle : numpy.ndarray
+        The cycle time of each Board (seconds).
+    events : list
+        The events of a round trip, in the order they happen, as tuples
+        (distance, dwell, board): the distance (cells) from the previous
+        event, the dwell times of each bus in a station (or 0) and the index of
+        a Board (or None).
+    velocities : numpy.ndarray
+        The velocities of the buses (km/h).
+    departures : numpy.ndarray
+        The departure times of the buses, over the longest cycle.
+    trips : int
+        The number of consecutive round trips of each bus.
+    '''
+
+    def __init__(self, stations, semaphores, road_size = 205, proximity_factor = 5, velocities = None, samples = 64, trips = 5, seed = 0):
+        '''
+        Parameters
+        ----------
+        stations : list
+            The stations, as in data.stations.
+        semaphores : list
+            The semaphores, as in data.semaphores.
+        road_size : int, optional
+            The number of cells of the road. Default = 205.
+        proximity_factor : int, optional
+            The proximity factor of the stations. Default = 5.
+        velocities : list, optional
+            The velocities of the buses. Default = config.BUS_VELOCITY.
+        samples : int, optional
+            The number of departure times of each velocity. Default = 64.
+        trips : int, optional
+            The number of consecutive round trips of each bus. Default = 5.
+        seed : int, optional
+            The seed of the dwell times. Default = 0.
+        '''
+
+        # The semaphores in the same location share the same Board
+        groups = dict()
+        for semaphore in semaphores:
+            groups.setdefault(int(semaphore['location'] * 10) + 6, semaphore['group'])
+        self.locations = numpy.array(sorted(groups))
+        group = numpy.array([groups[location] for location in self.locations])
+        opening = numpy.array(config.SEMAPHORE_MAX_OPENING_TIME)[group]
+        closing = numpy.array(config.SEMAPHORE_MIN_CLOSING_TIME)[group]
+        self.green = opening.astype(float)
+        self.cycle = (opening + closing + Board().security_time).astype(float)
+
+        self.velocities = numpy.array(velocities if velocities != None else config.BUS_VELOCITY, dtype = float)
+        self.departures = numpy.arange(samples) * self.cycle.max() / samples
+        self.trips = trips
+        generator = numpy.random.default_rng(seed)
+        shape = (len(self.velocities), samples)
+
+        # Places the events in the unfolded coordinate of the round trip (the
+        # side B is mapped to road_size - 1 .. 2 * (road_size - 1)). In the
+        # same cell, the buses stop in the station, then message the nearby
+        # agents and finally look at the Board
+        STOP, SENSOR, BOARD = range(3)
+        period = 2 * (road_size - 1)
+        placed = list()
+        for index, location in enumerate(self.locations):
+            placed.append((location, BOARD, index))
+            placed.append((period - location, BOARD, index))
+        for index, station in enumerate(stations):
+            location = int(station['location'] * 10) + 6
+            placed.append((location, STOP, index))
+            placed.append((period - location, STOP, index))
+            placed.append((location - proximity_factor, SENSOR, (index, 'A')))
+            placed.append((period - location - proximity_factor, SENSOR, (index, 'B')))
+        placed.sort(key = lambda event: event[:2])
+
+        # Replays the requests of the buses to the stations: a bus only stops
+        # in the last station that answered it
+        self.events = list()
+        previous = 0
+        next_station = None
+        for position, kind, value in placed:
+            if kind == SENSOR:
+                index, side = value
+                next_station = index if stations[index]['side'] in [None, side] else None
+            elif kind == STOP and value == next_station:
+                station = stations[value]
+                flow = numpy.rint(config.scenario(generator, shape))
+                dwell = numpy.rint(flow / (1 + station['group'])) * config.TIME_PER_PASSENGER
+                self.events.append((position - previous, dwell, None))
+                previous = position
+            elif kind == BOARD:
+                self.events.append((position - previous, 0.0, value))
+                previous = position
+
+
+    def evaluate(self, offsets):
+        ''' Evaluates the round trips of the buses.
+
+        Parameters
+        ----------
+        offsets : numpy.ndarray
+            The offsets of the Boards, with shape (n_boards,) or (k, n_boards)
+            to evaluate k tables at once.
+
+        Returns
+        -------
+        tuple
+            The mean delay (seconds) and the mean number of stops in the Boards
+            of the round trips, for each table of offsets.
+        '''
+
+        offsets = numpy.atleast_2d(offsets)
+        # The time of each bus: tables x velocities x departures
+        time = numpy.broadcast_to(self.departures, (len(offsets), len(self.velocities), len(self.departures))).copy()
+        seconds_per_cell = (config.CELL_SIZE / (self.velocities / 3.6))[None, :, None]
+        delay = numpy.zeros_like(time)
+        stops = numpy.zeros_like(time)
+
+        for _ in range(self.trips):
+            for distance, dwell, board in self.events:
+                time += distance * seconds_per_cell + dwell
+                if board != None:
+                    phase = (time - offsets[:, board, None, None]) % self.cycle[board]
+                    red = phase >= self.green[board]
+                    wait = numpy.where(red, self.cycle[board] - phase, 0.0)
+                    time += wait
+                    delay += wait
+                    stops += red
+            # The buses wait 10 seconds before the next trip
+            time += 10
+
+        return delay.mean(axis = (1, 2)) / self.trips, stops.mean(axis = (1, 2)) / self.trips
+
+
+    def cost(self, offsets, stop_penalty = 10.0):
+        ''' Returns the mean delay plus the penalty (seconds) of each stop. '''
+
+        delay, stops = self.evaluate(offsets)
+        return delay + stop_penalty * stops
+
+
+    def green_wave(self):
+        ''' Returns the offsets of the green_wave policy without a table. '''
+
+        distance = (self.locations - config.GREEN_WAVE_ORIGIN) * config.CELL_SIZE
+        return (distance / (config.GREEN_WAVE_VELOCITY / 3.6)) % self.cycle
+
+
+    def optimize(self, offsets = None, step = 5.0, passes = 3, stop_penalty = 10.0):
+        ''' Optimizes the offsets by coordinate descent.
+
+        Parameters
+        ----------
+        offsets : numpy.ndarray, optional
+            The initial offsets. Default = the offsets of the green wave.
+        step : float, optional
+            The step (seconds) of the candidate offsets. Default = 5.
+        passes : int, optional
+            The max number of passes over all the Boards. Default = 3.
+        stop_penalty : float, optional
+            The cost (seconds) of each stop. Default = 10.
+
+        Returns
+        -------
+        numpy.ndarray
+            The optimized offsets of the Boards.
+        '''
+
+        offsets = numpy.array(offsets if offsets is not None else self.green_wave(), dtype = float)
+        best = self.cost(offsets, stop_penalty)[0]
+
+        for _ in range(passes):
+            improved = False
+            for board in range(len(offsets)):
+                candidates = numpy.arange(0, self.cycle[board], step)
+                tables = numpy.repeat(offsets[None, :], len(candidates), axis = 0)
+                tables[:, board] = candidates
+                costs = self.cost(tables, stop_penalty)
+                choice = int(numpy.argmin(costs))
+                if costs[choice] < best - 1e-9:
+                    best = costs[choice]
+                    offsets[board] = candidates[choice]
+                    improved = True
+            if not improved:
+                break
+
+        return offsets
+
+
+    def table(self, offsets):
+        ''' Returns the table of the offsets, mapping the locations of the
+        Boards to their offsets. '''
+
+        return {int(location): float(offset) for location, offset in zip(self.locations, offsets)}
+
+
+
+def load(path):
+    ''' Loads a table of offsets written by this module.
+
+    Parameters
+    ----------
+    path : str
+        The path of the JSON file.
+
+    Returns
+    -------
+    dict
+        Maps the locations of the Boards to their offsets.
+    '''
+
+    with open(path) as source:
+        return {int(location): offset for location, offset in json.load(source).items()}
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Optimizes the offsets of the semaphores of the BRT corridor.')
+    parser.add_argument('-o', '--output', default = 'offsets.json', help = 'the JSON file of the offsets')
+    parser.add_argument('--step', type = float, default = 5.0, help = 'the step (s) of the candidate offsets')
+    parser.add_argument('--passes', type = int, default = 3, help = 'the max number of passes over the semaphores')
+    parser.add_argument('--stop-penalty', type = float, default = 10.0, help = 'the cost (s) of each stop')
+    args = parser.parse_args(argv)
+
+    import data
+
+    corridor = Corridor(data.stations, data.semaphores)
+    initial = {
+        'zero': numpy.zeros(len(corridor.locations)),
+        'green wave': corridor.green_wave(),
+    }
+    offsets = corridor.optimize(step = args.step, passes = args.passes, stop_penalty = args.stop_penalty)
+
+    for name, table in list(initial.items()) + [('optimized', offsets)]:
+        delay, stops = corridor.evaluate(table)
+        print('%-12s delay %7.1f s   stops %5.2f' % (name, delay[0], stops[0]))
+
+    with open(args.output, 'w') as output:
+        json.dump(corridor.table(offsets), output, indent = 4)
+
+
+if __name__ == '__main__':
+    main()
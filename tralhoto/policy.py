@@ -0,0 +1,329 @@
+'''
+Policy Module
+-------------
+
+This module contains the policies that control the Boards of the Semaphores.
+A policy is written once, as a generator of commands, and each runtime (the
+PADE behaviours, the simulation engine and the asyncio runtime) executes the
+commands with its own clock:
+
+Command     Argument            Action
+OPEN        -                   Sets the Board GREEN.
+CLOSE       -                   Sets the Board AMBER for its security time,
+                                and then RED.
+WAIT        seconds             Waits the given time.
+REQUEST     -                   Waits until a bus requests the opening.
+ATTENDED    seconds or None     Waits until all the requests are attended, for
+                                at most the given time. Sends back a bool that
+                                indicates if the requests were attended.
+NOW         -                   Sends back the current time (in simulated
+                                seconds).
+
+The simulation engine also journals the inputs of the commands (the values
+sent back by the runtime and the state of the Semaphore read by the policy,
+see Policy.observe()) since their last OPEN or CLOSE, so the generator of the
+commands can be rebuilt when a checkpoint is restored (see Policy.play()).
+
+The policy of each Semaphore is chosen by its group in
+config.SEMAPHORE_POLICY, or by the runtime for all the Semaphores.
+
+Name            Policy
+board           Opens on request, closes when the buses passed (BoardManager).
+traditional     Fixed cycles (TraditionalManager).
+actuated        Fixed cycles whose green is extended while buses approach.
+green_wave      Fixed cycles with offsets that make a green wave along the
+                road, starting in Almirante Barroso, or with the offsets of
+                config.SEMAPHORE_OFFSETS (see tralhoto.offsets).
+eta             Opens on request just before the predicted arrival of the
+                buses, serving the close arrivals in one green.
+
+@author: @italocampos
+'''
+
+from tralhoto import config
+
+import collections
+
+
+# The commands of the policies
+OPEN, CLOSE, WAIT, REQUEST, ATTENDED, NOW = range(6)
+
+# The values sent back to the commands while they are fast-forwarded to the
+# mark of the journal
+NEUTRAL = {ATTENDED: True, NOW: 0.0}
+
+
+class Policy(object):
+    ''' The base class of the policies of the Semaphores.
+
+    Properties
+    ----------
+    semaphore : tralhoto.model.SemaphoreModel
+        The Semaphore controlled by this policy.
+    journal : list
+        The inputs of the commands since the mark, in the order they were
+        consumed, or None if the commands are not journaled.
+    mark : int
+        The last OPEN or CLOSE command yielded by the commands, or None if
+        the journal starts with the commands.
+    _tape : collections.deque
+        The inputs given back to the commands while they are replayed.
+    '''
+
+    def __init__(self, semaphore):
+        self.semaphore = semaphore
+        self.journal = None
+        self.mark = None
+        self._tape = None
+
+
+    def commands(self):
+        ''' Returns the generator of the commands of this policy. The
+        generators receive the results of the ATTENDED commands. '''
+
+        raise(NotImplementedError)
+
+
+    def observe(self, value):
+        ''' Returns a value that the commands read from the state of the
+        Semaphore. The value is recorded in the journal, and replaced by the
+        recorded one while the commands are replayed.
+
+        Parameters
+        ----------
+        value : object
+            The value read from the Semaphore.
+
+        Returns
+        -------
+        object
+            The value to be used by the commands.
+        '''
+
+        if self._tape:
+            return self._tape.popleft()
+        if self.journal != None:
+            self.journal.append(value)
+        return value
+
+
+    def play(self, restored = False):
+        ''' Returns a generator of the commands of this policy that journals
+        their inputs.
+
+        Parameters
+        ----------
+        restored : bool, optional
+            If True, the commands are rebuilt from the journal (restored from
+            a checkpoint) and the generator yields first the command that was
+            being executed. Default = False.
+
+        Returns
+        -------
+        generator
+            The commands, which receive the results of the ATTENDED and NOW
+            commands.
+        '''
+
+        commands = self.commands()
+        if not restored:
+            self.journal = [None]
+            self.mark = None
+            return self._journaled(commands, commands.send(None))
+
+        tape = collections.deque(self.journal)
+        journal, self.journal = self.journal, None
+        if self.mark == None:
+            command = commands.send(tape.popleft())
+        else:
+            # The commands before the mark do not change the state of the
+            # generator after it
+            command = next(commands)
+            while command[0] != self.mark:
+                command = commands.send(NEUTRAL.get(command[0]))
+        self._tape = tape
+        while tape:
+            command = commands.send(tape.popleft())
+        self._tape = None
+        self.journal = journal
+        return self._journaled(commands, command)
+
+
+    def _journaled(self, commands, command):
+        ''' Yields the commands, recording the values sent back to them. '''
+
+        while True:
+            value = yield command
+            self.journal.append(value)
+            command = commands.send(value)
+            if command[0] == OPEN or command[0] == CLOSE:
+                self.mark = command[0]
+                self.journal = list()
+
+
+    def close(self):
+        ''' The commands to close the Board and keep it closed for the minimum
+        closing time. '''
+
+        yield (CLOSE, None)
+        yield (WAIT, self.semaphore.MIN_CLOSING_TIME)
+
+
+
+class BoardPolicy(Policy):
+    ''' Opens the Board when a bus requests it and closes it as soon as all
+    the requests were attended, or after the max opening time. '''
+
+    def commands(self):
+        while True:
+            yield (REQUEST, None)
+            yield (OPEN, None)
+            yield (ATTENDED, self.semaphore.MAX_OPENING_TIME)
+            yield from self.close()
+
+
+
+class TraditionalPolicy(Policy):
+    ''' Opens and closes the Board in fixed cycles. '''
+
+    def commands(self):
+        while True:
+            yield (OPEN, None)
+            yield (WAIT, self.semaphore.MAX_OPENING_TIME)
+            yield from self.close()
+
+
+
+class ActuatedPolicy(Policy):
+    ''' Opens and closes the Board in fixed cycles, but extends the green
+    while there are buses approaching, for at most
+    config.SEMAPHORE_MAX_EXTENSION seconds. '''
+
+    def commands(self):
+        while True:
+            yield (OPEN, None)
+            yield (WAIT, self.semaphore.MAX_OPENING_TIME)
+            if self.observe(self.semaphore.requests > 0):
+                yield (ATTENDED, config.SEMAPHORE_MAX_EXTENSION[self.semaphore.group])
+            yield from self.close()
+
+
+
+class GreenWavePolicy(Policy):
+    ''' Opens and closes the Board in fixed cycles, delayed by the time that a
+    bus at config.GREEN_WAVE_VELOCITY takes to travel from
+    config.GREEN_WAVE_ORIGIN to this Semaphore. The cycles of all the groups
+    have the same length, so the Semaphores that follow this policy open one
+    after the other as the buses pass by.
+
+    If config.SEMAPHORE_OFFSETS maps the location of this Semaphore to an
+    offset, it is used instead. '''
+
+    @property
+    def offset(self):
+        ''' The delay (in seconds) of the cycles of this Semaphore. '''
+
+        semaphore = self.semaphore
+        if config.SEMAPHORE_OFFSETS != None and semaphore.location in config.SEMAPHORE_OFFSETS:
+            return config.SEMAPHORE_OFFSETS[semaphore.location]
+        cycle = semaphore.MAX_OPENING_TIME + semaphore.MIN_CLOSING_TIME + semaphore.board.security_time
+        distance = (semaphore.location - config.GREEN_WAVE_ORIGIN) * config.CELL_SIZE
+        return (distance / (config.GREEN_WAVE_VELOCITY / 3.6)) % cycle
+
+
+    def commands(self):
+        yield (WAIT, self.offset)
+        while True:
+            yield (OPEN, None)
+            yield (WAIT, self.semaphore.MAX_OPENING_TIME)
+            yield from self.close()
+
+
+
+class ETAPolicy(Policy):
+    ''' Opens the Board just in time for the buses, using the arrival times
+    predicted by the buses in their requests (SemaphoreModel.arrivals).
+
+    The Board opens config.ETA_LEAD seconds before the first arrival and stays
+    green while the next buses arrive at most config.ETA_MERGE seconds one
+    after the other, for at most the max opening time. The buses that arrive
+    later are served by the next green. '''
+
+    def opening(self, now):
+        ''' Returns the time (in seconds from now) to open the Board. '''
+
+        arrivals = list(self.semaphore.arrivals.values())
+        if not arrivals:
+            return 0.0
+        return max(0.0, min(arrivals) - config.ETA_LEAD - now)
+
+
+    def remaining(self, now):
+        ''' Returns the time (in seconds from now) that the Board must stay
+        green to serve the buses arriving one after the other, or 0 if no bus
+        arrives in the next config.ETA_MERGE seconds. '''
+
+        last = None
+        for arrival in sorted(self.semaphore.arrivals.values()):
+            if arrival - (now if last == None else last) > config.ETA_MERGE:
+                break
+            last = arrival if last == None else max(last, arrival)
+        if last == None:
+            return 0.0
+        return max(last - now, 0.0) + config.ETA_LEAD
+
+
+    def commands(self):
+        while True:
+            yield (REQUEST, None)
+            opening = self.observe(self.opening((yield (NOW, None))))
+            if opening > 0:
+                yield (WAIT, opening)
+            yield (OPEN, None)
+
+            green = 0.0
+            while green < self.semaphore.MAX_OPENING_TIME:
+                duration = min(self.observe(self.remaining((yield (NOW, None)))), self.semaphore.MAX_OPENING_TIME - green)
+                if duration <= 0 or (yield (ATTENDED, duration)):
+                    break
+                green += duration
+            yield from self.close()
+
+
+
+POLICIES = {
+    'board': BoardPolicy,
+    'traditional': TraditionalPolicy,
+    'actuated': ActuatedPolicy,
+    'green_wave': GreenWavePolicy,
+    'eta': ETAPolicy,
+}
+
+
+def create_policy(semaphore, name = None):
+    ''' Creates the policy of a Semaphore.
+
+    Parameters
+    ----------
+    semaphore : tralhoto.model.SemaphoreModel
+        The Semaphore controlled by the policy.
+    name : str, optional
+        The name of the policy. Default = the policy of the group of the
+        Semaphore in config.SEMAPHORE_POLICY.
+
+    Returns
+    -------
+    Policy
+        The policy of the Semaphore.
+
+    Raises
+    ------
+    ValueError
+        When the name of the policy is unknown.
+    '''
+
+    if name == None:
+        name = config.SEMAPHORE_POLICY[semaphore.group]
+    if name not in POLICIES:
+        raise(ValueError('The policy %s is not allowed to Semaphores.' % name))
+    return POLICIES[name](semaphore)
@@ -8,7 +8,7 @@ of the system.
 @author: @italocampos
 '''
 
-from pade.behaviours.types import SimpleBehaviour
+from pade.behaviours.types import SimpleBehaviour, CyclicBehaviour
 from pade.acl.messages import ACLMessage
 from pade.acl.filters import Filter
 #from pade.misc.utility import display
@@ -75,4 +75,43 @@ class Request(SimpleBehaviour):
 
 
     def done(self):
-        return self._done
\ No newline at end of file
+        return self._done
+
+
+
+class Router(CyclicBehaviour):
+    ''' This behaviour is the only reader of the messages of an agent. It
+    passes each message to the handler of its performative and ontology, so
+    the agent needs neither a listener nor a filter for each kind of message.
+
+    The messages without a handler are discarded.
+
+    Attributes
+    ----------
+    routes : dict
+        Maps the tuples (performative, ontology) to the handlers of the
+        messages. The handlers are called as handler(agent, message).
+    '''
+
+    def __init__(self, agent, routes):
+        '''
+        Parameters
+        ----------
+        agent : Agent
+            The agent that holds this behaviour.
+        routes : dict
+            Maps the tuples (performative, ontology) to the handlers of the
+            messages.
+        '''
+
+        super().__init__(agent)
+        self.routes = routes
+
+
+    def action(self):
+        message = self.read()
+        if message == None:
+            return
+        handler = self.routes.get((message.performative, message.ontology))
+        if handler != None:
+            handler(self.agent, message)
@@ -0,0 +1,216 @@
+'''
+Replication Module
+------------------
+
+This module runs independent replications of the BRT corridor until the
+confidence intervals of its results are narrow enough. Each replication runs
+in a worker of a process pool with its own seed, spawned from the seed of the
+experiment. The mean of each result over the trips of a replication (after its
+warm-up, see tralhoto.warmup) is added to a streaming estimate (Welford's
+algorithm), and the experiment stops as soon as the half-width of the
+confidence interval of every result is below the target, relative to its
+mean, or below the absolute tolerance of the result (TOLERANCES), so the
+results with means close to zero (as burned_stations) can converge too.
+
+The replications are consumed in the order of their seeds, so an experiment
+with the same seed stops at the same replication whatever the number of
+workers.
+
+For example, to compare the managers of the semaphores with intervals of
++-2% (95% of confidence):
+
+    python -m tralhoto.replication --manager board traditional --target 0.02 --seed 42
+
+@author: @italocampos
+'''
+
+from tralhoto.sweep import simulate
+from tralhoto.warmup import truncate
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse, math, os
+import numpy
+
+
+# The results of the trips estimated by the replications
+METRICS = ['trip_time', 'semaphore_time', 'burned_stations']
+
+# The half-widths of the confidence intervals of the results (in the units of
+# the results) that are always narrow enough
+TOLERANCES = {
+    'trip_time': 1.0,
+    'semaphore_time': 1.0,
+    'burned_stations': 0.05,
+}
+
+
+class Statistic(object):
+    ''' A streaming estimate of the mean and the variance of a sample
+    (Welford's algorithm).
+
+    Properties
+    ----------
+    count : int
+        The number of values of the sample.
+    mean : float
+        The mean of the sample.
+    _m2 : float
+        The sum of the squared differences from the mean.
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+
+    def update(self, value):
+        ''' Adds a value to the sample.
+
+        Parameters
+        ----------
+        value : float
+            The new value.
+        '''
+
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+
+    @property
+    def variance(self):
+        ''' The variance of the sample (unbiased), or NaN with less than two
+        values. '''
+
+        return self._m2 / (self.count - 1) if self.count > 1 else math.nan
+
+
+    def half_width(self, confidence = 0.95):
+        ''' Returns the half-width of the confidence interval of the mean
+        (Student's t).
+
+        Parameters
+        ----------
+        confidence : float, optional
+            The confidence level. Default = 0.95.
+
+        Returns
+        -------
+        float
+            The half-width of the interval, or infinite with less than two
+            values.
+        '''
+
+        if self.count < 2:
+            return math.inf
+        import scipy.stats as stats
+        t = stats.t.ppf((1 + confidence) / 2, self.count - 1)
+        return t * math.sqrt(self.variance / self.count)
+
+
+    def __str__(self):
+        return '%.2f +- %.2f (n = %d)' % (self.mean, self.half_width(), self.count)
+
+
+
+def _replicate(task):
+    ''' Runs a replication in the process pool and returns the mean of each
+    result over its trips of the steady state. '''
+
+    point, seed = task
+    records = truncate(simulate(point, seed))
+    return {metric: sum(record[metric] for record in records) / len(records) for metric in METRICS}
+
+
+def converged(statistics, target, confidence = 0.95, tolerances = None):
+    ''' Returns a bool that indicates if the half-width of the confidence
+    interval of every statistic is below the target, relative to its mean, or
+    below its absolute tolerance (default = TOLERANCES). '''
+
+    tolerances = tolerances if tolerances != None else TOLERANCES
+    return all(
+        statistic.half_width(confidence) <= max(target * abs(statistic.mean), tolerances.get(metric, 0.0))
+        for metric, statistic in statistics.items()
+    )
+
+
+def replicate(point = None, seed = None, target = 0.05, confidence = 0.95, min_replications = 5, max_replications = 100, workers = None, tolerances = None):
+    ''' Runs replications of the corridor until their results converge.
+
+    Parameters
+    ----------
+    point : dict, optional
+        The values of the parameters of the corridor, as a point of
+        tralhoto.sweep. Default = the default corridor.
+    seed : int, optional
+        The seed used to spawn the seeds of the replications.
+    target : float, optional
+        The max half-width of the confidence intervals, relative to the
+        means. Default = 0.05.
+    confidence : float, optional
+        The confidence level of the intervals. Default = 0.95.
+    min_replications : int, optional
+        The minimum number of replications. Default = 5.
+    max_replications : int, optional
+        The maximum number of replications. Default = 100.
+    workers : int, optional
+        The number of processes of the pool. Default = the number of CPUs.
+    tolerances : dict, optional
+        The absolute half-widths of the results that are narrow enough.
+        Default = TOLERANCES.
+
+    Returns
+    -------
+    dict
+        Maps each result of METRICS to its Statistic over the replications.
+    '''
+
+    point = point if point != None else dict()
+    workers = workers if workers != None else os.cpu_count()
+    seeds = [int(s.generate_state(1)[0]) for s in numpy.random.SeedSequence(seed).spawn(max_replications)]
+    statistics = {metric: Statistic() for metric in METRICS}
+
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        # Keeps one replication running in each worker
+        pending = [pool.submit(_replicate, (point, s)) for s in seeds[:workers]]
+        submitted = len(pending)
+        while pending:
+            means = pending.pop(0).result()
+            for metric, statistic in statistics.items():
+                statistic.update(means[metric])
+
+            count = statistics[METRICS[0]].count
+            if count >= min_replications and converged(statistics, target, confidence, tolerances):
+                for future in pending:
+                    future.cancel()
+                break
+
+            if submitted < max_replications:
+                pending.append(pool.submit(_replicate, (point, seeds[submitted])))
+                submitted += 1
+
+    return statistics
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Runs replications of the BRT corridor until their confidence intervals converge.')
+    parser.add_argument('-m', '--manager', nargs = '+', default = ['board'], help = 'the managers of the semaphores to compare')
+    parser.add_argument('-t', '--target', type = float, default = 0.05, help = 'the relative half-width of the intervals')
+    parser.add_argument('-c', '--confidence', type = float, default = 0.95, help = 'the confidence level')
+    parser.add_argument('--min', type = int, default = 5, help = 'the minimum number of replications')
+    parser.add_argument('--max', type = int, default = 100, help = 'the maximum number of replications')
+    parser.add_argument('-s', '--seed', type = int, default = None, help = 'the seed of the replications')
+    parser.add_argument('-w', '--workers', type = int, default = None, help = 'the number of processes')
+    args = parser.parse_args(argv)
+
+    for manager in args.manager:
+        statistics = replicate({'manager': manager}, args.seed, args.target, args.confidence, args.min, args.max, args.workers)
+        print(manager)
+        for metric, statistic in statistics.items():
+            print('    %-16s %s' % (metric, statistic))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+'''
+Road Module
+-----------
+
+This module contains structures built over the road vector shared by the
+agents.
+
+The RoadIndex compiles the sensors and the Boards placed in the road by the
+setup() of the Stations and Semaphores. For each side of the road, it keeps a
+sorted list of the cells where something can happen to a bus (sensors of the
+side, Boards, stations and the end of the trip), so the buses jump straight to
+these cells with a bisect instead of scanning every crossed cell.
+
+The RoadIndex also splits each side of the road in segments of
+config.STATION_SEGMENT cells. When a bus reaches the first station sensor of a
+segment, it asks all the stations of the segment at once (a batch) and caches
+their answers (the dwell times) until it reaches their sensors, where the
+headways are measured.
+
+@author: @italocampos
+'''
+
+from tralhoto import config
+
+import bisect
+
+
+# The kinds of the sensors compiled in the RoadIndex
+STATION, SEMAPHORE = 0, 1
+KINDS = {'station': STATION, 'semaphore': SEMAPHORE}
+
+
+class RoadIndex(object):
+    ''' A compiled, side-specific index of the events of the road.
+
+    It must be built after all the agents placed their sensors in the road.
+
+    Properties
+    ----------
+    size : int
+        The number of cells of the road.
+    sensors : dict
+        Maps each side ('A' or 'B') to a dict that maps the cells to the
+        sensors of the side in the cell, as tuples (kind, aid).
+    boards : dict
+        Maps the cells to their Boards.
+    owners : dict
+        Maps the cells of the Boards to the lists of the identifiers of their
+        semaphores (two semaphores of the same crossing share a Board).
+    _boards : list
+        The sorted cells of the Boards.
+    stops : set
+        The locations of the stations.
+    locations : dict
+        Maps the identifiers of the stations to their locations in this road
+        (the stations of a tralhoto.network.Network are placed in the road of
+        another route).
+    cells : dict
+        Maps each side to the sorted list of its event cells.
+    batches : dict
+        Maps each side to a dict that maps the cells where the buses ask the
+        stations of a segment to the identifiers of these stations, in the
+        order they are reached. It is empty when the stations are asked one by
+        one.
+    _lookup : dict
+        Maps each side to the set of its event cells.
+    '''
+
+    def __init__(self, road, segment = None):
+        '''
+        Parameters
+        ----------
+        road : list
+            A list representing the road of BRT buses. The elements of the list
+            must be:
+                ([{'address': AID, 'type': str}], board.Board])
+        segment : int, optional
+            The length (in cells) of the segments whose stations are asked at
+            once, or 0 to ask them one by one. Default =
+            config.STATION_SEGMENT.
+        '''
+
+        if segment == None:
+            segment = config.STATION_SEGMENT
+
+        self.size = len(road)
+        self.sensors = {'A': dict(), 'B': dict()}
+        self.boards = dict()
+        self.owners = dict()
+        self.stops = set()
+        self.locations = dict()
+
+        # The cells are found by their identities, since the roads of the
+        # routes of a network share them
+        positions = {id(cell): index for index, cell in enumerate(road)}
+        for cell, (addresses, board) in enumerate(road):
+            for address in addresses:
+                sensors = self.sensors[address['side']].setdefault(cell, list())
+                sensors.append((KINDS[address['type']], address['aid']))
+                if 'location' in address:
+                    location = positions[id(address['cell'])] if 'cell' in address else address['location']
+                    self.locations[address['aid']] = location
+                    self.stops.add(location)
+                if 'board' in address:
+                    owners = self.owners.setdefault(positions[id(address['board'])], list())
+                    if address['aid'] not in owners:
+                        owners.append(address['aid'])
+            if board != None:
+                self.boards[cell] = board
+
+        self._boards = sorted(self.boards)
+        self.cells = dict()
+        self._lookup = dict()
+        for side, sensors in self.sensors.items():
+            for cell in sensors:
+                sensors[cell] = tuple(sensors[cell])
+            # The cell 0 is where the buses finish their trips
+            events = set(sensors) | set(self.boards) | self.stops | {0}
+            self.cells[side] = sorted(events)
+            self._lookup[side] = events
+
+        self.batches = {'A': dict(), 'B': dict()}
+        if segment > 0:
+            for side, sensors in self.sensors.items():
+                # The cells of the side in the order they are reached
+                cells = sorted(sensors, reverse = side == 'B')
+                first = None
+                for cell in cells:
+                    distance = cell if side == 'A' else self.size - 1 - cell
+                    stations = [aid for kind, aid in sensors[cell] if kind == STATION]
+                    if not stations:
+                        continue
+                    if first == None or distance // segment != number:
+                        first, number = cell, distance // segment
+                        self.batches[side][first] = list()
+                    self.batches[side][first].extend(stations)
+                for cell, stations in self.batches[side].items():
+                    self.batches[side][cell] = tuple(stations)
+
+
+    def events(self, cells, side):
+        ''' Filters the event cells crossed by a bus.
+
+        Parameters
+        ----------
+        cells : list
+            The cells crossed by the bus, as returned by BusModel.trip().
+        side : str ('A' or 'B')
+            The side of the road of the bus.
+
+        Returns
+        -------
+        list
+            The crossed event cells, in the order they were crossed.
+        '''
+
+        if not cells:
+            return cells
+
+        first, last = cells[0], cells[-1]
+        if len(cells) == 1 or abs(last - first) == len(cells) - 1:
+            # The bus did not turn around: bisects the event cells
+            positions = self.cells[side]
+            low, high = min(first, last), max(first, last)
+            found = positions[bisect.bisect_left(positions, low):bisect.bisect_right(positions, high)]
+            if first > last:
+                found.reverse()
+            return found
+
+        # The bus turned around in one end of the road
+        lookup = self._lookup[side]
+        return [cell for cell in cells if cell in lookup]
+
+
+    def next_board(self, cell, side):
+        ''' Returns the cell of the next Board ahead of a cell.
+
+        Parameters
+        ----------
+        cell : int
+            The cell of the bus.
+        side : str ('A' or 'B')
+            The side of the road of the bus.
+
+        Returns
+        -------
+        int
+            The cell of the next Board, or None if there is no Board ahead.
+        '''
+
+        if side == 'A':
+            index = bisect.bisect_right(self._boards, cell)
+            return self._boards[index] if index < len(self._boards) else None
+        index = bisect.bisect_left(self._boards, cell)
+        return self._boards[index - 1] if index > 0 else None
+
+
+    def batch(self, side, cell, station):
+        ''' Returns the stations that a bus asks when it reaches the sensor of
+        a station.
+
+        Parameters
+        ----------
+        side : str ('A' or 'B')
+            The side of the road of the bus.
+        cell : int
+            The cell of the sensor.
+        station : object
+            The identifier of the station of the sensor.
+
+        Returns
+        -------
+        tuple
+            The identifiers of the stations to ask: the station itself when
+            the stations are asked one by one, all the stations of the segment
+            when the sensor is the first of its segment, or none.
+        '''
+
+        if not self.batches[side]:
+            return (station,)
+        batch = self.batches[side].get(cell, ())
+        return batch if batch and batch[0] == station else ()
@@ -0,0 +1,317 @@
+'''
+Sink Module
+-----------
+
+This module contains the sinks of the results of the trips. A sink keeps the
+records of the trips in memory and writes them in batches, when the buffer is
+full, when some time passed since the last write, or when it is closed. All
+the buses of a run share the same sink, which is the single writer of the
+output file.
+
+The format of the output is chosen by the extension of the file:
+
+Extension   Format
+.csv        CSV, with the metadata of the run in a sidecar .json file
+.npz        NumPy arrays (one per column), with the metadata as JSON
+.parquet    Parquet (requires pyarrow), with the metadata in the schema
+
+@author: @italocampos
+'''
+
+from tralhoto import config
+
+import atexit, csv, datetime, json, os, threading, time, uuid
+
+
+# The columns of the records of the trips
+COLUMNS = [
+    'run',
+    'aid',
+    'bus_name',
+    'velocity',
+    'simulation',
+    'trip_time',
+    'burned_stations',
+    'n_semaphores',
+    'semaphore_time',
+    'headway_variance',
+    'time',
+]
+
+
+def run_metadata(**extra):
+    ''' Returns the metadata of a run: a new run ID, the date and the values
+    of the config module.
+
+    Parameters
+    ----------
+    **extra
+        Other values to describe the run (the seed, the manager...).
+
+    Returns
+    -------
+    dict
+        The metadata of the run.
+    '''
+
+    values = {
+        'run': uuid.uuid4().hex,
+        'date': datetime.datetime.now().isoformat(),
+        'SEMAPHORE_MAX_OPENING_TIME': config.SEMAPHORE_MAX_OPENING_TIME,
+        'SEMAPHORE_MIN_CLOSING_TIME': config.SEMAPHORE_MIN_CLOSING_TIME,
+        'SEMAPHORE_POLICY': config.SEMAPHORE_POLICY,
+        'HEADWAY_CONTROL': config.HEADWAY_CONTROL,
+        'scenario': config.scenario.__name__,
+        'PROFILE': [scenario.__name__ for scenario in config.PROFILE] if config.PROFILE != None else None,
+        'TIME_PER_PASSENGER': config.TIME_PER_PASSENGER,
+        'SECOND': config.SECOND,
+        'BUS_VELOCITY': config.BUS_VELOCITY,
+        'SEED': config.SEED,
+    }
+    values.update(extra)
+    return values
+
+
+
+class Sink(object):
+    ''' The base class of the sinks.
+
+    Properties
+    ----------
+    path : str
+        The path of the output file.
+    metadata : dict
+        The metadata of the run. Its key 'run' identifies the records.
+    buffer_size : int
+        The number of records kept in memory before writing them.
+    interval : float
+        The max time (in seconds of the wall clock) between two writes.
+    _buffer : list
+        The records not written yet.
+    _last_flush : float
+        The time of the last write.
+    _lock : threading.Lock
+        Serializes the writes of the buses.
+    '''
+
+    def __init__(self, path, metadata = None, buffer_size = 1000, interval = 60.0):
+        '''
+        Parameters
+        ----------
+        path : str
+            The path of the output file.
+        metadata : dict, optional
+            The metadata of the run. Default = run_metadata().
+        buffer_size : int, optional
+            The number of records kept in memory before writing them. Default
+            = 1000.
+        interval : float, optional
+            The max time (in seconds) between two writes. Default = 60.
+        '''
+
+        self.path = path
+        self.metadata = metadata if metadata != None else run_metadata()
+        self.buffer_size = buffer_size
+        self.interval = interval
+        self._buffer = list()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._closed = False
+        atexit.register(self.close)
+
+
+    def write(self, record):
+        ''' Stores the record of a trip.
+
+        Parameters
+        ----------
+        record : dict
+            The record, as returned by BusModel.record() and extended with the
+            aid of the bus, the number of the simulation and the time.
+
+        Raises
+        ------
+        ValueError
+            When the sink is closed.
+        '''
+
+        with self._lock:
+            if self._closed:
+                raise(ValueError('The sink of %s is closed.' % self.path))
+            self._buffer.append(record)
+            if len(self._buffer) >= self.buffer_size or \
+                time.monotonic() - self._last_flush >= self.interval:
+                self._flush()
+
+
+    def flush(self):
+        ''' Writes the records stored in memory. '''
+
+        with self._lock:
+            self._flush()
+
+
+    def close(self):
+        ''' Writes the remaining records and closes the sink. '''
+
+        with self._lock:
+            if not self._closed:
+                self._flush()
+                self._close()
+                self._closed = True
+                # Nothing is left to close at the exit, so the sink is released
+                atexit.unregister(self.close)
+
+
+    def _flush(self):
+        records, self._buffer = self._buffer, list()
+        self._last_flush = time.monotonic()
+        if records:
+            run = self.metadata['run']
+            self._write([[run if column == 'run' else record.get(column) for column in COLUMNS] for record in records])
+
+
+    def _write(self, rows):
+        ''' Writes rows of values in the order of COLUMNS. '''
+
+        raise(NotImplementedError)
+
+
+    def _close(self):
+        pass
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+
+class CSVSink(Sink):
+    ''' Writes the records in a CSV file. The metadata of the run is written in
+    the file path + '.json'. '''
+
+    def __init__(self, path, *args, **kwargs):
+        super().__init__(path, *args, **kwargs)
+        self._file = open(path, 'w', newline = '')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+        with open(path + '.json', 'w') as output:
+            json.dump(self.metadata, output, indent = 4)
+
+
+    def _write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+
+    def _close(self):
+        self._file.close()
+
+
+
+class NPZSink(Sink):
+    ''' Stores the records in a .npz file, with one array for each column. A
+    .npz file can not be appended, so the rows are kept in memory and the file
+    is written once, when the sink is closed (at the exit of the interpreter
+    at the latest). The missing values of the records are stored as NaN (or as
+    '' in the columns of strings), so every column has a numeric or a string
+    dtype and the file loads without pickle. '''
+
+    def __init__(self, path, *args, **kwargs):
+        super().__init__(path, *args, **kwargs)
+        self._rows = list()
+
+
+    def _write(self, rows):
+        self._rows.extend(rows)
+
+
+    def _close(self):
+        import numpy
+
+        columns = {column: _array([row[i] for row in self._rows]) for i, column in enumerate(COLUMNS)}
+        temporary = self.path + '.tmp.npz'
+        numpy.savez(temporary, metadata = numpy.array(json.dumps(self.metadata)), **columns)
+        os.replace(temporary, self.path)
+
+
+
+def _array(values):
+    ''' Returns the array of the values of a column of NPZSink, with the
+    missing values replaced by NaN (or '' in a column of strings). '''
+
+    import numpy
+
+    if all(value != None for value in values):
+        return numpy.array(values)
+    if any(isinstance(value, str) for value in values):
+        return numpy.array([value if value != None else '' for value in values])
+    return numpy.array([value if value != None else numpy.nan for value in values], dtype = numpy.float64)
+
+
+
+class ParquetSink(Sink):
+    ''' Writes the records in a Parquet file, one row group for each write. '''
+
+    def __init__(self, path, *args, **kwargs):
+        try:
+            import pyarrow, pyarrow.parquet
+        except ImportError:
+            raise(ImportError('The Parquet sink requires pyarrow (pip install pyarrow).'))
+
+        super().__init__(path, *args, **kwargs)
+        self._pyarrow = pyarrow
+        self._writer = None
+
+
+    def _write(self, rows):
+        pyarrow = self._pyarrow
+        table = pyarrow.table({column: [row[i] for row in rows] for i, column in enumerate(COLUMNS)})
+        if self._writer == None:
+            schema = table.schema.with_metadata({'tralhoto': json.dumps(self.metadata)})
+            self._writer = pyarrow.parquet.ParquetWriter(self.path, schema)
+        self._writer.write_table(table.cast(self._writer.schema))
+
+
+    def _close(self):
+        if self._writer != None:
+            self._writer.close()
+
+
+
+SINKS = {
+    '.csv': CSVSink,
+    '.npz': NPZSink,
+    '.parquet': ParquetSink,
+}
+
+
+def open_sink(path, *args, **kwargs):
+    ''' Creates the sink for a file according with its extension.
+
+    Parameters
+    ----------
+    path : str
+        The path of the output file (.csv, .npz or .parquet).
+    *args, **kwargs
+        The parameters of Sink.
+
+    Returns
+    -------
+    Sink
+        The sink of the file.
+
+    Raises
+    ------
+    ValueError
+        When the extension of the file is not supported.
+    '''
+
+    extension = os.path.splitext(path)[1]
+    if extension not in SINKS:
+        raise(ValueError('The extension %s is not supported by the sinks.' % extension))
+    return SINKS[extension](path, *args, **kwargs)
@@ -0,0 +1,211 @@
+'''
+Sweep Module
+------------
+
+This module runs parameter sweeps over the simulation engine. Each point of
+the sweep is a combination of parameters that runs in a worker of a process
+pool, with its own seed and its own road. The results of all the points are
+written in a single table.
+
+The sweeps are described by a JSON file that maps each parameter to the list
+of values to be swept. For example:
+
+    {
+        "BUS_VELOCITY": [[40, 45, 50, 55, 60], [35, 40]],
+        "SEMAPHORE_MAX_OPENING_TIME": [[30, 50, 90], [20, 40, 60]],
+        "scenario": ["normal", "peak"],
+        "headway": [120, 240],
+        "manager": ["board", "traditional", "actuated", "green_wave"]
+    }
+
+And then run with:
+
+    python -m tralhoto.sweep sweep.json --output results.csv --seed 42
+
+@author: @italocampos
+'''
+
+from tralhoto.engine import corridor
+from tralhoto.sink import COLUMNS
+from tralhoto.warmup import truncation
+from tralhoto import config
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse, csv, itertools, json
+import numpy
+
+
+# The parameters of the config module that can be swept
+CONFIG_PARAMETERS = [
+    'BUS_VELOCITY',
+    'SEMAPHORE_MAX_OPENING_TIME',
+    'SEMAPHORE_MIN_CLOSING_TIME',
+    'SEMAPHORE_POLICY',
+    'SEMAPHORE_MAX_EXTENSION',
+    'TIME_PER_PASSENGER',
+    'scenario',
+    'PROFILE',
+    'PROFILE_BIN',
+]
+
+# The parameters of the function tralhoto.engine.corridor that can be swept
+CORRIDOR_PARAMETERS = [
+    'manager',
+    'n_simulations',
+    'n_buses',
+    'headway',
+    'fleet',
+    'steady_trips',
+]
+
+
+def grid(axes):
+    ''' Returns all the combinations of the values of the parameters.
+
+    Parameters
+    ----------
+    axes : dict
+        Maps the name of each parameter to the list of its values.
+
+    Returns
+    -------
+    list
+        A list of dicts, one for each point of the sweep.
+
+    Raises
+    ------
+    ValueError
+        When an unknown parameter is passed to this function.
+    '''
+
+    for name in axes:
+        if name not in CONFIG_PARAMETERS + CORRIDOR_PARAMETERS:
+            raise(ValueError('The parameter %s can not be swept.' % name))
+
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*[axes[name] for name in names])]
+
+
+def simulate(point, seed = None):
+    ''' Runs the simulation of a point of the sweep.
+
+    The values of the config module are changed during the simulation and
+    restored at the end.
+
+    Parameters
+    ----------
+    point : dict
+        The values of the parameters of this point.
+    seed : int, optional
+        The seed of the random generators.
+
+    Returns
+    -------
+    list
+        The results of the trips of the simulation.
+    '''
+
+    saved = {name: getattr(config, name) for name in CONFIG_PARAMETERS}
+    try:
+        for name in CONFIG_PARAMETERS:
+            if name in point:
+                value = point[name]
+                if name == 'scenario':
+                    value = getattr(config, value)
+                elif name == 'PROFILE' and value != None:
+                    # The name of a profile of the config module or a list of
+                    # names of scenarios
+                    value = getattr(config, value) if isinstance(value, str) else [getattr(config, scenario) for scenario in value]
+                setattr(config, name, value)
+        kwargs = {name: point[name] for name in CORRIDOR_PARAMETERS if name in point}
+        return corridor(seed = seed, **kwargs).run()
+    finally:
+        for name, value in saved.items():
+            setattr(config, name, value)
+
+
+def _simulate(task):
+    ''' Runs a task of the process pool. '''
+
+    index, point, seed = task
+    records = simulate(point, seed)
+    boundary = truncation(records)[0]
+    return [dict(record, point = index, seed = seed, warmup = i < boundary) for i, record in enumerate(records)]
+
+
+def sweep(points, seed = None, workers = None):
+    ''' Runs all the points of a sweep in a process pool.
+
+    Each point receives an independent seed spawned from the given seed.
+
+    Parameters
+    ----------
+    points : list
+        The points of the sweep, as returned by grid().
+    seed : int, optional
+        The seed used to spawn the seeds of the points.
+    workers : int, optional
+        The number of processes of the pool. Default = the number of CPUs.
+
+    Returns
+    -------
+    list
+        The results of the trips of all the points.
+    '''
+
+    seeds = [int(s.generate_state(1)[0]) for s in numpy.random.SeedSequence(seed).spawn(len(points))]
+    tasks = [(i, point, s) for i, (point, s) in enumerate(zip(points, seeds))]
+
+    results = list()
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        for records in pool.map(_simulate, tasks):
+            results.extend(records)
+    return results
+
+
+def write(points, results, path):
+    ''' Writes the results of a sweep in a CSV file.
+
+    Each line has the values of the parameters of the point followed by the
+    results of a trip and a bool that indicates if the trip belongs to the
+    warm-up of its point (see tralhoto.warmup).
+
+    Parameters
+    ----------
+    points : list
+        The points of the sweep.
+    results : list
+        The results returned by sweep().
+    path : str
+        The path of the CSV file.
+    '''
+
+    names = list()
+    for point in points:
+        names.extend(name for name in point if name not in names)
+
+    with open(path, 'w', newline = '') as output:
+        writer = csv.writer(output)
+        writer.writerow(['point', 'seed'] + names + COLUMNS + ['warmup'])
+        for record in results:
+            point = points[record['point']]
+            values = [json.dumps(point[name]) if isinstance(point.get(name), list) else point.get(name) for name in names]
+            writer.writerow([record['point'], record['seed']] + values + [record.get(column) for column in COLUMNS] + [record['warmup']])
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Runs a parameter sweep over the BRT corridor.')
+    parser.add_argument('sweep', help = 'JSON file mapping each parameter to its values')
+    parser.add_argument('-o', '--output', default = 'sweep.csv', help = 'the CSV file of results')
+    parser.add_argument('-s', '--seed', type = int, default = None, help = 'the seed of the sweep')
+    parser.add_argument('-w', '--workers', type = int, default = None, help = 'the number of processes')
+    args = parser.parse_args(argv)
+
+    with open(args.sweep) as source:
+        points = grid(json.load(source))
+    results = sweep(points, args.seed, args.workers)
+    write(points, results, args.output)
+
+
+if __name__ == '__main__':
+    main()
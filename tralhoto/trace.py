@@ -0,0 +1,185 @@
+'''
+Trace Module
+------------
+
+This module contains the logging layer of the behaviours of the agents. Each
+message of the system is an Event with a level and a function that formats
+it. An event is only formatted (and colored) when its level is enabled, so
+the disabled events cost only one comparison. The events of the hot paths can
+also be guarded by enabled() to skip even the computation of their values.
+
+The events can be sampled (only one of every N occurrences of each event is
+logged) and can also be written in a binary trace file, to be replayed later
+with replay().
+
+The level, the sampling and the trace file are set in the config module
+(TRACE_LEVEL, TRACE_SAMPLE and TRACE_FILE) or with configure().
+
+@author: @italocampos
+'''
+
+from tralhoto import config
+
+import marshal, threading, time
+
+
+DEBUG, INFO, WARNING, OFF = 10, 20, 30, 100
+LEVELS = {'DEBUG': DEBUG, 'INFO': INFO, 'WARNING': WARNING, 'OFF': OFF}
+
+
+class Event(object):
+    ''' A kind of message of the system.
+
+    Properties
+    ----------
+    code : int
+        The code of the event in the binary traces.
+    name : str
+        The name of the event.
+    level : int
+        The level of the event.
+    format : callable
+        Creates the text of the event from its values.
+    '''
+
+    def __init__(self, code, name, level, format):
+        self.code = code
+        self.name = name
+        self.level = level
+        self.format = format
+
+
+
+def _color(name, text):
+    import color
+    return getattr(color, name)(text, 'bold')
+
+
+# The events of the behaviours of the agents
+STEP = Event(0, 'STEP', DEBUG,
+    lambda index: 'Triping the km %.1f.' % (index / 10))
+STOP = Event(1, 'STOP', INFO,
+    lambda name, wait_time: _color('yellow', 'STOP > ') + '%s | %.1f s' % (name, wait_time))
+SEMAPHORE_STOP = Event(2, 'SEMAPHORE_STOP', INFO,
+    lambda location: _color('red', 'STOP > ') + 'Semaphore in #%d' % location)
+BURNED = Event(3, 'BURNED', INFO,
+    lambda name: _color('red', 'BURNED > ') + name)
+FINISHED = Event(4, 'FINISHED', INFO,
+    lambda trip_time: _color('green', 'FINISHED > ') + 'Trip time: %.1f s' % trip_time)
+SIMULATION_FINISHED = Event(5, 'SIMULATION_FINISHED', INFO,
+    lambda path: _color('magenta', 'SIMULATION FINISHED > ') + 'Check the file %s' % path)
+BOARD_OPENED = Event(6, 'BOARD_OPENED', DEBUG,
+    lambda requests: 'Board opened with %d requests.' % requests)
+BOARD_CLOSED = Event(7, 'BOARD_CLOSED', DEBUG,
+    lambda requests: 'Board closed with %d requests.' % requests)
+WAIT_TIME = Event(8, 'WAIT_TIME', DEBUG,
+    lambda side, wait_time: 'Bus in the side %s must wait %.1f s.' % (side, wait_time))
+
+EVENTS = {event.code: event for event in [
+    STEP, STOP, SEMAPHORE_STOP, BURNED, FINISHED, SIMULATION_FINISHED,
+    BOARD_OPENED, BOARD_CLOSED, WAIT_TIME,
+]}
+
+
+# The state of the trace
+_level = INFO
+_sample = 1
+_counters = dict()
+_output = None
+_lock = threading.Lock()
+
+
+def configure(level = None, sample = None, path = None):
+    ''' Configures the trace.
+
+    Parameters
+    ----------
+    level : str or int, optional
+        The minimum level of the logged events ('DEBUG', 'INFO', 'WARNING' or
+        'OFF').
+    sample : int, optional
+        Logs only one of every sample occurrences of each event.
+    path : str, optional
+        The file where the binary trace is written.
+    '''
+
+    global _level, _sample, _output
+
+    if level != None:
+        _level = LEVELS[level] if isinstance(level, str) else level
+    if sample != None:
+        _sample = max(1, int(sample))
+    if path != None:
+        with _lock:
+            if _output != None:
+                _output.close()
+            _output = open(path, 'wb')
+
+
+def enabled(event):
+    ''' Returns a bool that indicates if an event is logged. '''
+
+    return event.level >= _level
+
+
+def log(agent, event, *values):
+    ''' Logs an event of an agent.
+
+    Parameters
+    ----------
+    agent : pade.core.agent.Agent
+        The agent that originated the event.
+    event : Event
+        The event.
+    *values
+        The values of the event, passed to its format function.
+    '''
+
+    if event.level < _level:
+        return
+
+    if _sample > 1:
+        count = _counters.get(event.code, 0)
+        _counters[event.code] = count + 1
+        if count % _sample:
+            return
+
+    if _output != None:
+        with _lock:
+            marshal.dump((time.time(), event.code, _name(agent), values), _output)
+    else:
+        from pade.misc.utility import display
+        display(agent, event.format(*values))
+
+
+def _name(agent):
+    aid = getattr(agent, 'aid', agent)
+    return aid.getLocalName() if hasattr(aid, 'getLocalName') else str(aid)
+
+
+def replay(path):
+    ''' Reads a binary trace.
+
+    Parameters
+    ----------
+    path : str
+        The file of the binary trace.
+
+    Yields
+    ------
+    tuple
+        The time, the Event, the name of the agent and the text of each
+        logged event.
+    '''
+
+    with open(path, 'rb') as source:
+        while True:
+            try:
+                moment, code, name, values = marshal.load(source)
+            except EOFError:
+                return
+            event = EVENTS[code]
+            yield moment, event, name, event.format(*values)
+
+
+configure(config.TRACE_LEVEL, config.TRACE_SAMPLE, config.TRACE_FILE)
@@ -0,0 +1,160 @@
+'''
+Transport Module
+----------------
+
+This module contains the in-process transport of the messages of the agents.
+All the agents of main.py live in the same process, so a message between two
+of them does not need to be serialized and sent through the sockets of PADE:
+the sender puts a copy of the message in the mailbox of the receiver, a
+thread-safe queue. The receiver reads its mailbox in the thread of the reactor
+of PADE, where it also reacts to the messages that arrive from the network, so
+the behaviours of the sender never run the code of the receiver.
+
+The agents of the process are registered by their names in a shared table.
+The receivers of a message that are not in the table (the agents of other
+processes) still receive it through the network of PADE. The transport is
+enabled by config.MAILBOX.
+
+@author: @italocampos
+'''
+
+from pade.core.agent import Agent
+from twisted.internet import reactor
+
+from tralhoto import config
+
+import queue, threading
+
+
+# The agents of this process, indexed by their names
+_agents = dict()
+_lock = threading.Lock()
+
+
+def register(agent):
+    ''' Registers an agent to receive the messages of this process.
+
+    Parameters
+    ----------
+    agent : pade.core.agent.Agent
+        The agent to register.
+    '''
+
+    with _lock:
+        _agents[agent.aid.getName()] = agent
+
+
+def unregister(agent):
+    ''' Removes an agent from the table of this process. '''
+
+    with _lock:
+        _agents.pop(agent.aid.getName(), None)
+
+
+def lookup(aid):
+    ''' Returns the agent of this process with the given AID, or None.
+
+    Parameters
+    ----------
+    aid : pade.core.aid.AID
+        The AID of the agent.
+
+    Returns
+    -------
+    pade.core.agent.Agent
+        The agent, or None if it lives in another process.
+    '''
+
+    return _agents.get(aid.getName())
+
+
+
+class LocalAgent(Agent):
+    ''' An agent that delivers its messages to the agents of the same process
+    through their mailboxes.
+
+    Properties
+    ----------
+    mailbox : queue.Queue
+        The messages sent to this agent by the agents of this process, not
+        read yet.
+    '''
+
+    def __init__(self, aid, *args, **kwargs):
+        '''
+        Parameters
+        ----------
+        aid : pade.core.aid.AID
+            The AID of this agent.
+        *args, **kwargs
+            The other parameters of pade.core.agent.Agent.
+        '''
+
+        super().__init__(aid, *args, **kwargs)
+        self.mailbox = queue.Queue()
+        register(self)
+
+
+    def send(self, message):
+        ''' Sends a message. The local receivers get the message in their
+        mailboxes and the others through the network.
+
+        Parameters
+        ----------
+        message : pade.acl.messages.ACLMessage
+            The message to send.
+        '''
+
+        if not config.MAILBOX:
+            return super().send(message)
+
+        local = list()
+        remote = list()
+        for receiver in message.receivers:
+            agent = lookup(receiver)
+            if agent != None:
+                local.append(agent)
+            else:
+                remote.append(receiver)
+
+        if remote:
+            if local:
+                # Sends through the network only to the remote receivers
+                copy = message.clone()
+                copy.receivers = remote
+                super().send(copy)
+            else:
+                super().send(message)
+
+        if local:
+            message.set_sender(self.aid)
+            for agent in local:
+                # Each receiver gets its own copy of the message
+                agent.deliver(message.clone())
+
+
+    def deliver(self, message):
+        ''' Puts a message in the mailbox of this agent. This method can be
+        called from any thread; the message is read in the thread of the
+        reactor.
+
+        Parameters
+        ----------
+        message : pade.acl.messages.ACLMessage
+            The message, owned by this agent from now on.
+        '''
+
+        self.mailbox.put(message)
+        reactor.callFromThread(self.read_mailbox)
+
+
+    def read_mailbox(self):
+        ''' Reacts to the messages of the mailbox, in the thread of the
+        reactor. '''
+
+        while True:
+            try:
+                message = self.mailbox.get_nowait()
+            except queue.Empty:
+                return
+            self.react(message)
@@ -0,0 +1,202 @@
+'''
+Warm-up Module
+--------------
+
+This module detects the end of the warm-up of a simulation. The buses start
+one after the other on an empty corridor, so their first trips are shorter
+than the trips of the steady state and bias the means of the results.
+
+The warm-up is detected by the MSER-5 rule (Marginal Standard Error Rule, with
+batches of config.MSER_BATCH trips): the trips are taken in the order they
+finished and grouped in batches, and the truncation point is the number of
+batches d that minimizes
+
+    MSER(d) = sum((Y[i] - mean(Y[d:])) ** 2 for i >= d) / (n - d) ** 2
+
+for d in the first half of the n batch means Y. The truncation point of
+several results (trip_time and semaphore_time) is the greatest of them. A
+minimum found in the middle of the series means that the run is too short to
+reach the steady state.
+
+The Detector applies the rule online, to the trips of a running simulation,
+and tells when enough trips of the steady state were recorded, so the
+simulation can stop (see config.STEADY_TRIPS).
+
+@author: @italocampos
+'''
+
+from tralhoto import config
+
+import numpy
+
+
+# The results of the trips used to detect the warm-up
+METRICS = ['trip_time', 'semaphore_time']
+
+# The default of the arguments that fall back to the config module when they
+# are not passed (None is a valid value for them)
+_CONFIG = object()
+
+
+def mser(values, batch_size = None):
+    ''' Returns the truncation point of a series by the MSER rule.
+
+    Parameters
+    ----------
+    values : iterable
+        The values of the series, in the order they were observed.
+    batch_size : int, optional
+        The number of values of each batch. Default = config.MSER_BATCH.
+
+    Returns
+    -------
+    tuple
+        The number of values of the warm-up and a bool that indicates if the
+        steady state was reached.
+    '''
+
+    batch_size = batch_size if batch_size is not None else config.MSER_BATCH
+    values = numpy.asarray(values, dtype = numpy.float64)
+    n = len(values) // batch_size
+    if n < 2:
+        return 0, False
+
+    means = values[:n * batch_size].reshape(n, batch_size).mean(axis = 1)
+    # The sums of the tails means[d:] for every d
+    sums = numpy.cumsum(means[::-1])[::-1]
+    squares = numpy.cumsum((means ** 2)[::-1])[::-1]
+    counts = numpy.arange(n, 0, -1, dtype = numpy.float64)
+    statistic = (squares - sums ** 2 / counts) / counts ** 2
+
+    # The tails shorter than half of the series are not candidates, and a
+    # minimum in the edge of the candidates means that the warm-up goes on
+    half = n // 2
+    d = int(numpy.argmin(statistic[:half + 1]))
+    return d * batch_size, d < half
+
+
+def truncation(records, metrics = None, batch_size = None):
+    ''' Returns the number of trips of the warm-up of a run.
+
+    Parameters
+    ----------
+    records : list
+        The results of the trips, in the order they finished.
+    metrics : list, optional
+        The results of the trips used to detect the warm-up. Default =
+        METRICS.
+    batch_size : int, optional
+        The number of trips of each batch. Default = config.MSER_BATCH.
+
+    Returns
+    -------
+    tuple
+        The number of trips of the warm-up (the greatest truncation point of
+        the results) and a bool that indicates if the steady state was reached
+        by all the results.
+    '''
+
+    metrics = metrics if metrics is not None else METRICS
+    boundary, steady = 0, True
+    for metric in metrics:
+        point, reached = mser([record[metric] for record in records], batch_size)
+        boundary = max(boundary, point)
+        steady = steady and reached
+    return boundary, steady
+
+
+def truncate(records, metrics = None, batch_size = None):
+    ''' Returns the trips of a run after its warm-up.
+
+    Parameters
+    ----------
+    records : list
+        The results of the trips, in the order they finished.
+    metrics, batch_size
+        The parameters of truncation().
+
+    Returns
+    -------
+    list
+        The trips of the steady state.
+    '''
+
+    return records[truncation(records, metrics, batch_size)[0]:]
+
+
+
+class Detector(object):
+    ''' Detects the warm-up of a running simulation.
+
+    Properties
+    ----------
+    steady_trips : int
+        The number of trips of the steady state after which the simulation is
+        done, or None to never stop it.
+    metrics : list
+        The results of the trips used to detect the warm-up.
+    batch_size : int
+        The number of trips of each batch.
+    records : list
+        The results of the finished trips.
+    boundary : int
+        The number of trips of the warm-up, according to the last detection.
+    steady : bool
+        Indicates if the steady state was reached in the last detection.
+    '''
+
+    def __init__(self, steady_trips = _CONFIG, metrics = None, batch_size = None):
+        '''
+        Parameters
+        ----------
+        steady_trips : int, optional
+            The number of trips of the steady state after which the simulation
+            is done, or None to never stop it. Default = config.STEADY_TRIPS.
+        metrics : list, optional
+            The results of the trips used to detect the warm-up. Default =
+            METRICS.
+        batch_size : int, optional
+            The number of trips of each batch. Default = config.MSER_BATCH.
+        '''
+
+        self.steady_trips = steady_trips if steady_trips is not _CONFIG else config.STEADY_TRIPS
+        self.metrics = metrics if metrics is not None else METRICS
+        self.batch_size = batch_size if batch_size is not None else config.MSER_BATCH
+        self.records = list()
+        self.boundary = 0
+        self.steady = False
+
+
+    def update(self, record):
+        ''' Adds a finished trip. The warm-up is detected again at the end of
+        each batch.
+
+        Parameters
+        ----------
+        record : dict
+            The results of the trip.
+
+        Returns
+        -------
+        bool
+            Indicates if the simulation is done.
+        '''
+
+        self.records.append(record)
+        if len(self.records) % self.batch_size == 0:
+            self.boundary, self.steady = truncation(self.records, self.metrics, self.batch_size)
+        return self.done
+
+
+    @property
+    def done(self):
+        ''' Indicates if the steady state was reached and has at least
+        steady_trips trips. '''
+
+        return self.steady and self.steady_trips is not None and len(self.records) - self.boundary >= self.steady_trips
+
+
+    def truncate(self):
+        ''' Returns the finished trips after the detected warm-up. '''
+
+        return self.records[self.boundary:]